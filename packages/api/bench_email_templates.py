@@ -0,0 +1,72 @@
+# bench_email_templates.py
+
+# Uso:
+#   python bench_email_templates.py                       -> mede os 3 templates de e-mail
+#   python bench_email_templates.py -n 20000 -t welcome   -> só um template, mais iterações
+#
+# Compara renderizações por segundo de:
+#   cache     -> email_service.render_email (template compilado em cache)
+#   flask     -> render_template() do Flask (cache do Jinja + processadores de contexto)
+#   sem cache -> compila o template a cada envio (o que o create_app() por e-mail fazia)
+
+import argparse
+import os
+import time
+
+os.environ.setdefault('OUTBOX_DISPATCHER_ENABLED', 'false')
+os.environ.setdefault('LOYALTY_EXPIRY_SCHEDULER_ENABLED', 'false')
+
+from flask import render_template
+from jinja2 import Environment, FileSystemLoader
+
+from src import create_app
+from src.services import email_service
+
+SAMPLE_CONTEXT = {
+    'welcome': {"user": {"full_name": "Maria Souza"}},
+    'order_status_update': {"user": {"full_name": "Maria Souza"}, "order": {"order_id": 1234}, "new_status": "on_the_way"},
+    'password_reset': {"user": {"full_name": "Maria Souza"}, "reset_link": "http://localhost:5173/reset-password?token=abc"},
+}
+
+
+def _measure(render, iterations):
+    render()  # Aquecimento
+    start = time.perf_counter()
+    for _ in range(iterations):
+        render()
+    return iterations / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de renderização dos templates de e-mail.")
+    parser.add_argument('-n', '--iterations', type=int, default=5000)
+    parser.add_argument('-t', '--template', choices=sorted(SAMPLE_CONTEXT), action='append',
+                        help="Template a medir (pode repetir). Padrão: todos.")
+    args = parser.parse_args()
+
+    app = create_app()
+    templates = args.template or list(email_service.EMAIL_TEMPLATES)
+
+    with app.app_context():
+        for name in templates:
+            context = SAMPLE_CONTEXT[name]
+            filename = f'{name}.html'
+
+            def cold_render():
+                env = Environment(loader=FileSystemLoader(os.path.join(app.root_path, app.template_folder)))
+                return env.get_template(filename).render(**context)
+
+            results = (
+                ('cache', _measure(lambda: email_service.render_email(name, **context), args.iterations)),
+                ('flask', _measure(lambda: render_template(filename, **context), args.iterations)),
+                ('sem cache', _measure(cold_render, max(args.iterations // 20, 50))),
+            )
+            print(f"{name}:")
+            for label, per_second in results:
+                print(f"  {label:<10} {per_second:>12,.0f} renderizações/s")
+
+    email_service.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+# menu_io.py
+
+# Uso:
+#   python menu_io.py export cardapio.csv                      -> exporta o cardápio ('-' = saída padrão)
+#   python menu_io.py import cardapio.json                     -> importa em uma única transação
+#   python menu_io.py import cardapio.csv --dry-run            -> só valida e mostra o que seria feito
+#   python menu_io.py import cardapio.csv --deactivate-missing -> inativa produtos que não estão no arquivo
+#
+# O formato vem da extensão do arquivo (.csv ou .json) ou de --format.
+
+import argparse
+import json
+import os
+import sys
+
+os.environ.setdefault('OUTBOX_DISPATCHER_ENABLED', 'false')
+os.environ.setdefault('LOYALTY_EXPIRY_SCHEDULER_ENABLED', 'false')
+
+from src import create_app, database
+from src.services import email_service, menu_io_service
+
+
+def _format_for(path, explicit):
+    if explicit:
+        return explicit
+    return 'csv' if path.lower().endswith('.csv') else 'json'
+
+
+def _export(args):
+    fmt = _format_for(args.file, args.format)
+    generate = menu_io_service.export_csv if fmt == 'csv' else menu_io_service.export_json
+    with database.unit_of_work():
+        if args.file == '-':
+            for chunk in generate():
+                sys.stdout.write(chunk)
+        else:
+            with open(args.file, 'w', encoding='utf-8', newline='') as f:
+                for chunk in generate():
+                    f.write(chunk)
+            print(f"Cardápio exportado para {args.file}.")
+    return 0
+
+
+def _import(args):
+    fmt = _format_for(args.file, args.format)
+    with open(args.file, encoding='utf-8-sig', newline='') as f:
+        text = f.read()
+    try:
+        menu = menu_io_service.load_menu(text, fmt)
+        with database.unit_of_work():
+            summary = menu_io_service.import_menu(menu, user_id=args.user_id,
+                                                  deactivate_missing=args.deactivate_missing, dry_run=args.dry_run)
+    except menu_io_service.MenuImportError as e:
+        print(f"ERRO: {e}")
+        for error in e.errors:
+            print(f"  {error['where']}: {error['error']}")
+        return 1
+    if summary is None:
+        print("ERRO: falha ao importar o cardápio; nada foi alterado.")
+        return 1
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Importação/exportação do cardápio do Royal Burger (CSV ou JSON).")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    export = subparsers.add_parser('export', help="Exporta o cardápio atual.")
+    export.add_argument('file', help="Arquivo de saída ('-' para a saída padrão).")
+    export.add_argument('--format', choices=['csv', 'json'])
+
+    imp = subparsers.add_parser('import', help="Importa um cardápio em uma única transação.")
+    imp.add_argument('file')
+    imp.add_argument('--format', choices=['csv', 'json'])
+    imp.add_argument('--dry-run', action='store_true', help="Só valida; não grava nada.")
+    imp.add_argument('--deactivate-missing', action='store_true', help="Inativa os produtos ativos fora do arquivo.")
+    imp.add_argument('--user-id', type=int, help="Usuário gravado como criador das seções novas.")
+
+    args = parser.parse_args()
+    app = create_app()
+    try:
+        with app.app_context():
+            return _export(args) if args.command == 'export' else _import(args)
+    finally:
+        email_service.shutdown()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
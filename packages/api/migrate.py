@@ -0,0 +1,47 @@
+# migrate.py
+
+# Uso:
+#   python migrate.py                 -> aplica as migrações pendentes
+#   python migrate.py status          -> lista as migrações e se já foram aplicadas
+#   python migrate.py check-plans     -> falha se uma consulta quente fizer NATURAL scan em tabela grande
+
+import argparse
+import sys
+
+from src import migrations
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrações de schema do Royal Burger (Firebird).")
+    subparsers = parser.add_subparsers(dest='command')
+
+    up = subparsers.add_parser('up', help="Aplica as migrações pendentes (padrão).")
+    up.add_argument('--to', type=int, dest='target', help="Aplica somente até esta versão.")
+
+    subparsers.add_parser('status', help="Lista as migrações e se já foram aplicadas.")
+
+    check = subparsers.add_parser('check-plans', help="Verifica os planos das consultas quentes.")
+    check.add_argument('--min-rows', type=int, default=1000,
+                       help="Tabelas com menos linhas que isso podem ser lidas com NATURAL (padrão: 1000).")
+
+    args = parser.parse_args()
+
+    if args.command == 'status':
+        for version, name, applied in migrations.get_status():
+            print(f"[{'x' if applied else ' '}] {version:03d}_{name}")
+        return 0
+
+    if args.command == 'check-plans':
+        problems = migrations.check_query_plans(min_rows=args.min_rows)
+        for origin, table, plan in problems:
+            print(f"ERRO: {origin} faz NATURAL scan em {table}: {plan}")
+        return 1 if problems else 0
+
+    applied = migrations.migrate(target_version=getattr(args, 'target', None))
+    if not applied:
+        print("Nenhuma migração pendente.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
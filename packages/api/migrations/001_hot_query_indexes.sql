@@ -0,0 +1,23 @@
+-- 001: índices das consultas mais frequentes da API.
+-- Índices DESCENDING atendem os 'ORDER BY ... DESC' sem SORT.
+
+-- order_service.get_orders_by_user_id: WHERE USER_ID = ? ORDER BY CREATED_AT DESC
+CREATE DESCENDING INDEX IDX_ORDERS_USER_CREATED ON ORDERS (USER_ID, CREATED_AT);
+
+-- order_service.get_all_orders: ORDER BY CREATED_AT DESC
+CREATE DESCENDING INDEX IDX_ORDERS_CREATED ON ORDERS (CREATED_AT);
+
+-- notification_service.get_unread_notifications: WHERE USER_ID = ? AND IS_READ = FALSE ORDER BY CREATED_AT DESC
+CREATE DESCENDING INDEX IDX_NOTIFICATIONS_USER_READ ON NOTIFICATIONS (USER_ID, IS_READ, CREATED_AT);
+
+-- chat_service.get_chat_history: WHERE CHAT_ID = ? ORDER BY CREATED_AT
+CREATE INDEX IDX_MESSAGES_CHAT_CREATED ON MESSAGES (CHAT_ID, CREATED_AT);
+
+-- chat_service.get_chat_id_by_order: WHERE ORDER_ID = ?
+CREATE INDEX IDX_CHATS_ORDER ON CHATS (ORDER_ID);
+
+-- user_service.finalize_password_reset: WHERE TOKEN = ?
+CREATE INDEX IDX_PASSWORD_RESET_TOKENS_TOKEN ON PASSWORD_RESET_TOKENS (TOKEN);
+
+-- loyalty_service.get_loyalty_history: WHERE USER_ID = ? ORDER BY EARNED_AT DESC
+CREATE DESCENDING INDEX IDX_LOYALTY_HISTORY_USER_EARNED ON LOYALTY_POINTS_HISTORY (USER_ID, EARNED_AT);
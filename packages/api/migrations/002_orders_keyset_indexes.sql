@@ -0,0 +1,14 @@
+-- 002: índices para a paginação por chave (CREATED_AT DESC, ID DESC) das listagens de pedidos.
+-- Substituem os índices da 001, que não incluíam o ID usado como desempate.
+
+DROP INDEX IDX_ORDERS_CREATED;
+DROP INDEX IDX_ORDERS_USER_CREATED;
+
+-- order_service.get_all_orders (sem filtros / filtro de período)
+CREATE DESCENDING INDEX IDX_ORDERS_CREATED_ID ON ORDERS (CREATED_AT, ID);
+
+-- order_service.get_orders_by_user_id e filtro por cliente em get_all_orders
+CREATE DESCENDING INDEX IDX_ORDERS_USER_CREATED_ID ON ORDERS (USER_ID, CREATED_AT, ID);
+
+-- order_service.get_all_orders com filtro de status (painel do turno)
+CREATE DESCENDING INDEX IDX_ORDERS_STATUS_CREATED_ID ON ORDERS (STATUS, CREATED_AT, ID);
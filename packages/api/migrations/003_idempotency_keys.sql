@@ -0,0 +1,14 @@
+-- 003: chaves de idempotência do POST /api/orders (idempotency_service).
+-- A PK (USER_ID, IDEMPOTENCY_KEY) é o que faz uma repetição concorrente esperar
+-- a transação da primeira tentativa em vez de criar um segundo pedido.
+
+CREATE TABLE IDEMPOTENCY_KEYS (
+    USER_ID INTEGER NOT NULL,
+    IDEMPOTENCY_KEY VARCHAR(255) NOT NULL,
+    REQUEST_HASH CHAR(64) NOT NULL,
+    RESPONSE_STATUS SMALLINT,
+    RESPONSE_BODY BLOB SUB_TYPE TEXT,
+    CREATED_AT TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL,
+    EXPIRES_AT TIMESTAMP NOT NULL,
+    CONSTRAINT PK_IDEMPOTENCY_KEYS PRIMARY KEY (USER_ID, IDEMPOTENCY_KEY)
+);
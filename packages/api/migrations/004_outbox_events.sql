@@ -0,0 +1,20 @@
+-- 004: outbox transacional dos efeitos colaterais de pedidos (outbox_service).
+-- O evento é gravado na mesma transação da mudança no pedido; o despachante
+-- em segundo plano entrega notificação, e-mail e Socket.IO depois do commit.
+
+CREATE TABLE OUTBOX_EVENTS (
+    ID INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    EVENT_TYPE VARCHAR(50) NOT NULL,
+    PAYLOAD BLOB SUB_TYPE TEXT NOT NULL,
+    STATUS VARCHAR(20) DEFAULT 'pending' NOT NULL,
+    CHANNELS_DONE VARCHAR(100) DEFAULT '' NOT NULL,
+    ATTEMPTS SMALLINT DEFAULT 0 NOT NULL,
+    NEXT_ATTEMPT_AT TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL,
+    LOCKED_AT TIMESTAMP,
+    LAST_ERROR VARCHAR(1000),
+    CREATED_AT TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL,
+    PROCESSED_AT TIMESTAMP
+);
+
+-- Busca do próximo lote do despachante (pendentes já vencidos) e recuperação de 'processing' travados
+CREATE INDEX IDX_OUTBOX_STATUS_NEXT ON OUTBOX_EVENTS (STATUS, NEXT_ATTEMPT_AT);
@@ -0,0 +1,10 @@
+-- 005: versão do cardápio (menu_service). Toda escrita em produtos, seções e
+-- ingredientes incrementa VERSION na própria transação; o snapshot do cardápio
+-- só é remontado quando a versão muda.
+
+CREATE TABLE MENU_VERSION (
+    ID SMALLINT NOT NULL PRIMARY KEY,
+    VERSION BIGINT DEFAULT 1 NOT NULL
+);
+
+INSERT INTO MENU_VERSION (ID, VERSION) VALUES (1, 1);
@@ -0,0 +1,6 @@
+-- 006: estoque dos ingredientes (ingredient_service). STOCK_QUANTITY nulo = sem
+-- controle de estoque (só o IS_AVAILABLE manual). O CHECK faz a reserva de um
+-- pedido falhar inteira se algum ingrediente fosse ficar negativo.
+
+ALTER TABLE INGREDIENTS ADD STOCK_QUANTITY NUMERIC(12, 3)
+    CONSTRAINT CHK_INGREDIENTS_STOCK CHECK (STOCK_QUANTITY >= 0);
@@ -0,0 +1,10 @@
+-- 007: versão dos dados de usuários (user_cache). update_user, deactivate_user e
+-- finalize_password_reset incrementam VERSION na própria transação; os processos
+-- com USER_CACHE_SYNC_INTERVAL > 0 esvaziam o cache de usuários quando ela muda.
+
+CREATE TABLE USER_CACHE_VERSION (
+    ID SMALLINT NOT NULL PRIMARY KEY,
+    VERSION BIGINT DEFAULT 1 NOT NULL
+);
+
+INSERT INTO USER_CACHE_VERSION (ID, VERSION) VALUES (1, 1);
@@ -0,0 +1,24 @@
+-- 008: estado compartilhado do limitador de tentativas de login e de recuperação de
+-- senha (rate_limiter.DatabaseBackend, com RATE_LIMIT_BACKEND=database).
+-- Instantes em segundos desde a época (time.time()), iguais em todos os workers.
+
+-- Janela deslizante aproximada: contagem da janela fixa atual e da anterior
+CREATE TABLE RATE_LIMIT_WINDOWS (
+    BUCKET_KEY VARCHAR(255) NOT NULL PRIMARY KEY,
+    WINDOW_INDEX BIGINT NOT NULL,
+    CURRENT_COUNT INTEGER NOT NULL,
+    PREVIOUS_COUNT INTEGER NOT NULL,
+    EXPIRES_AT DOUBLE PRECISION NOT NULL
+);
+
+-- Falhas de login seguidas por e-mail e o bloqueio progressivo resultante
+CREATE TABLE RATE_LIMIT_FAILURES (
+    BUCKET_KEY VARCHAR(255) NOT NULL PRIMARY KEY,
+    FAILURES INTEGER NOT NULL,
+    LOCKED_UNTIL DOUBLE PRECISION NOT NULL,
+    EXPIRES_AT DOUBLE PRECISION NOT NULL
+);
+
+-- Limpeza periódica: DELETE ... WHERE EXPIRES_AT <= ?
+CREATE INDEX IDX_RATE_LIMIT_WINDOWS_EXPIRES ON RATE_LIMIT_WINDOWS (EXPIRES_AT);
+CREATE INDEX IDX_RATE_LIMIT_FAILURES_EXPIRES ON RATE_LIMIT_FAILURES (EXPIRES_AT);
@@ -0,0 +1,12 @@
+-- 009: índices da listagem de clientes (user_service.search_customers).
+-- A lista é ordenada por UPPER(FULL_NAME), ID; o índice de expressão atende a
+-- ordem, a paginação por chave e a busca por prefixo do nome sem SORT.
+
+CREATE INDEX IDX_USERS_NAME_UPPER ON USERS COMPUTED BY (UPPER(FULL_NAME));
+
+-- Busca por prefixo do e-mail: LOWER(EMAIL) STARTING WITH ?
+CREATE INDEX IDX_USERS_EMAIL_LOWER ON USERS COMPUTED BY (LOWER(EMAIL));
+
+-- Busca por prefixo do CPF ou do telefone (só dígitos): CPF STARTING WITH ? OR PHONE STARTING WITH ?
+CREATE INDEX IDX_USERS_CPF ON USERS (CPF);
+CREATE INDEX IDX_USERS_PHONE ON USERS (PHONE);
@@ -0,0 +1,12 @@
+-- 010: progresso da expiração diária de pontos (loyalty_service.expire_inactive_accounts).
+-- Cada lote confirmado grava aqui o último USER_ID processado na mesma transação;
+-- uma execução interrompida retoma do ponto em que parou no mesmo dia.
+
+CREATE TABLE LOYALTY_EXPIRY_RUNS (
+    RUN_DATE DATE NOT NULL PRIMARY KEY,
+    LAST_USER_ID INTEGER DEFAULT 0 NOT NULL,
+    ACCOUNTS_EXPIRED INTEGER DEFAULT 0 NOT NULL,
+    POINTS_EXPIRED BIGINT DEFAULT 0 NOT NULL,
+    STARTED_AT TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL,
+    FINISHED_AT TIMESTAMP
+);
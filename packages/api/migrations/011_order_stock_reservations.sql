@@ -0,0 +1,11 @@
+-- 011: o que cada pedido realmente baixou do estoque (ingredient_service).
+-- O cancelamento devolve só estas linhas e as apaga: um segundo cancelamento
+-- não devolve nada, e pedidos anteriores ao controle de estoque não têm linhas.
+
+CREATE TABLE ORDER_STOCK_RESERVATIONS (
+    ORDER_ID INTEGER NOT NULL,
+    INGREDIENT_ID INTEGER NOT NULL,
+    QUANTITY NUMERIC(12, 3) NOT NULL,
+    CONSTRAINT PK_ORDER_STOCK_RESERVATIONS PRIMARY KEY (ORDER_ID, INGREDIENT_ID),
+    CONSTRAINT FK_STOCK_RESERVATIONS_ORDER FOREIGN KEY (ORDER_ID) REFERENCES ORDERS (ID) ON DELETE CASCADE
+);
@@ -0,0 +1,11 @@
+-- 012: busca de clientes por CPF/telefone (user_service._customer_search_filter).
+-- CPF e PHONE ficam gravados como o cliente digitou ("123.456.789-09", "(11) 9 8765-4321"),
+-- mas a busca usa só os dígitos: os índices de expressão sem a pontuação substituem os
+-- da 009, que só atendiam valores já gravados sem formatação. A expressão precisa ser
+-- igual à de user_service._digits_only para o otimizador usar o índice.
+
+DROP INDEX IDX_USERS_CPF;
+DROP INDEX IDX_USERS_PHONE;
+
+CREATE INDEX IDX_USERS_CPF_DIGITS ON USERS COMPUTED BY (REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(CPF, '.', ''), '-', ''), ' ', ''), '(', ''), ')', ''), '/', ''), '+', ''));
+CREATE INDEX IDX_USERS_PHONE_DIGITS ON USERS COMPUTED BY (REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(PHONE, '.', ''), '-', ''), ' ', ''), '(', ''), ')', ''), '/', ''), '+', ''));
@@ -0,0 +1,15 @@
+-- 013: log de invalidações do cache de usuários (user_cache), no lugar da linha única
+-- USER_CACHE_VERSION da 007. Quem altera um usuário só INSERE uma linha na própria
+-- transação (só com USER_CACHE_SYNC_INTERVAL > 0): escritas concorrentes não disputam
+-- mais a mesma linha. Os outros processos leem as linhas recentes e descartam só esses usuários.
+
+CREATE TABLE USER_CACHE_INVALIDATIONS (
+    ID BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    USER_ID INTEGER NOT NULL,
+    CREATED_AT TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL
+);
+
+-- Leitura das invalidações recentes e limpeza das antigas
+CREATE INDEX IDX_USER_CACHE_INV_CREATED ON USER_CACHE_INVALIDATIONS (CREATED_AT);
+
+DROP TABLE USER_CACHE_VERSION;
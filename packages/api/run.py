@@ -1,5 +1,10 @@
 # run.py
 
+# O eventlet precisa "remendar" a biblioteca padrão antes de qualquer outro import,
+# para que locks, sockets e threads cooperem com o hub do servidor
+import eventlet
+eventlet.monkey_patch()
+
 # Importamos o app e o socketio do nosso pacote src
 from src import create_app, socketio
 
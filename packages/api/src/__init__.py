@@ -1,6 +1,6 @@
 # src/__init__.py
 
-from flask import Flask
+from flask import Flask, jsonify
 from flask_jwt_extended import JWTManager
 from flask_socketio import SocketIO
 from flask_mail import Mail
@@ -25,6 +25,50 @@ def create_app():
     socketio.init_app(app)
     mail.init_app(app)
 
+    # Chamadas ao fdb (cliente em C, bloqueante) vão para threads nativas quando
+    # o servidor roda sob o eventlet, para não congelar HTTP e WebSockets
+    from . import database, db_executor
+    threadpool = app.config['DB_THREADPOOL']
+    db_executor.configure(
+        enabled=threadpool == 'true' or (threadpool == 'auto' and socketio.async_mode == 'eventlet'),
+        num_threads=app.config['DB_THREADPOOL_SIZE'],
+        slow_call_ms=app.config['DB_SLOW_CALL_MS'],
+    )
+
+    # O bcrypt (centenas de ms de CPU por senha) usa as mesmas threads nativas, com
+    # limite de hashes simultâneos e de fila; saturado, a requisição recebe 503
+    from . import password_hasher
+    password_hasher.configure(
+        offload=db_executor.is_offloading(),
+        rounds=app.config['PASSWORD_BCRYPT_ROUNDS'],
+        workers=app.config['PASSWORD_HASH_WORKERS'],
+        max_pending=app.config['PASSWORD_HASH_MAX_PENDING'],
+        wait_timeout=app.config['PASSWORD_HASH_TIMEOUT'],
+    )
+
+    @app.errorhandler(password_hasher.PasswordHasherBusy)
+    def password_hasher_busy(e):
+        response = jsonify({"error": "Servidor ocupado. Tente novamente em instantes."})
+        response.headers['Retry-After'] = '1'
+        return response, 503
+
+    # Limites de tentativas de login/recuperação de senha (antes de banco e bcrypt)
+    from . import rate_limiter
+    rate_limiter.configure(app.config)
+
+    # Pool de conexões com o Firebird (idempotente, pré-aquece na primeira chamada)
+    # e uma unidade de trabalho (conexão + transação) compartilhada por requisição
+    database.init_pool()
+    database.init_app(app)
+
+    # Worker de e-mail de vida longa (idempotente: só o primeiro create_app() o inicia)
+    from .services import email_service
+    email_service.init_app(app)
+
+    # Contagem/tempo de SQL por requisição e log de consultas lentas
+    from . import sql_metrics
+    sql_metrics.init_app(app)
+
     # --- Registro de Blueprints (REST API) ---
     # CORREÇÃO: O prefixo de todas as rotas deve ser '/api' para o mundo exterior.
 
@@ -40,6 +84,9 @@ def create_app():
     from .routes.order_routes import order_bp
     app.register_blueprint(order_bp, url_prefix='/api/orders')
 
+    from .routes.menu_routes import menu_bp
+    app.register_blueprint(menu_bp, url_prefix='/api/menu')
+
     from .routes.section_routes import section_bp
     app.register_blueprint(section_bp, url_prefix='/api/sections')
 
@@ -56,7 +103,17 @@ def create_app():
     app.register_blueprint(swaggerui_blueprint, url_prefix='/api/docs')
 
     # --- Registro de Eventos de Socket ---
-    from .sockets import chat_events
+    from .sockets import chat_events, menu_events, order_events
+
+    # --- Despachante do outbox (notificações, e-mails e Socket.IO dos pedidos) ---
+    if app.config['OUTBOX_DISPATCHER_ENABLED']:
+        from .services import outbox_service
+        outbox_service.start_dispatcher(app)
+
+    # --- Expiração diária dos pontos de fidelidade vencidos ---
+    if app.config['LOYALTY_EXPIRY_SCHEDULER_ENABLED']:
+        from .services import loyalty_service
+        loyalty_service.start_expiry_scheduler(app)
 
     # --- Rota de Verificação de Saúde ---
     @app.route('/api/health')
@@ -21,10 +21,91 @@ class Config:
     FIREBIRD_USER = 'SYSDBA'
     FIREBIRD_PASSWORD = 'sysdba'
 
+    # --- Pool de Conexões ---
+    DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', 10))
+    DB_POOL_MIN_SIZE = int(os.environ.get('DB_POOL_MIN_SIZE', 2))  # Conexões abertas já no create_app()
+    DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 5))  # Segundos esperando conexão livre
+    DB_POOL_MAX_LIFETIME = int(os.environ.get('DB_POOL_MAX_LIFETIME', 1800))  # Segundos até reciclar
+    DB_POOL_PING_AFTER = int(os.environ.get('DB_POOL_PING_AFTER', 30))  # Ociosa há mais que isso = testa antes
+    DB_STATEMENT_CACHE_SIZE = int(os.environ.get('DB_STATEMENT_CACHE_SIZE', 100))  # Statements preparados por conexão
+
+    # --- Execução das chamadas ao banco fora do hub do eventlet ---
+    # 'auto' ativa quando o Socket.IO roda em modo eventlet; 'true'/'false' forçam
+    DB_THREADPOOL = os.environ.get('DB_THREADPOOL', 'auto').lower()
+    DB_THREADPOOL_SIZE = int(os.environ.get('DB_THREADPOOL_SIZE', 10))
+    DB_SLOW_CALL_MS = int(os.environ.get('DB_SLOW_CALL_MS', 500))  # 0 desativa o aviso de chamada lenta
+
+    # --- Hash de senhas (bcrypt) ---
+    PASSWORD_BCRYPT_ROUNDS = int(os.environ.get('PASSWORD_BCRYPT_ROUNDS', 12))  # Custo; hashes antigos são refeitos no login
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))  # Hashes simultâneos (saem do DB_THREADPOOL_SIZE)
+    PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 32))  # Acima disso, 503
+    PASSWORD_HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 5))  # Segundos esperando vaga antes do 503
+
+    # --- Instrumentação de SQL ---
+    SQL_SLOW_QUERY_MS = int(os.environ.get('SQL_SLOW_QUERY_MS', 200))  # 0 desativa o log de consultas lentas
+    SQL_SLOW_QUERY_LOG = os.environ.get('SQL_SLOW_QUERY_LOG', 'slow_queries.log')
+    SQL_N_PLUS_ONE_THRESHOLD = int(os.environ.get('SQL_N_PLUS_ONE_THRESHOLD', 10))  # Mesmo SQL N+ vezes na requisição
+
+    # --- Idempotência do POST /api/orders ---
+    IDEMPOTENCY_KEY_TTL_HOURS = int(os.environ.get('IDEMPOTENCY_KEY_TTL_HOURS', 24))  # Tempo que a resposta fica guardada
+
+    # --- Outbox dos efeitos colaterais de pedidos (notificação, e-mail, Socket.IO) ---
+    OUTBOX_DISPATCHER_ENABLED = os.environ.get('OUTBOX_DISPATCHER_ENABLED', 'true').lower() in ['true', '1', 't']
+    OUTBOX_POLL_INTERVAL = float(os.environ.get('OUTBOX_POLL_INTERVAL', 2))  # Segundos entre buscas sem eventos
+    OUTBOX_BATCH_SIZE = int(os.environ.get('OUTBOX_BATCH_SIZE', 50))  # Eventos por lote (máx. 128)
+    OUTBOX_MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', 8))  # Depois disso o evento fica como 'failed'
+    OUTBOX_RETRY_BASE_SECONDS = int(os.environ.get('OUTBOX_RETRY_BASE_SECONDS', 5))  # Espera dobra a cada tentativa
+    OUTBOX_LOCK_TIMEOUT = int(os.environ.get('OUTBOX_LOCK_TIMEOUT', 300))  # 'processing' há mais tempo volta à fila
+
+    # --- Estoque de ingredientes ---
+    STOCK_RESERVE_MAX_RETRIES = int(os.environ.get('STOCK_RESERVE_MAX_RETRIES', 3))  # Novas tentativas da reserva após conflito com outro pedido
+
+    # --- Tamanho máximo do carrinho (o pedido é gravado em um EXECUTE BLOCK do tamanho do carrinho) ---
+    ORDER_MAX_ITEMS = int(os.environ.get('ORDER_MAX_ITEMS', 50))  # Itens por pedido
+    ORDER_MAX_EXTRAS_PER_ITEM = int(os.environ.get('ORDER_MAX_EXTRAS_PER_ITEM', 20))  # Extras por item
+
+    # --- Limite de tentativas de login e de recuperação de senha ---
+    RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() in ['true', '1', 't']
+    RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'memory')  # 'memory', 'database' (vários workers) ou 'modulo:Classe'
+    RATE_LIMIT_EVICT_INTERVAL = int(os.environ.get('RATE_LIMIT_EVICT_INTERVAL', 60))  # Segundos entre limpezas das chaves vencidas
+    LOGIN_WINDOW_SECONDS = int(os.environ.get('LOGIN_WINDOW_SECONDS', 60))
+    LOGIN_LIMIT_PER_IP = int(os.environ.get('LOGIN_LIMIT_PER_IP', 20))  # Tentativas por IP na janela
+    LOGIN_LIMIT_PER_EMAIL = int(os.environ.get('LOGIN_LIMIT_PER_EMAIL', 10))  # Tentativas por e-mail na janela
+    LOGIN_LOCKOUT_THRESHOLD = int(os.environ.get('LOGIN_LOCKOUT_THRESHOLD', 5))  # Senhas erradas seguidas até o 1º bloqueio
+    LOGIN_LOCKOUT_BASE_SECONDS = int(os.environ.get('LOGIN_LOCKOUT_BASE_SECONDS', 30))  # Dobra a cada nova falha
+    LOGIN_LOCKOUT_MAX_SECONDS = int(os.environ.get('LOGIN_LOCKOUT_MAX_SECONDS', 900))  # Também o tempo até esquecer as falhas
+    PASSWORD_RESET_WINDOW_SECONDS = int(os.environ.get('PASSWORD_RESET_WINDOW_SECONDS', 900))
+    PASSWORD_RESET_LIMIT_PER_IP = int(os.environ.get('PASSWORD_RESET_LIMIT_PER_IP', 10))
+    PASSWORD_RESET_LIMIT_PER_EMAIL = int(os.environ.get('PASSWORD_RESET_LIMIT_PER_EMAIL', 3))
+
+    # --- Listagem de clientes (GET /api/customers) ---
+    CUSTOMER_COUNT_LIMIT = int(os.environ.get('CUSTOMER_COUNT_LIMIT', 1000))  # Acima disso o total é informado como "mais de"
+
+    # --- Cache de usuários por ID (user_service.get_user_by_id) ---
+    USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', 1000))  # Usuários em memória; 0 desativa o cache
+    USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL', 60))  # Segundos até reler um usuário do banco
+    USER_CACHE_SYNC_INTERVAL = float(os.environ.get('USER_CACHE_SYNC_INTERVAL', 0))  # Segundos entre checagens de escritas de outros processos; 0 desativa
+
+    # --- Expiração diária de pontos de fidelidade ---
+    LOYALTY_EXPIRY_SCHEDULER_ENABLED = os.environ.get('LOYALTY_EXPIRY_SCHEDULER_ENABLED', 'true').lower() in ['true', '1', 't']
+    LOYALTY_EXPIRY_TIME = os.environ.get('LOYALTY_EXPIRY_TIME', '03:00')  # Horário (HH:MM, hora local) da execução diária
+    LOYALTY_EXPIRY_CHUNK_SIZE = int(os.environ.get('LOYALTY_EXPIRY_CHUNK_SIZE', 500))  # Contas por transação
+    LOYALTY_EXPIRY_MAX_RETRIES = int(os.environ.get('LOYALTY_EXPIRY_MAX_RETRIES', 3))  # Novas tentativas de um lote após conflito
+
+    # --- Snapshot do cardápio (GET /api/menu, /api/products, /api/sections) ---
+    MENU_VERSION_CHECK_INTERVAL = float(os.environ.get('MENU_VERSION_CHECK_INTERVAL', 2))  # Segundos entre checagens da versão
+
     # --- Configurações do Flask-Mail ---
     MAIL_SERVER = os.environ.get('MAIL_SERVER', 'smtp.gmail.com')
     MAIL_PORT = int(os.environ.get('MAIL_PORT', 587))
     MAIL_USE_TLS = os.environ.get('MAIL_USE_TLS', 'true').lower() in ['true', '1', 't']
     MAIL_USERNAME = os.environ.get('MAIL_USERNAME')
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
-    MAIL_DEFAULT_SENDER = ('Royal Burger', MAIL_USERNAME)
\ No newline at end of file
+    MAIL_DEFAULT_SENDER = ('Royal Burger', MAIL_USERNAME)
+
+    # --- Worker de e-mail (fila limitada + conexão SMTP reaproveitada) ---
+    MAIL_QUEUE_SIZE = int(os.environ.get('MAIL_QUEUE_SIZE', 500))  # E-mails aguardando envio
+    MAIL_QUEUE_PUT_TIMEOUT = float(os.environ.get('MAIL_QUEUE_PUT_TIMEOUT', 2))  # Segundos esperando vaga na fila
+    MAIL_BATCH_SIZE = int(os.environ.get('MAIL_BATCH_SIZE', 20))  # E-mails enviados por lote na mesma conexão
+    MAIL_SMTP_IDLE_TIMEOUT = float(os.environ.get('MAIL_SMTP_IDLE_TIMEOUT', 30))  # Fecha a conexão ociosa após isso
+    MAIL_SHUTDOWN_TIMEOUT = float(os.environ.get('MAIL_SHUTDOWN_TIMEOUT', 10))  # Espera para esvaziar a fila ao sair
\ No newline at end of file
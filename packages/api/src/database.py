@@ -1,23 +1,732 @@
 # src/database.py
 
+import atexit
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
 import fdb
+from flask import g, has_app_context, jsonify, make_response
+from . import db_executor, sql_metrics
 from .config import Config
 
+
+class PoolTimeoutError(fdb.OperationalError):
+    """
+    Nenhuma conexão do pool ficou livre dentro do tempo de espera.
+    Herda de fdb.Error para cair nos mesmos 'except fdb.Error' dos services.
+    """
+
+
+def _connect():
+    """Abre uma conexão física nova com o Firebird."""
+    # CORREÇÃO: Usamos os parâmetros separados em vez de um DSN
+    return db_executor.run(
+        'connect',
+        fdb.connect,
+        host=Config.FIREBIRD_HOST,
+        port=Config.FIREBIRD_PORT,
+        database=Config.DATABASE_PATH,  # Usamos o caminho do arquivo aqui
+        user=Config.FIREBIRD_USER,
+        password=Config.FIREBIRD_PASSWORD,
+        charset='UTF-8'
+    )
+
+
+# Tamanhos fixos para listas IN (?, ?, ...): listas de tamanhos diferentes caem no
+# mesmo SQL e aproveitam o cache de statements preparados
+_IN_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+
+def in_placeholders(values):
+    """
+    Monta os placeholders de um 'IN (...)' com aridade arredondada para o próximo
+    tamanho de _IN_BUCKETS, repetindo o último valor (o que não altera o resultado).
+    Retorna (placeholders, parametros).
+    """
+    values = list(values)
+    if not values:
+        raise ValueError("A lista do IN não pode ser vazia.")
+    size = next((bucket for bucket in _IN_BUCKETS if bucket >= len(values)), len(values))
+    values.extend([values[-1]] * (size - len(values)))
+    return ', '.join(['?'] * size), tuple(values)
+
+
+# --- Cache de statements preparados ---
+
+_statement_stats_lock = threading.Lock()
+_statement_stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+
+def _count_statement(key):
+    with _statement_stats_lock:
+        _statement_stats[key] += 1
+
+
+def get_statement_cache_stats():
+    """Retorna os contadores globais de acerto/erro do cache de statements."""
+    with _statement_stats_lock:
+        return dict(_statement_stats)
+
+
+class _CachedStatement:
+    """Statement preparado (cursor.prep) e o cursor dono dele; o fdb não deixa outro cursor executá-lo."""
+
+    def __init__(self, cursor, prepared):
+        self.cursor = cursor
+        self.prepared = prepared
+        self.owner = None  # PooledCursor que está usando o statement
+
+
+class StatementCache:
+    """
+    LRU de statements preparados de uma conexão física, indexado pelo texto do SQL.
+    Assim o Firebird não re-analisa e re-planeja o mesmo SQL a cada execução.
+    """
+
+    def __init__(self, raw, capacity):
+        self._raw = raw
+        self.capacity = capacity
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def checkout(self, sql, owner):
+        """
+        Retorna o statement preparado para o SQL, preparando-o se preciso.
+        Retorna None se o statement já estiver em uso por outro cursor desta conexão.
+        """
+        stmt = self._entries.get(sql)
+        if stmt is not None:
+            if stmt.owner is not None:
+                return None
+            self._entries.move_to_end(sql)
+            self.hits += 1
+            _count_statement("hits")
+        else:
+            cursor = self._raw.cursor()
+            prepared = db_executor.run('prepare', cursor.prep, sql)
+            stmt = self._entries[sql] = _CachedStatement(cursor, prepared)
+            self.misses += 1
+            _count_statement("misses")
+            self._evict()
+        stmt.owner = owner
+        return stmt
+
+    @staticmethod
+    def release(stmt, owner):
+        if stmt.owner is owner:
+            stmt.owner = None
+
+    def reset_checkouts(self):
+        """Libera todos os statements quando a conexão volta ao pool."""
+        for stmt in self._entries.values():
+            stmt.owner = None
+
+    def _evict(self):
+        while len(self._entries) > self.capacity:
+            victim = next((sql for sql, stmt in self._entries.items() if stmt.owner is None), None)
+            if victim is None:
+                return
+            stmt = self._entries.pop(victim)
+            try:
+                stmt.cursor.close()
+            except fdb.Error:
+                pass
+            _count_statement("evictions")
+
+
+class PooledCursor:
+    """
+    Cursor entregue aos services. Executa o SQL pelo cache de statements preparados
+    da conexão, manda as chamadas bloqueantes para o db_executor e registra tempo
+    e linhas de cada statement no sql_metrics.
+    Atributos como rowcount e description vêm do cursor que executou o último SQL.
+    """
+
+    def __init__(self, raw, statements):
+        self._raw = raw
+        self._statements = statements
+        self._own_cursor = None
+        self._stmt = None
+        self._current = None
+        self._record = None
+
+    def execute(self, operation, parameters=None, cache=True):
+        """
+        Executa o SQL. Com cache=False o statement não entra no cache da conexão: para SQL
+        montado conforme a entrada (ex.: o tamanho do carrinho), que quase nunca se repete
+        e só tiraria do LRU os statements realmente reaproveitados.
+        """
+        self._release_statement()
+        started = time.perf_counter()
+        stmt = None
+        if cache and self._statements is not None and isinstance(operation, str):
+            stmt = self._statements.checkout(operation, self)
+        if stmt is not None:
+            self._stmt = stmt
+            cursor, target = stmt.cursor, stmt.prepared
+        else:
+            cursor, target = self._get_own_cursor(), operation
+
+        if parameters is None:
+            db_executor.run('execute', cursor.execute, target)
+        else:
+            db_executor.run('execute', cursor.execute, target, parameters)
+        self._current = cursor
+        self._record = sql_metrics.start(operation, time.perf_counter() - started)
+        return self
+
+    def executemany(self, operation, seq_of_parameters):
+        self._release_statement()
+        started = time.perf_counter()
+        cursor = self._get_own_cursor()
+        db_executor.run('executemany', cursor.executemany, operation, seq_of_parameters)
+        self._current = cursor
+        self._record = sql_metrics.start(operation, time.perf_counter() - started)
+        return self
+
+    def fetchone(self):
+        return self._fetch(self._active_cursor().fetchone)
+
+    def fetchmany(self, size=None):
+        cursor = self._active_cursor()
+        if size is None:
+            return self._fetch(cursor.fetchmany)
+        return self._fetch(cursor.fetchmany, size)
+
+    def fetchall(self):
+        return self._fetch(self._active_cursor().fetchall)
+
+    def prep(self, operation):
+        return db_executor.run('prepare', self._get_own_cursor().prep, operation)
+
+    def callproc(self, procname, parameters=None):
+        self._release_statement()
+        cursor = self._get_own_cursor()
+        self._current = cursor
+        return db_executor.run('callproc', cursor.callproc, procname, parameters)
+
+    def close(self):
+        self._release_statement()
+        if self._own_cursor is not None:
+            self._own_cursor.close()
+
+    def _fetch(self, fn, *args):
+        started = time.perf_counter()
+        result = db_executor.run('fetch', fn, *args)
+        if self._record is not None:
+            if result is None:
+                rows = 0
+            elif isinstance(result, list):
+                rows = len(result)
+            else:
+                rows = 1
+            sql_metrics.add_fetch(self._record, rows, time.perf_counter() - started)
+        return result
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def __getattr__(self, name):
+        return getattr(self._active_cursor(), name)
+
+    def __del__(self):
+        self._release_statement()
+
+    def _get_own_cursor(self):
+        if self._own_cursor is None:
+            self._own_cursor = self._raw.cursor()
+        return self._own_cursor
+
+    def _active_cursor(self):
+        return self._current if self._current is not None else self._get_own_cursor()
+
+    def _release_statement(self):
+        record, self._record = getattr(self, '_record', None), None
+        sql_metrics.finish(record)
+        stmt, self._stmt = getattr(self, '_stmt', None), None
+        if stmt is not None:
+            StatementCache.release(stmt, self)
+
+
+class _PoolEntry:
+    """Conexão física guardada no pool, com os tempos usados para reciclagem e seu cache de statements."""
+
+    def __init__(self, raw, statement_cache_size=0):
+        self.raw = raw
+        self.created_at = time.monotonic()
+        self.last_used_at = self.created_at
+        self.statements = StatementCache(raw, statement_cache_size) if statement_cache_size else None
+
+
+class PooledConnection:
+    """
+    Conexão emprestada do pool.
+    Expõe a mesma interface da conexão do fdb, mas close() devolve a conexão
+    ao pool em vez de fechá-la. Também pode ser usada com 'with'.
+    """
+
+    def __init__(self, pool, entry):
+        self._pool = pool
+        self._entry = entry
+
+    @property
+    def raw(self):
+        if self._entry is None:
+            raise fdb.ProgrammingError("Conexão já devolvida ao pool.")
+        return self._entry.raw
+
+    # As operações que vão até o servidor passam pelo db_executor, para não
+    # bloquear o hub do eventlet.
+
+    def cursor(self):
+        return PooledCursor(self.raw, self._entry.statements if self._entry else None)
+
+    def begin(self):
+        db_executor.run('begin', self.raw.begin)
+
+    def commit(self, retaining=False):
+        db_executor.run('commit', self.raw.commit, retaining=retaining)
+
+    def rollback(self, retaining=False, savepoint=None):
+        db_executor.run('rollback', self.raw.rollback, retaining=retaining, savepoint=savepoint)
+
+    def savepoint(self, name):
+        db_executor.run('savepoint', self.raw.savepoint, name)
+
+    def execute_immediate(self, sql):
+        db_executor.run('execute', self.raw.execute_immediate, sql)
+
+    def close(self):
+        """Devolve a conexão ao pool. Chamadas repetidas são ignoradas."""
+        entry, self._entry = self._entry, None
+        if entry is not None:
+            self._pool.release(entry)
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None and self._entry is not None:
+            try:
+                self.rollback()
+            except fdb.Error:
+                pass
+        self.close()
+        return False
+
+
+class ConnectionPool:
+    """
+    Pool limitado de conexões Firebird.
+    - max_size: máximo de conexões abertas (ociosas + emprestadas);
+    - timeout: segundos que acquire() espera por uma conexão livre;
+    - max_lifetime: conexões mais velhas que isso são recicladas;
+    - ping_after: conexões ociosas há mais que isso são testadas antes do uso;
+    - statement_cache_size: statements preparados mantidos por conexão (0 desativa).
+    """
+
+    def __init__(self, connect, max_size, min_size=0, timeout=5.0, max_lifetime=1800, ping_after=30,
+                 statement_cache_size=0):
+        self._connect = connect
+        self.max_size = max_size
+        self.min_size = min(min_size, max_size)
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.ping_after = ping_after
+        self.statement_cache_size = statement_cache_size
+
+        self._cond = threading.Condition()
+        self._idle = deque()
+        self._size = 0
+        self._closed = False
+
+    # --- Ciclo de vida ---
+
+    def prewarm(self):
+        """Abre conexões até atingir min_size, para o primeiro pico não pagar o connect."""
+        opened = 0
+        while True:
+            with self._cond:
+                if self._closed or self._size >= self.min_size:
+                    break
+                self._size += 1
+            try:
+                entry = self._open_entry()
+            except fdb.Error:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._idle.append(entry)
+                self._cond.notify()
+            opened += 1
+        return opened
+
+    def close(self):
+        """Fecha todas as conexões ociosas e impede novos empréstimos."""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = list(self._idle), deque()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for entry in idle:
+            self._close_raw(entry)
+
+    # --- Empréstimo e devolução ---
+
+    def acquire(self, timeout=None):
+        """
+        Empresta uma conexão saudável do pool.
+        Lança PoolTimeoutError se nenhuma ficar livre dentro do tempo de espera.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+
+        while True:
+            entry = self._take_slot(deadline, timeout)
+            if entry is None:
+                # Slot novo: abrimos a conexão fora do lock
+                try:
+                    entry = self._open_entry()
+                except Exception:
+                    self._free_slot()
+                    raise
+                return PooledConnection(self, entry)
+
+            if self._is_expired(entry) or not self._is_healthy(entry):
+                self._discard(entry)
+                continue
+
+            return PooledConnection(self, entry)
+
+    def release(self, entry):
+        """Recebe de volta uma conexão, desfazendo qualquer transação pendente."""
+        broken = entry.raw.closed
+        if not broken:
+            try:
+                if entry.raw.main_transaction.active:
+                    db_executor.run('rollback', entry.raw.rollback)
+            except fdb.Error:
+                broken = True
+
+        if broken or self._closed or self._is_expired(entry):
+            self._discard(entry)
+            return
+
+        if entry.statements is not None:
+            entry.statements.reset_checkouts()
+        entry.last_used_at = time.monotonic()
+        with self._cond:
+            self._idle.append(entry)
+            self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            return {"size": self._size, "idle": len(self._idle), "max_size": self.max_size}
+
+    # --- Auxiliares ---
+
+    def _take_slot(self, deadline, timeout):
+        """Retorna uma entrada ociosa, ou None quando reservou espaço para abrir uma nova."""
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise fdb.OperationalError("O pool de conexões foi encerrado.")
+                if self._idle:
+                    # LIFO: reutiliza a conexão usada mais recentemente
+                    return self._idle.pop()
+                if self._size < self.max_size:
+                    self._size += 1
+                    return None
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeoutError(
+                        f"Tempo esgotado ({timeout:.1f}s) aguardando conexão livre no pool "
+                        f"({self._size}/{self.max_size} em uso)."
+                    )
+                self._cond.wait(remaining)
+
+    def _open_entry(self):
+        return _PoolEntry(self._connect(), self.statement_cache_size)
+
+    def _free_slot(self):
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    def _discard(self, entry):
+        self._close_raw(entry)
+        self._free_slot()
+
+    def _is_expired(self, entry):
+        return self.max_lifetime and time.monotonic() - entry.created_at > self.max_lifetime
+
+    def _is_healthy(self, entry):
+        """Testa a conexão se ela ficou ociosa por mais de ping_after segundos."""
+        if entry.raw.closed:
+            return False
+        if time.monotonic() - entry.last_used_at < self.ping_after:
+            return True
+        try:
+            db_executor.run('ping', self._ping, entry.raw)
+            return True
+        except fdb.Error as e:
+            print(f"Conexão do pool descartada no health check: {e}")
+            return False
+
+    @staticmethod
+    def _ping(raw):
+        cur = raw.cursor()
+        cur.execute("SELECT 1 FROM RDB$DATABASE;")
+        cur.fetchone()
+        raw.rollback()
+
+    @staticmethod
+    def _close_raw(entry):
+        try:
+            if not entry.raw.closed:
+                db_executor.run('close', entry.raw.close)
+        except fdb.Error:
+            pass
+
+
+# --- Unidade de trabalho (uma conexão e uma transação por requisição) ---
+
+class _SharedConnection:
+    """
+    Visão que um service recebe da conexão da unidade de trabalho.
+    commit(), rollback() e close() atuam sobre um SAVEPOINT próprio do service;
+    a transação real só é confirmada (ou desfeita) na fronteira da requisição.
+    Assim um service chamado por outro lê os mesmos dados da mesma transação,
+    e a falha de um service aninhado não desfaz o trabalho de quem o chamou.
+    """
+
+    def __init__(self, conn, savepoint):
+        self._conn = conn
+        self._savepoint = savepoint
+        if not conn.main_transaction.active:
+            conn.begin()
+        conn.savepoint(savepoint)
+
+    def cursor(self):
+        return self._conn.cursor()
+
+    def commit(self):
+        """Mantém o trabalho do service; a confirmação real fica para o fim da requisição."""
+        if self._savepoint is not None:
+            self._conn.execute_immediate(f"RELEASE SAVEPOINT {self._savepoint}")
+            self._savepoint = None
+
+    def rollback(self):
+        """Desfaz somente o que este service fez desde que pegou a conexão."""
+        if self._savepoint is not None:
+            self._conn.rollback(savepoint=self._savepoint)
+            self._savepoint = None
+
+    def close(self):
+        """Trabalho não confirmado é descartado, como acontece ao devolver uma conexão ao pool."""
+        if self._savepoint is not None:
+            try:
+                self.rollback()
+            except fdb.Error as e:
+                print(f"Erro ao desfazer savepoint da unidade de trabalho: {e}")
+                self._savepoint = None
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+class UnitOfWork:
+    """
+    Conexão e transação compartilhadas por todos os services de uma requisição.
+    A conexão só é emprestada do pool quando o primeiro service pede uma.
+    """
+
+    def __init__(self, pool):
+        self._pool = pool
+        self._conn = None
+        self._savepoints = 0
+        self._after_commit = []
+
+    def connection(self):
+        if self._conn is None:
+            self._conn = self._pool.acquire()
+        self._savepoints += 1
+        return _SharedConnection(self._conn, f"UOW_SP_{self._savepoints}")
+
+    def after_commit(self, callback):
+        """Agenda callback() para depois da confirmação real; descartado se a transação for desfeita."""
+        self._after_commit.append(callback)
+
+    def commit(self):
+        if self._conn is not None and self._conn.main_transaction.active:
+            self._conn.commit()
+        callbacks, self._after_commit = self._after_commit, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Erro em callback pós-commit: {e}")
+
+    def rollback(self):
+        self._after_commit = []
+        if self._conn is not None and self._conn.main_transaction.active:
+            self._conn.rollback()
+
+    def close(self):
+        """Devolve a conexão ao pool; o que não foi confirmado é desfeito."""
+        self._after_commit = []
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            conn.close()
+
+
+def current_unit_of_work():
+    """Retorna a unidade de trabalho ativa no contexto atual, se houver."""
+    if has_app_context():
+        return g.get('_db_unit_of_work')
+    return None
+
+
+def after_commit(callback):
+    """
+    Executa callback() quando o trabalho atual estiver confirmado de fato: no fim da
+    unidade de trabalho ativa ou, fora dela (conexão própria já confirmada), agora.
+    """
+    uow = current_unit_of_work()
+    if uow is not None:
+        uow.after_commit(callback)
+    else:
+        callback()
+
+
+@contextmanager
+def unit_of_work():
+    """
+    Abre uma unidade de trabalho fora de requisições HTTP (jobs, CLI, workers).
+    Precisa de um app context. Confirma ao sair sem erros e desfaz em caso de exceção.
+    """
+    previous = g.get('_db_unit_of_work')
+    uow = UnitOfWork(get_pool())
+    g._db_unit_of_work = uow
+    try:
+        yield uow
+        uow.commit()
+    except Exception:
+        uow.rollback()
+        raise
+    finally:
+        uow.close()
+        g._db_unit_of_work = previous
+
+
+def init_app(app):
+    """
+    Liga uma unidade de trabalho a cada requisição HTTP: todos os services usam
+    a mesma conexão/transação, confirmada no after_request (respostas < 500)
+    e desfeita nos demais casos.
+    """
+
+    @app.before_request
+    def _begin_unit_of_work():
+        g._db_unit_of_work = UnitOfWork(get_pool())
+
+    @app.after_request
+    def _finish_unit_of_work(response):
+        uow = g.get('_db_unit_of_work')
+        if uow is None:
+            return response
+        try:
+            if response.status_code < 500:
+                uow.commit()
+            else:
+                uow.rollback()
+        except fdb.Error as e:
+            print(f"Erro ao confirmar a transação da requisição: {e}")
+            try:
+                uow.rollback()
+            except fdb.Error:
+                pass
+            return make_response(jsonify({"error": "Ocorreu um erro interno ao salvar os dados."}), 500)
+        return response
+
+    @app.teardown_request
+    def _close_unit_of_work(exc):
+        uow = g.pop('_db_unit_of_work', None)
+        if uow is not None:
+            uow.close()
+
+
+# --- Pool global da aplicação ---
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Retorna o pool global, criando-o (sem pré-aquecer) se ainda não existir."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    _connect,
+                    max_size=Config.DB_POOL_MAX_SIZE,
+                    min_size=Config.DB_POOL_MIN_SIZE,
+                    timeout=Config.DB_POOL_TIMEOUT,
+                    max_lifetime=Config.DB_POOL_MAX_LIFETIME,
+                    ping_after=Config.DB_POOL_PING_AFTER,
+                    statement_cache_size=Config.DB_STATEMENT_CACHE_SIZE,
+                )
+                atexit.register(_pool.close)
+    return _pool
+
+
+def init_pool():
+    """
+    Cria e pré-aquece o pool. Chamado pelo create_app(); é idempotente,
+    então chamadas repetidas não abrem conexões extras.
+    """
+    pool = get_pool()
+    try:
+        opened = pool.prewarm()
+        if opened:
+            print(f"Pool de conexões pré-aquecido com {opened} conexão(ões).")
+    except Exception as e:
+        print(f"Erro ao pré-aquecer o pool de conexões: {e}")
+    return pool
+
+
 def get_db_connection():
     """
-    Cria e retorna uma nova conexão com o banco de dados Firebird.
+    Empresta uma conexão do pool.
+    Dentro de uma requisição (ou de 'with unit_of_work()'), retorna a conexão
+    compartilhada da unidade de trabalho; fora dela, uma conexão própria.
+    conn.close() devolve a conexão ao pool; também pode ser usada como
+    'with get_db_connection() as conn:'.
+    Lança PoolTimeoutError se o pool estiver esgotado além do tempo de espera.
     """
     try:
-        # CORREÇÃO: Usamos os parâmetros separados em vez de um DSN
-        conn = fdb.connect(
-            host=Config.FIREBIRD_HOST,
-            port=Config.FIREBIRD_PORT,
-            database=Config.DATABASE_PATH,  # Usamos o caminho do arquivo aqui
-            user=Config.FIREBIRD_USER,
-            password=Config.FIREBIRD_PASSWORD,
-            charset='UTF-8'
-        )
-        return conn
+        uow = current_unit_of_work()
+        if uow is not None:
+            return uow.connection()
+        return get_pool().acquire()
+    except PoolTimeoutError:
+        raise
     except fdb.Error as e:
         print(f"Erro ao conectar ao Firebird: {e}")
-        return None
\ No newline at end of file
+        return None
@@ -0,0 +1,72 @@
+# src/db_executor.py
+
+import threading
+import time
+
+# O fdb é um cliente em C: cada chamada bloqueia a thread inteira. Sob o eventlet
+# isso congela o hub (HTTP e WebSockets juntos), então, quando ativado, mandamos
+# essas chamadas para um pool limitado de threads nativas (eventlet.tpool).
+_tpool = None
+_slow_call_ms = 0
+
+_stats_lock = threading.Lock()
+_stats = {}
+
+
+def configure(enabled, num_threads=10, slow_call_ms=0):
+    """
+    Liga/desliga o envio das chamadas do fdb para o tpool do eventlet.
+    Deve ser chamado antes da primeira consulta (o tpool fixa o tamanho ao iniciar).
+    """
+    global _tpool, _slow_call_ms
+    _slow_call_ms = slow_call_ms
+    if not enabled:
+        _tpool = None
+        return False
+    try:
+        from eventlet import tpool
+    except ImportError:
+        print("AVISO: eventlet não instalado; chamadas ao banco rodarão na thread atual.")
+        _tpool = None
+        return False
+    tpool.set_num_threads(num_threads)
+    _tpool = tpool
+    return True
+
+
+def is_offloading():
+    return _tpool is not None
+
+
+def run(operation, fn, *args, **kwargs):
+    """
+    Executa fn(*args, **kwargs) no pool de threads nativas (ou direto, se desativado),
+    medindo o tempo gasto. 'operation' é só o rótulo usado nas estatísticas.
+    """
+    start = time.perf_counter()
+    try:
+        if _tpool is not None:
+            return _tpool.execute(fn, *args, **kwargs)
+        return fn(*args, **kwargs)
+    finally:
+        _record(operation, time.perf_counter() - start)
+
+
+def _record(operation, elapsed):
+    with _stats_lock:
+        entry = _stats.get(operation)
+        if entry is None:
+            entry = _stats[operation] = {"calls": 0, "total_ms": 0.0, "max_ms": 0.0}
+        elapsed_ms = elapsed * 1000
+        entry["calls"] += 1
+        entry["total_ms"] += elapsed_ms
+        entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+    if _slow_call_ms and elapsed_ms >= _slow_call_ms:
+        print(f"AVISO: chamada ao banco '{operation}' levou {elapsed_ms:.1f} ms.")
+
+
+def get_stats():
+    """Retorna uma cópia das estatísticas de tempo por tipo de operação."""
+    with _stats_lock:
+        return {op: dict(values) for op, values in _stats.items()}
+
@@ -0,0 +1,254 @@
+# src/migrations.py
+
+import os
+import re
+
+import fdb
+from .database import get_db_connection
+
+# Scripts versionados: packages/api/migrations/NNN_descricao.sql
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+_MIGRATION_FILE = re.compile(r'^(\d+)_([\w-]+)\.sql$')
+
+# Consultas quentes cujo plano é verificado por check_query_plans().
+# Cada entrada: (origem, SQL, {alias usado no plano: tabela}).
+# Mantenha o SQL igual ao do service indicado.
+HOT_QUERIES = [
+    (
+        "order_service.get_orders_by_user_id",
+        """
+            SELECT FIRST ? o.ID, o.STATUS, o.CONFIRMATION_CODE, o.CREATED_AT, a.STREET, a."NUMBER"
+            FROM ORDERS o
+            JOIN ADDRESSES a ON o.ADDRESS_ID = a.ID
+            WHERE o.USER_ID = ?
+            ORDER BY o.CREATED_AT DESC, o.ID DESC;
+        """,
+        {"O": "ORDERS", "A": "ADDRESSES"},
+    ),
+    (
+        "order_service.get_all_orders",
+        """
+            SELECT FIRST ? o.ID, o.STATUS, o.CONFIRMATION_CODE, o.CREATED_AT, u.FULL_NAME
+            FROM ORDERS o
+            JOIN USERS u ON o.USER_ID = u.ID
+            WHERE (o.CREATED_AT < ? OR (o.CREATED_AT = ? AND o.ID < ?))
+            ORDER BY o.CREATED_AT DESC, o.ID DESC;
+        """,
+        {"O": "ORDERS", "U": "USERS"},
+    ),
+    (
+        "user_service.search_customers",
+        """
+            SELECT FIRST ? u.ID, u.FULL_NAME, u.EMAIL, u.PHONE, u.CPF, UPPER(u.FULL_NAME)
+            FROM USERS u
+            WHERE u.ROLE = 'customer' AND u.IS_ACTIVE = TRUE AND UPPER(u.FULL_NAME) STARTING WITH ?
+              AND (UPPER(u.FULL_NAME) > ? OR (UPPER(u.FULL_NAME) = ? AND u.ID > ?))
+            ORDER BY UPPER(u.FULL_NAME), u.ID;
+        """,
+        {"U": "USERS"},
+    ),
+    (
+        "user_service.search_customers (CPF/telefone)",
+        """
+            SELECT FIRST ? u.ID, u.FULL_NAME, u.EMAIL, u.PHONE, u.CPF, UPPER(u.FULL_NAME)
+            FROM USERS u
+            WHERE u.ROLE = 'customer' AND u.IS_ACTIVE = TRUE
+              AND (REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(u.CPF, '.', ''), '-', ''), ' ', ''), '(', ''), ')', ''), '/', ''), '+', '') STARTING WITH ?
+                OR REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(u.PHONE, '.', ''), '-', ''), ' ', ''), '(', ''), ')', ''), '/', ''), '+', '') STARTING WITH ?)
+            ORDER BY UPPER(u.FULL_NAME), u.ID;
+        """,
+        {"U": "USERS"},
+    ),
+    (
+        "outbox_service._claim_batch",
+        """
+            SELECT FIRST ? ID, EVENT_TYPE, PAYLOAD, CHANNELS_DONE, ATTEMPTS
+            FROM OUTBOX_EVENTS
+            WHERE STATUS = 'pending' AND NEXT_ATTEMPT_AT <= ?
+            ORDER BY NEXT_ATTEMPT_AT, ID;
+        """,
+        {},
+    ),
+    (
+        "product_service.get_section_tree",
+        """
+            SELECT s.ID, s.NAME, s.DISPLAY_ORDER, p.ID, p.NAME, p.DESCRIPTION, p.PRICE
+            FROM PRODUCT_SECTIONS s
+            LEFT JOIN PRODUCT_SECTION_ITEMS psi ON psi.SECTION_ID = s.ID
+            LEFT JOIN PRODUCTS p ON p.ID = psi.PRODUCT_ID AND p.IS_ACTIVE = TRUE
+            ORDER BY s.DISPLAY_ORDER, s.NAME, s.ID, p.NAME;
+        """,
+        {"S": "PRODUCT_SECTIONS", "PSI": "PRODUCT_SECTION_ITEMS", "P": "PRODUCTS"},
+    ),
+    (
+        "notification_service.get_unread_notifications",
+        "SELECT ID, MESSAGE, LINK, CREATED_AT FROM NOTIFICATIONS WHERE USER_ID = ? AND IS_READ = FALSE ORDER BY CREATED_AT DESC;",
+        {},
+    ),
+    (
+        "chat_service.get_chat_history",
+        """
+            SELECT m.ID, m.SENDER_TYPE, m.CONTENT, m.CREATED_AT, u.FULL_NAME
+            FROM MESSAGES m
+            LEFT JOIN USERS u ON m.SENDER_ID = u.ID
+            WHERE m.CHAT_ID = ?
+            ORDER BY m.CREATED_AT ASC;
+        """,
+        {"M": "MESSAGES", "U": "USERS"},
+    ),
+    (
+        "chat_service.get_chat_id_by_order",
+        "SELECT ID FROM CHATS WHERE ORDER_ID = ?;",
+        {},
+    ),
+    (
+        "user_service.finalize_password_reset",
+        "SELECT USER_ID, EXPIRES_AT, USED_AT FROM PASSWORD_RESET_TOKENS WHERE TOKEN = ?;",
+        {},
+    ),
+    (
+        "loyalty_service.get_loyalty_history",
+        "SELECT POINTS, REASON, EARNED_AT FROM LOYALTY_POINTS_HISTORY WHERE USER_ID = ? ORDER BY EARNED_AT DESC;",
+        {},
+    ),
+]
+
+_NATURAL_SCAN = re.compile(r'"?([\w$]+)"?\s+NATURAL')
+
+
+def discover_migrations():
+    """Lista os scripts de migração em ordem de versão: [(versao, nome, caminho)]."""
+    migrations = []
+    for filename in os.listdir(MIGRATIONS_DIR):
+        match = _MIGRATION_FILE.match(filename)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2), os.path.join(MIGRATIONS_DIR, filename)))
+    migrations.sort()
+    return migrations
+
+
+def _split_statements(script):
+    """Separa um script em comandos por ';', ignorando comentários de linha '--'."""
+    lines = [line for line in script.splitlines() if not line.strip().startswith('--')]
+    return [stmt.strip() for stmt in '\n'.join(lines).split(';') if stmt.strip()]
+
+
+_DDL_KEYWORDS = {'CREATE', 'ALTER', 'DROP', 'RECREATE', 'COMMENT', 'GRANT', 'REVOKE'}
+
+
+def _is_ddl(statement):
+    return statement.split(None, 1)[0].upper() in _DDL_KEYWORDS
+
+
+def _ensure_migrations_table(conn):
+    """Cria a tabela de controle SCHEMA_MIGRATIONS se ela ainda não existir."""
+    cur = conn.cursor()
+    cur.execute("SELECT 1 FROM RDB$RELATIONS WHERE RDB$RELATION_NAME = 'SCHEMA_MIGRATIONS';")
+    if cur.fetchone():
+        return
+    conn.execute_immediate("""
+        CREATE TABLE SCHEMA_MIGRATIONS (
+            VERSION INTEGER NOT NULL PRIMARY KEY,
+            NAME VARCHAR(255) NOT NULL,
+            APPLIED_AT TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL
+        )
+    """)
+    conn.commit()
+
+
+def get_applied_versions(conn):
+    _ensure_migrations_table(conn)
+    cur = conn.cursor()
+    cur.execute("SELECT VERSION FROM SCHEMA_MIGRATIONS;")
+    return {row[0] for row in cur.fetchall()}
+
+
+def get_status():
+    """Retorna [(versao, nome, aplicada)] para todas as migrações conhecidas."""
+    conn = None
+    try:
+        conn = get_db_connection()
+        applied = get_applied_versions(conn)
+        return [(version, name, version in applied) for version, name, _ in discover_migrations()]
+    finally:
+        if conn: conn.close()
+
+
+def migrate(target_version=None):
+    """
+    Aplica, em ordem, as migrações pendentes (até target_version, se informado).
+    Cada migração roda em sua própria transação junto com o registro em SCHEMA_MIGRATIONS.
+    O Firebird só aplica DDL no commit, então um comando DML (ex.: o INSERT da linha
+    inicial de uma tabela criada no mesmo script) é precedido de um commit do DDL anterior;
+    nesse caso, uma falha no DML não desfaz o DDL já confirmado.
+    Retorna a lista de versões aplicadas.
+    """
+    applied_now = []
+    conn = None
+    try:
+        conn = get_db_connection()
+        applied = get_applied_versions(conn)
+
+        for version, name, path in discover_migrations():
+            if version in applied:
+                continue
+            if target_version is not None and version > target_version:
+                break
+
+            with open(path, 'r', encoding='utf-8') as f:
+                statements = _split_statements(f.read())
+
+            ddl_pending = ddl_committed = False
+            try:
+                for statement in statements:
+                    is_ddl = _is_ddl(statement)
+                    if ddl_pending and not is_ddl:
+                        conn.commit()
+                        ddl_pending, ddl_committed = False, True
+                    conn.execute_immediate(statement)
+                    ddl_pending = ddl_pending or is_ddl
+                cur = conn.cursor()
+                cur.execute("INSERT INTO SCHEMA_MIGRATIONS (VERSION, NAME) VALUES (?, ?);", (version, name))
+                conn.commit()
+            except fdb.Error as e:
+                conn.rollback()
+                partial = " (o DDL anterior ao erro já foi confirmado e precisa ser desfeito à mão)" if ddl_committed else ""
+                raise RuntimeError(f"Falha ao aplicar a migração {version:03d}_{name}{partial}: {e}") from e
+
+            print(f"Migração {version:03d}_{name} aplicada.")
+            applied_now.append(version)
+
+        return applied_now
+    finally:
+        if conn: conn.close()
+
+
+def check_query_plans(min_rows=1000):
+    """
+    Captura o plano do Firebird de cada consulta em HOT_QUERIES e aponta as que
+    fazem leitura NATURAL (sem índice) em tabelas com pelo menos min_rows linhas.
+    Retorna a lista de problemas: [(origem, tabela, plano)].
+    """
+    problems = []
+    row_counts = {}
+    conn = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+
+        for origin, sql, aliases in HOT_QUERIES:
+            plan = cur.prep(sql).plan or ''
+            print(f"{origin}: {plan.strip()}")
+
+            for alias in _NATURAL_SCAN.findall(plan):
+                table = aliases.get(alias.upper(), alias.upper())
+                if table not in row_counts:
+                    count_cur = conn.cursor()
+                    count_cur.execute(f'SELECT COUNT(*) FROM "{table}";')
+                    row_counts[table] = count_cur.fetchone()[0]
+                if row_counts[table] >= min_rows:
+                    problems.append((origin, table, plan.strip()))
+
+        return problems
+    finally:
+        if conn: conn.close()
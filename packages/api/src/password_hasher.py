@@ -0,0 +1,115 @@
+# src/password_hasher.py
+
+import threading
+import time
+import bcrypt
+
+# Cada hashpw/checkpw do bcrypt gasta centenas de ms de CPU. O bcrypt libera o GIL
+# durante o cálculo, então, sob o eventlet, mandamos essas chamadas para as threads
+# nativas do tpool: o hub continua atendendo HTTP e WebSockets enquanto o hash roda
+# em outro núcleo. No máximo 'workers' cálculos rodam ao mesmo tempo (o resto do
+# tpool fica para o banco) e no máximo 'max_pending' esperam; além disso, recusamos.
+_tpool = None
+_rounds = 12
+_slots = threading.BoundedSemaphore(2)
+_max_pending = 32
+_wait_timeout = 5.0
+
+_stats_lock = threading.Lock()
+_pending = 0
+_stats = {"rejected": 0, "timeouts": 0}
+_operations = {}
+
+
+class PasswordHasherBusy(Exception):
+    """Fila de hash de senhas cheia (ou espera longa demais): a requisição deve ser recusada com 503."""
+
+
+def configure(offload, rounds=12, workers=2, max_pending=32, wait_timeout=5.0):
+    """
+    Define o custo do bcrypt e os limites do pool. Com offload=False (fora do eventlet)
+    o hash roda na thread da requisição, mas os limites continuam valendo.
+    """
+    global _tpool, _rounds, _slots, _max_pending, _wait_timeout
+    _rounds = rounds
+    _slots = threading.BoundedSemaphore(max(workers, 1))
+    _max_pending = max_pending
+    _wait_timeout = wait_timeout
+    _tpool = None
+    if offload:
+        try:
+            from eventlet import tpool
+            _tpool = tpool
+        except ImportError:
+            print("AVISO: eventlet não instalado; o hash de senhas rodará na thread atual.")
+    return _tpool is not None
+
+
+def _run(operation, fn, *args):
+    global _pending
+    with _stats_lock:
+        if _pending >= _max_pending:
+            _stats["rejected"] += 1
+            raise PasswordHasherBusy("Fila de hash de senhas cheia.")
+        _pending += 1
+
+    queued = time.perf_counter()
+    try:
+        if not _slots.acquire(timeout=_wait_timeout):
+            with _stats_lock:
+                _stats["timeouts"] += 1
+            raise PasswordHasherBusy("Tempo de espera pelo hash de senhas esgotado.")
+        started = time.perf_counter()
+        try:
+            if _tpool is not None:
+                result = _tpool.execute(fn, *args)
+            else:
+                result = fn(*args)
+        finally:
+            _slots.release()
+        _record(operation, started - queued, time.perf_counter() - started)
+        return result
+    finally:
+        with _stats_lock:
+            _pending -= 1
+
+
+def _record(operation, waited, elapsed):
+    with _stats_lock:
+        entry = _operations.get(operation)
+        if entry is None:
+            entry = _operations[operation] = {
+                "calls": 0, "total_ms": 0.0, "max_ms": 0.0, "wait_total_ms": 0.0, "wait_max_ms": 0.0
+            }
+        entry["calls"] += 1
+        entry["total_ms"] += elapsed * 1000
+        entry["max_ms"] = max(entry["max_ms"], elapsed * 1000)
+        entry["wait_total_ms"] += waited * 1000
+        entry["wait_max_ms"] = max(entry["wait_max_ms"], waited * 1000)
+
+
+def hash_password(password):
+    """Gera o hash bcrypt (str) da senha com o custo configurado."""
+    hashed = _run('hash', bcrypt.hashpw, password.encode('utf-8'), bcrypt.gensalt(_rounds))
+    return hashed.decode('utf-8')
+
+
+def check_password(password, hashed_password):
+    """Confere a senha contra o hash armazenado."""
+    return _run('check', bcrypt.checkpw, password.encode('utf-8'), hashed_password.encode('utf-8'))
+
+
+def needs_rehash(hashed_password):
+    """True se o hash foi gerado com um custo diferente do configurado (ex.: '$2b$10$...')."""
+    try:
+        return int(hashed_password.split('$')[2]) != _rounds
+    except (IndexError, ValueError):
+        return False
+
+
+def get_stats():
+    """Tempo de espera/execução por operação, fila atual e requisições recusadas."""
+    with _stats_lock:
+        stats = {op: dict(values) for op, values in _operations.items()}
+        stats.update(_stats, pending=_pending, max_pending=_max_pending)
+    return stats
@@ -0,0 +1,308 @@
+# src/rate_limiter.py
+
+import importlib
+import math
+import threading
+import time
+import fdb
+from .database import get_pool
+
+# Limites de tentativas de login e de recuperação de senha, conferidos na rota antes
+# de qualquer consulta ao banco ou verificação do bcrypt.
+#
+# Cada limite é uma janela deslizante aproximada: guardamos só a contagem da janela
+# fixa atual e a da anterior, e a estimativa é anterior x (fração da janela anterior
+# ainda coberta) + atual. São três números por chave, seja qual for o volume.
+#
+# Falhas de login seguidas em um mesmo e-mail geram bloqueios progressivos
+# (base, 2 x base, 4 x base... até o máximo); um login correto zera a contagem.
+
+_UPDATE_CONFLICT_SQLCODE = -913
+
+
+class MemoryBackend:
+    """Estado no próprio processo. Com vários workers, cada um conta separadamente."""
+
+    def __init__(self, evict_interval=60):
+        self._lock = threading.Lock()
+        self._windows = {}   # {chave: [índice da janela, contagem atual, contagem anterior, duração]}
+        self._failures = {}  # {chave: [falhas seguidas, bloqueado até, esquecer em]}
+        self._evict_interval = evict_interval
+        self._next_eviction = 0.0
+
+    def hit(self, key, window, now):
+        """Registra uma tentativa e retorna a contagem estimada na janela deslizante."""
+        index = int(now // window)
+        with self._lock:
+            self._evict_if_due(now)
+            entry = self._windows.get(key)
+            if entry is None or entry[0] < index - 1:
+                entry = self._windows[key] = [index, 0, 0, window]
+            elif entry[0] == index - 1:
+                entry[0], entry[1], entry[2] = index, 0, entry[1]
+            entry[1] += 1
+            return _estimate(entry[1], entry[2], now, window)
+
+    def get_lock(self, key, now):
+        """Momento (time.time) até o qual a chave está bloqueada, ou 0."""
+        with self._lock:
+            entry = self._failures.get(key)
+            return entry[1] if entry is not None and entry[1] > now else 0
+
+    def add_failure(self, key, now, forget_after):
+        """Conta mais uma falha seguida e retorna o total."""
+        with self._lock:
+            entry = self._failures.get(key)
+            if entry is None or entry[2] <= now:
+                entry = self._failures[key] = [0, 0, 0]
+            entry[0] += 1
+            entry[2] = now + forget_after
+            return entry[0]
+
+    def set_lock(self, key, until):
+        with self._lock:
+            entry = self._failures.get(key)
+            if entry is not None:
+                entry[1] = until
+                entry[2] = max(entry[2], until)
+
+    def clear_failures(self, key):
+        with self._lock:
+            self._failures.pop(key, None)
+
+    def _evict_if_due(self, now):
+        """Descarta janelas que já não contam e falhas esquecidas (chamar com _lock)."""
+        if now < self._next_eviction:
+            return
+        self._next_eviction = now + self._evict_interval
+        stale = [key for key, entry in self._windows.items() if (entry[0] + 2) * entry[3] <= now]
+        for key in stale:
+            del self._windows[key]
+        forgotten = [key for key, entry in self._failures.items() if entry[2] <= now]
+        for key in forgotten:
+            del self._failures[key]
+
+
+class DatabaseBackend:
+    """
+    Estado compartilhado entre workers nas tabelas RATE_LIMIT_WINDOWS e RATE_LIMIT_FAILURES
+    (migração 008). Cada operação usa uma conexão do pool e uma transação curta própria,
+    fora da unidade de trabalho da requisição.
+    """
+
+    def __init__(self, evict_interval=60, max_retries=3):
+        self._evict_interval = evict_interval
+        self._max_retries = max_retries
+        self._next_eviction = 0.0
+
+    def _run(self, fn, *args):
+        for attempt in range(self._max_retries + 1):
+            conn = get_pool().acquire()
+            try:
+                result = fn(conn.cursor(), *args)
+                conn.commit()
+                return result
+            except fdb.Error as e:
+                conn.rollback()
+                code = e.args[1] if len(e.args) > 1 else None
+                if code != _UPDATE_CONFLICT_SQLCODE or attempt == self._max_retries:
+                    raise
+            finally:
+                conn.close()
+
+    def hit(self, key, window, now):
+        index = int(now // window)
+        if now >= self._next_eviction:
+            self._next_eviction = now + self._evict_interval
+            self._run(self._evict, now)
+        current, previous = self._run(self._hit, key, index, window)
+        return _estimate(current, previous, now, window)
+
+    @staticmethod
+    def _hit(cur, key, index, window):
+        sql_merge = """
+            MERGE INTO RATE_LIMIT_WINDOWS t
+            USING (SELECT CAST(? AS VARCHAR(255)) AS BUCKET_KEY, CAST(? AS BIGINT) AS WINDOW_INDEX
+                   FROM RDB$DATABASE) s
+            ON t.BUCKET_KEY = s.BUCKET_KEY
+            WHEN MATCHED THEN UPDATE SET
+                PREVIOUS_COUNT = CASE
+                    WHEN t.WINDOW_INDEX = s.WINDOW_INDEX THEN t.PREVIOUS_COUNT
+                    WHEN t.WINDOW_INDEX = s.WINDOW_INDEX - 1 THEN t.CURRENT_COUNT
+                    ELSE 0 END,
+                CURRENT_COUNT = CASE WHEN t.WINDOW_INDEX = s.WINDOW_INDEX THEN t.CURRENT_COUNT + 1 ELSE 1 END,
+                WINDOW_INDEX = s.WINDOW_INDEX,
+                EXPIRES_AT = ?
+            WHEN NOT MATCHED THEN
+                INSERT (BUCKET_KEY, WINDOW_INDEX, CURRENT_COUNT, PREVIOUS_COUNT, EXPIRES_AT)
+                VALUES (s.BUCKET_KEY, s.WINDOW_INDEX, 1, 0, ?);
+        """
+        expires_at = (index + 2) * window
+        cur.execute(sql_merge, (key, index, expires_at, expires_at))
+        cur.execute("SELECT CURRENT_COUNT, PREVIOUS_COUNT FROM RATE_LIMIT_WINDOWS WHERE BUCKET_KEY = ?;", (key,))
+        return cur.fetchone()
+
+    def get_lock(self, key, now):
+        def select(cur):
+            cur.execute("SELECT LOCKED_UNTIL FROM RATE_LIMIT_FAILURES WHERE BUCKET_KEY = ?;", (key,))
+            return cur.fetchone()
+        row = self._run(select)
+        return row[0] if row and row[0] > now else 0
+
+    def add_failure(self, key, now, forget_after):
+        def add(cur):
+            sql_merge = """
+                MERGE INTO RATE_LIMIT_FAILURES t
+                USING (SELECT CAST(? AS VARCHAR(255)) AS BUCKET_KEY, CAST(? AS DOUBLE PRECISION) AS NOW_TS
+                       FROM RDB$DATABASE) s
+                ON t.BUCKET_KEY = s.BUCKET_KEY
+                WHEN MATCHED THEN UPDATE SET
+                    FAILURES = CASE WHEN t.EXPIRES_AT <= s.NOW_TS THEN 1 ELSE t.FAILURES + 1 END,
+                    LOCKED_UNTIL = CASE WHEN t.EXPIRES_AT <= s.NOW_TS THEN 0 ELSE t.LOCKED_UNTIL END,
+                    EXPIRES_AT = MAXVALUE(t.EXPIRES_AT, s.NOW_TS + ?)
+                WHEN NOT MATCHED THEN
+                    INSERT (BUCKET_KEY, FAILURES, LOCKED_UNTIL, EXPIRES_AT)
+                    VALUES (s.BUCKET_KEY, 1, 0, s.NOW_TS + ?);
+            """
+            cur.execute(sql_merge, (key, now, forget_after, forget_after))
+            cur.execute("SELECT FAILURES FROM RATE_LIMIT_FAILURES WHERE BUCKET_KEY = ?;", (key,))
+            return cur.fetchone()[0]
+        return self._run(add)
+
+    def set_lock(self, key, until):
+        def lock(cur):
+            cur.execute(
+                "UPDATE RATE_LIMIT_FAILURES SET LOCKED_UNTIL = ?, EXPIRES_AT = MAXVALUE(EXPIRES_AT, ?) WHERE BUCKET_KEY = ?;",
+                (until, until, key)
+            )
+        self._run(lock)
+
+    def clear_failures(self, key):
+        self._run(lambda cur: cur.execute("DELETE FROM RATE_LIMIT_FAILURES WHERE BUCKET_KEY = ?;", (key,)))
+
+    @staticmethod
+    def _evict(cur, now):
+        cur.execute("DELETE FROM RATE_LIMIT_WINDOWS WHERE EXPIRES_AT <= ?;", (now,))
+        cur.execute("DELETE FROM RATE_LIMIT_FAILURES WHERE EXPIRES_AT <= ?;", (now,))
+
+
+_BACKENDS = {'memory': MemoryBackend, 'database': DatabaseBackend}
+
+_backend = None
+_limits = {}
+_stats_lock = threading.Lock()
+_stats = {"allowed": 0, "rejected": 0, "lockouts": 0, "errors": 0}
+
+
+def _estimate(current, previous, now, window):
+    elapsed = (now % window) / window
+    return previous * (1 - elapsed) + current
+
+
+def configure(config):
+    """
+    Cria o backend indicado em RATE_LIMIT_BACKEND: 'memory', 'database' ou o caminho
+    'pacote.modulo:Classe' de um backend próprio com a mesma interface (ex.: Redis).
+    """
+    global _backend, _limits
+    name = config['RATE_LIMIT_BACKEND']
+    if name in _BACKENDS:
+        backend_class = _BACKENDS[name]
+    else:
+        module_name, _, class_name = name.partition(':')
+        backend_class = getattr(importlib.import_module(module_name), class_name)
+    _backend = backend_class(evict_interval=config['RATE_LIMIT_EVICT_INTERVAL']) if config['RATE_LIMIT_ENABLED'] else None
+    _limits = {
+        'login_ip': (config['LOGIN_LIMIT_PER_IP'], config['LOGIN_WINDOW_SECONDS']),
+        'login_email': (config['LOGIN_LIMIT_PER_EMAIL'], config['LOGIN_WINDOW_SECONDS']),
+        'reset_ip': (config['PASSWORD_RESET_LIMIT_PER_IP'], config['PASSWORD_RESET_WINDOW_SECONDS']),
+        'reset_email': (config['PASSWORD_RESET_LIMIT_PER_EMAIL'], config['PASSWORD_RESET_WINDOW_SECONDS']),
+        'lockout': (config['LOGIN_LOCKOUT_THRESHOLD'], config['LOGIN_LOCKOUT_BASE_SECONDS'],
+                    config['LOGIN_LOCKOUT_MAX_SECONDS']),
+    }
+    return _backend
+
+
+def _count(key):
+    with _stats_lock:
+        _stats[key] += 1
+
+
+def _check(*buckets):
+    """
+    Registra a tentativa em cada (nome do limite, identificador) e retorna 0 se ela
+    pode seguir, ou os segundos até tentar de novo. Com erro no backend, deixa passar.
+    """
+    if _backend is None:
+        return 0
+    now = time.time()
+    retry_after = 0
+    try:
+        for limit_name, identifier in buckets:
+            limit, window = _limits[limit_name]
+            if _backend.hit(f"{limit_name}:{identifier}", window, now) > limit:
+                retry_after = max(retry_after, window - now % window)
+    except Exception as e:
+        print(f"Erro no limitador de tentativas: {e}")
+        _count("errors")
+        return 0
+    _count("rejected" if retry_after else "allowed")
+    return max(math.ceil(retry_after), 1) if retry_after else 0
+
+
+def _normalize(email):
+    return (email or '').strip().lower()
+
+
+def check_login(ip, email):
+    """Segundos até poder tentar de novo (bloqueio do e-mail ou limite excedido), ou 0."""
+    if _backend is None:
+        return 0
+    email = _normalize(email)
+    now = time.time()
+    try:
+        locked_until = _backend.get_lock(f"lockout:{email}", now)
+    except Exception as e:
+        print(f"Erro no limitador de tentativas: {e}")
+        locked_until = 0
+    if locked_until:
+        _count("rejected")
+        return max(math.ceil(locked_until - now), 1)
+    return _check(('login_ip', ip), ('login_email', email))
+
+
+def login_failed(email):
+    """Conta uma senha errada; a partir do limite, bloqueia o e-mail por um tempo crescente."""
+    if _backend is None:
+        return
+    threshold, base, maximum = _limits['lockout']
+    key = f"lockout:{_normalize(email)}"
+    now = time.time()
+    try:
+        failures = _backend.add_failure(key, now, maximum)
+        if failures >= threshold:
+            duration = min(base * 2 ** (failures - threshold), maximum)
+            _backend.set_lock(key, now + duration)
+            _count("lockouts")
+    except Exception as e:
+        print(f"Erro ao registrar falha de login: {e}")
+
+
+def login_succeeded(email):
+    if _backend is None:
+        return
+    try:
+        _backend.clear_failures(f"lockout:{_normalize(email)}")
+    except Exception as e:
+        print(f"Erro ao zerar falhas de login: {e}")
+
+
+def check_password_reset(ip, email):
+    """Segundos até poder pedir outra recuperação de senha, ou 0."""
+    return _check(('reset_ip', ip), ('reset_email', _normalize(email)))
+
+
+def get_stats():
+    """Tentativas liberadas, recusadas, bloqueios aplicados e falhas do backend."""
+    with _stats_lock:
+        return dict(_stats)
@@ -4,6 +4,7 @@ from flask import Blueprint, request, jsonify
 from ..services import user_service, address_service, loyalty_service  # 1. Importa o novo serviço
 from ..services.auth_service import require_role
 from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity
+from ..utils import pagination
 
 customer_bp = Blueprint('customers', __name__)
 
@@ -39,13 +40,26 @@ def create_customer_route():
         # A mensagem de erro específica vem do serviço (ex: senha fraca, e-mail em uso)
         return jsonify({"error": error_message}), 409
 
-# GET /src/customers/ -> Rota protegida para admins/managers verem todos os clientes
+# GET /src/customers/?q=&limit=&cursor= -> Admins/managers listam os clientes (paginado, com busca)
 @customer_bp.route('/', methods=['GET'])
 @require_role('admin', 'manager')
 def get_all_customers_route():
-    # ... (código existente)
-    customers = user_service.get_users_by_role('customer')
-    return jsonify(customers), 200
+    try:
+        customers, next_cursor, total = user_service.search_customers(
+            query=request.args.get('q'),
+            limit=pagination.parse_limit(request.args.get('limit')),
+            cursor=request.args.get('cursor'),
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    # Lista no corpo; cursor da próxima página e total (só na primeira página) nos cabeçalhos
+    response = jsonify(customers)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    if total:
+        response.headers['X-Total-Count'] = str(total["count"])
+        response.headers['X-Total-Count-Exact'] = 'true' if total["exact"] else 'false'
+    return response, 200
 
 
 # GET /src/customers/<id> -> Rota para um cliente ver seus próprios dados ou um admin ver qualquer um
@@ -6,6 +6,17 @@ from ..services.auth_service import require_role
 
 ingredient_bp = Blueprint('ingredients', __name__)
 
+# Limite de IDs por chamada do PATCH em lote
+MAX_BULK_AVAILABILITY = 500
+
+_STOCK_QUANTITY_ERROR = "O campo 'stock_quantity' deve ser um número maior ou igual a zero, ou null"
+
+
+def _is_valid_stock_quantity(quantity):
+    """Contagem de estoque: número >= 0, ou None (sem controle de estoque)."""
+    return quantity is None or (not isinstance(quantity, bool) and isinstance(quantity, (int, float)) and quantity >= 0)
+
+
 # GET /src/ingredients/ -> Lista todos os ingredientes
 @ingredient_bp.route('/', methods=['GET'])
 @require_role('admin', 'manager') # Alterado para admin, pois a versão pública pode vir dos produtos
@@ -20,6 +31,8 @@ def create_ingredient_route():
     data = request.get_json()
     if not data or not data.get('name'):
         return jsonify({"error": "O campo 'name' é obrigatório"}), 400
+    if not _is_valid_stock_quantity(data.get('stock_quantity')):
+        return jsonify({"error": _STOCK_QUANTITY_ERROR}), 400
 
     new_ingredient = ingredient_service.create_ingredient(data)
     if new_ingredient:
@@ -47,6 +60,36 @@ def delete_ingredient_route(ingredient_id):
         return jsonify({"msg": "Ingrediente marcado como indisponível com sucesso"}), 200
     return jsonify({"error": "Falha ao inativar ingrediente ou ingrediente não encontrado"}), 404
 
+# PATCH /src/ingredients/availability -> Atualiza a disponibilidade de vários ingredientes de uma vez
+@ingredient_bp.route('/availability', methods=['PATCH'])
+@require_role('admin', 'manager')
+def update_availability_bulk_route():
+    data = request.get_json(silent=True) or {}
+    available = data.get('available', [])
+    unavailable = data.get('unavailable', [])
+
+    for field, ids in (('available', available), ('unavailable', unavailable)):
+        if not isinstance(ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+            return jsonify({"error": f"O campo '{field}' deve ser uma lista de IDs de ingredientes"}), 400
+    if not available and not unavailable:
+        return jsonify({"error": "Informe ao menos um ID em 'available' ou 'unavailable'"}), 400
+    if len(available) + len(unavailable) > MAX_BULK_AVAILABILITY:
+        return jsonify({"error": f"No máximo {MAX_BULK_AVAILABILITY} ingredientes por requisição"}), 400
+    conflicting = sorted(set(available) & set(unavailable))
+    if conflicting:
+        return jsonify({"error": "Ingredientes em 'available' e 'unavailable' ao mesmo tempo", "ids": conflicting}), 400
+
+    changes, missing = ingredient_service.update_ingredients_availability(available, unavailable)
+    if changes is None:
+        if missing:
+            return jsonify({"error": "Ingrediente(s) não encontrado(s); nada foi alterado", "ids": missing}), 404
+        return jsonify({"error": "Falha ao atualizar a disponibilidade dos ingredientes"}), 500
+    return jsonify({
+        "updated": len(changes),
+        "available": sorted(i for i, value in changes.items() if value),
+        "unavailable": sorted(i for i, value in changes.items() if not value),
+    }), 200
+
 # PATCH /src/ingredients/<id>/availability -> Atualiza o status de disponibilidade
 @ingredient_bp.route('/<int:ingredient_id>/availability', methods=['PATCH'])
 @require_role('admin', 'manager')
@@ -61,4 +104,27 @@ def update_availability_route(ingredient_id):
         status_text = "disponível" if is_available else "esgotado"
         return jsonify({"msg": f"Ingrediente marcado como {status_text} com sucesso."}), 200
     else:
-        return jsonify({"error": "Ingrediente não encontrado ou falha ao atualizar"}), 404
\ No newline at end of file
+        return jsonify({"error": "Ingrediente não encontrado ou falha ao atualizar"}), 404
+
+# PATCH /src/ingredients/<id>/stock -> Define ou repõe o estoque
+@ingredient_bp.route('/<int:ingredient_id>/stock', methods=['PATCH'])
+@require_role('admin', 'manager')
+def update_stock_route(ingredient_id):
+    data = request.get_json(silent=True) or {}
+
+    if 'add' in data:
+        amount = data['add']
+        if isinstance(amount, bool) or not isinstance(amount, (int, float)) or amount <= 0:
+            return jsonify({"error": "O campo 'add' deve ser um número maior que zero"}), 400
+        ingredient = ingredient_service.restock_ingredient(ingredient_id, amount)
+    elif 'stock_quantity' in data:
+        quantity = data['stock_quantity']
+        if not _is_valid_stock_quantity(quantity):
+            return jsonify({"error": _STOCK_QUANTITY_ERROR}), 400
+        ingredient = ingredient_service.set_ingredient_stock(ingredient_id, quantity)
+    else:
+        return jsonify({"error": "Informe 'stock_quantity' (contagem) ou 'add' (entrada de estoque)"}), 400
+
+    if ingredient:
+        return jsonify(ingredient), 200
+    return jsonify({"error": "Ingrediente não encontrado ou falha ao atualizar o estoque"}), 404
@@ -0,0 +1,71 @@
+# src/routes/menu_routes.py
+
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+from flask_jwt_extended import get_jwt
+from ..services import menu_service, menu_io_service
+from ..services.auth_service import require_role
+from ..utils.http_cache import conditional_json_response
+
+menu_bp = Blueprint('menu', __name__)
+
+_EXPORT_MIMETYPES = {'csv': 'text/csv', 'json': 'application/json'}
+
+
+def _flag(name):
+    return request.args.get(name, '').strip().lower() in ('1', 'true', 'sim', 'yes')
+
+
+# GET /src/menu/ -> Cardápio completo (seções, produtos, ingredientes, preços e disponibilidade)
+# Responde 304 quando o If-None-Match do cliente bate com a ETag da versão atual
+@menu_bp.route('/', methods=['GET'])
+def get_menu_route():
+    snapshot = menu_service.get_snapshot()
+    if snapshot is None:
+        return jsonify({"error": "Cardápio indisponível no momento."}), 503
+    body, etag = snapshot["bodies"]["menu"]
+    return conditional_json_response(body, etag)
+
+
+# POST /src/menu/import?format=csv|json&dry_run=true&deactivate_missing=true
+# Arquivo no campo 'file' (multipart) ou no corpo da requisição; tudo em uma única transação
+@menu_bp.route('/import', methods=['POST'])
+@require_role('admin', 'manager')
+def import_menu_route():
+    upload = request.files.get('file')
+    raw = upload.read() if upload else request.get_data()
+    filename = (upload.filename or '') if upload else ''
+    mimetype = (upload.mimetype if upload else request.mimetype) or ''
+
+    fmt = request.args.get('format', '').strip().lower()
+    if not fmt:
+        fmt = 'csv' if filename.lower().endswith('.csv') or 'csv' in mimetype else 'json'
+    if fmt not in _EXPORT_MIMETYPES:
+        return jsonify({"error": "O parâmetro 'format' deve ser 'csv' ou 'json'"}), 400
+    if not raw:
+        return jsonify({"error": "Envie o arquivo do cardápio no campo 'file' ou no corpo da requisição"}), 400
+
+    try:
+        menu = menu_io_service.load_menu(raw.decode('utf-8-sig'), fmt)
+        summary = menu_io_service.import_menu(menu, user_id=get_jwt().get('id'),
+                                              deactivate_missing=_flag('deactivate_missing'), dry_run=_flag('dry_run'))
+    except UnicodeDecodeError:
+        return jsonify({"error": "O arquivo deve estar em UTF-8"}), 400
+    except menu_io_service.MenuImportError as e:
+        return jsonify({"error": str(e), "errors": e.errors}), 422
+
+    if summary is None:
+        return jsonify({"error": "Falha ao importar o cardápio; nada foi alterado"}), 500
+    return jsonify(summary), 200
+
+
+# GET /src/menu/export?format=csv|json -> Cardápio no mesmo formato da importação, em streaming
+@menu_bp.route('/export', methods=['GET'])
+@require_role('admin', 'manager')
+def export_menu_route():
+    fmt = request.args.get('format', 'json').strip().lower()
+    if fmt not in _EXPORT_MIMETYPES:
+        return jsonify({"error": "O parâmetro 'format' deve ser 'csv' ou 'json'"}), 400
+    generate = menu_io_service.export_csv if fmt == 'csv' else menu_io_service.export_json
+    response = Response(stream_with_context(generate()), mimetype=_EXPORT_MIMETYPES[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename=cardapio.{fmt}'
+    return response
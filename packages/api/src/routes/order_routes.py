@@ -1,26 +1,57 @@
 # src/routes/order_routes.py
 
+from datetime import datetime, timedelta
 from flask import Blueprint, request, jsonify
 # 1. AJUSTE: Imports limpos e centralizados no topo
-from ..services import order_service, address_service, store_service
+from ..services import order_service, address_service, store_service, idempotency_service
 from ..services.auth_service import require_role
+from ..utils import pagination
 from flask_jwt_extended import jwt_required, get_jwt
 
 order_bp = Blueprint('orders', __name__)
 
 
-# POST /src/orders/ -> Cliente cria um novo pedido
-@order_bp.route('/', methods=['POST'])
-@require_role('customer')
-def create_order_route():
+def _parse_date_param(name, end_of_range=False):
+    """
+    Lê uma data (AAAA-MM-DD) ou data/hora ISO da query string.
+    Para o fim do intervalo, uma data sem hora inclui o dia inteiro.
+    """
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"O parâmetro '{name}' deve estar no formato AAAA-MM-DD ou ISO 8601.")
+    if end_of_range and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed
+
+
+def _parse_id_param(name):
+    """Lê um ID (inteiro positivo) opcional da query string."""
+    value = request.args.get(name)
+    if not value:
+        return None
+    if not value.isdigit() or int(value) <= 0:
+        raise ValueError(f"O parâmetro '{name}' deve ser um ID numérico.")
+    return int(value)
+
+
+def _paginated_response(items, next_cursor):
+    """Lista no corpo (formato de sempre) e o cursor da próxima página no cabeçalho X-Next-Cursor."""
+    response = jsonify(items)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response, 200
+
+
+def _create_order(user_id, data):
+    """Valida e cria o pedido. Retorna (corpo, status) da resposta."""
     # Verificação de loja aberta
     is_open, message = store_service.is_store_open()
     if not is_open:
-        return jsonify({"error": message}), 409
-    
-    claims = get_jwt()
-    user_id = claims.get('id')
-    data = request.get_json()
+        return {"error": message}, 409
 
     # Coleta dos dados
     address_id = data.get('address_id')
@@ -33,47 +64,122 @@ def create_order_route():
     points_to_redeem = data.get('points_to_redeem', 0)
 
     if not all([address_id, items, payment_method]):
-        return jsonify({"error": "address_id, items e payment_method são obrigatórios"}), 400
+        return {"error": "address_id, items e payment_method são obrigatórios"}, 400
 
     address = address_service.get_address_by_id(address_id)
     if not address or address.get('user_id') != user_id:
-        return jsonify({"error": "Endereço inválido ou não pertence a este usuário"}), 403
+        return {"error": "Endereço inválido ou não pertence a este usuário"}, 403
 
     # Chamada de serviço agora passa todos os parâmetros, incluindo os pontos
-    new_order = order_service.create_order(
-        user_id,
-        address_id,
-        items,
-        payment_method,
-        change_for_amount,
-        notes,
-        cpf_on_invoice,
-        points_to_redeem # Passando os pontos para a função de serviço
-    )
+    try:
+        new_order, error = order_service.create_order(
+            user_id,
+            address_id,
+            items,
+            payment_method,
+            change_for_amount,
+            notes,
+            cpf_on_invoice,
+            points_to_redeem # Passando os pontos para a função de serviço
+        )
+    except order_service.OrderWriteError:
+        return {"error": "Não foi possível registrar o pedido agora. Tente novamente em instantes."}, 503
 
     if new_order:
-        return jsonify(new_order), 201
-    
-    # Mensagem de erro mais específica vinda do serviço
-    return jsonify({"error": "Não foi possível criar o pedido. Verifique os dados ou se um ingrediente está esgotado."}), 400
+        return new_order, 201
 
+    # Mensagem de erro específica vinda do serviço
+    return {"error": error or "Não foi possível criar o pedido. Verifique os dados ou se um ingrediente está esgotado."}, 400
 
-# GET /src/orders/ -> Cliente logado vê seu histórico de pedidos
-@order_bp.route('/', methods=['GET'])
+
+# Respostas que se repetiriam iguais com a mesma requisição: são guardadas na Idempotency-Key
+# (pedido criado, dados inválidos, endereço de outro usuário)
+_FINAL_ORDER_STATUSES = {201, 400, 403}
+
+
+def _order_response(body, status):
+    response = jsonify(body)
+    if status == 503:
+        response.headers['Retry-After'] = '1'
+    return response, status
+
+
+# POST /src/orders/ -> Cliente cria um novo pedido
+# Com o cabeçalho Idempotency-Key, repetições da mesma requisição devolvem a resposta
+# original (Idempotent-Replayed: true) sem criar outro pedido.
+@order_bp.route('/', methods=['POST'])
 @require_role('customer')
-def get_my_orders_route():
+def create_order_route():
     claims = get_jwt()
     user_id = claims.get('id')
-    orders = order_service.get_orders_by_user_id(user_id)
-    return jsonify(orders), 200
+    data = request.get_json()
+
+    idempotency_key = request.headers.get('Idempotency-Key')
+    if idempotency_key is None:
+        body, status = _create_order(user_id, data)
+        return _order_response(body, status)
+
+    if not idempotency_key or len(idempotency_key) > idempotency_service.MAX_KEY_LENGTH:
+        return jsonify({"error": f"O cabeçalho Idempotency-Key deve ter entre 1 e {idempotency_service.MAX_KEY_LENGTH} caracteres."}), 400
+
+    fingerprint = idempotency_service.request_fingerprint(data)
+    claimed, stored = idempotency_service.claim_key(user_id, idempotency_key, fingerprint)
+    if not claimed:
+        if stored is None:
+            return jsonify({"error": "Não foi possível verificar a Idempotency-Key."}), 500
+        if stored['request_hash'] != fingerprint:
+            return jsonify({"error": "Esta Idempotency-Key já foi usada com outro pedido."}), 422
+        if stored['status'] is None:
+            return jsonify({"error": "Uma requisição com esta Idempotency-Key ainda está em processamento."}), 409
+        response = jsonify(stored['body'])
+        response.headers['Idempotent-Replayed'] = 'true'
+        return response, stored['status']
+
+    body, status = _create_order(user_id, data)
+    if status in _FINAL_ORDER_STATUSES:
+        idempotency_service.complete_key(user_id, idempotency_key, status, body)
+    else:
+        # Loja fechada (409) ou falha do banco (503): não guarda a resposta, para que
+        # a mesma chave possa ser usada na nova tentativa
+        idempotency_service.release_key(user_id, idempotency_key)
+    return _order_response(body, status)
 
 
-# GET /src/orders/all -> Admin/Manager vê todos os pedidos do sistema
+# GET /src/orders/?limit=&cursor=&status= -> Cliente logado vê seu histórico de pedidos (paginado)
+@order_bp.route('/', methods=['GET'])
+@require_role('customer')
+def get_my_orders_route():
+    claims = get_jwt()
+    user_id = claims.get('id')
+    try:
+        orders, next_cursor = order_service.get_orders_by_user_id(
+            user_id,
+            limit=pagination.parse_limit(request.args.get('limit')),
+            cursor=request.args.get('cursor'),
+            status=request.args.get('status'),
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return _paginated_response(orders, next_cursor)
+
+
+# GET /src/orders/all?limit=&cursor=&status=&date_from=&date_to=&customer_id=
+# -> Admin/Manager vê os pedidos do sistema (paginado e filtrável)
 @order_bp.route('/all', methods=['GET'])
 @require_role('admin', 'manager')
 def get_all_orders_route():
-    orders = order_service.get_all_orders()
-    return jsonify(orders), 200
+    try:
+        orders, next_cursor = order_service.get_all_orders(
+            limit=pagination.parse_limit(request.args.get('limit')),
+            cursor=request.args.get('cursor'),
+            status=request.args.get('status'),
+            date_from=_parse_date_param('date_from'),
+            date_to=_parse_date_param('date_to', end_of_range=True),
+            customer_id=_parse_id_param('customer_id'),
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return _paginated_response(orders, next_cursor)
 
 
 # PATCH /src/orders/<order_id>/status -> Admin/Manager/Attendant atualiza o status
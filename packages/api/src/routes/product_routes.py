@@ -1,8 +1,10 @@
 # src/routes/product_routes.py
 
 from flask import Blueprint, request, jsonify
-from ..services import product_service
+from ..services import product_service, ingredient_service, menu_service, search_service
 from ..services.auth_service import require_role
+from ..utils import pagination
+from ..utils.http_cache import conditional_json_response
 
 product_bp = Blueprint('products', __name__)
 
@@ -11,10 +13,27 @@ product_bp = Blueprint('products', __name__)
 # ... (as rotas GET, POST, PUT, DELETE para /src/products que já fizemos continuam aqui) ...
 @product_bp.route('/', methods=['GET'])
 def get_all_products_route():
+    # Servido do snapshot do cardápio (ETag/304); consulta direta só se ele não puder ser montado
+    snapshot = menu_service.get_snapshot()
+    if snapshot is not None:
+        return conditional_json_response(*snapshot["bodies"]["products"])
     products = product_service.get_all_products()
     return jsonify(products), 200
 
 
+# GET /src/products/search?q=&limit= -> Busca no índice em memória (sem acentos, tolera erros de digitação)
+@product_bp.route('/search', methods=['GET'])
+def search_products_route():
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({"error": "O parâmetro 'q' é obrigatório"}), 400
+    try:
+        limit = pagination.parse_limit(request.args.get('limit'), default=20, maximum=100)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(search_service.search_products(query, limit)), 200
+
+
 @product_bp.route('/<int:product_id>', methods=['GET'])
 def get_product_by_id_route(product_id):
     product = product_service.get_product_by_id(product_id)
@@ -59,7 +78,10 @@ def delete_product_route(product_id):
 # GET /src/products/<id>/ingredients -> Lista os ingredientes de um produto
 @product_bp.route('/<int:product_id>/ingredients', methods=['GET'])
 def get_product_ingredients_route(product_id):
-    ingredients = product_service.get_ingredients_for_product(product_id)
+    snapshot = menu_service.get_snapshot()
+    if snapshot is not None and product_id in snapshot["product_ingredients"]:
+        return conditional_json_response(*snapshot["product_ingredients"][product_id])
+    ingredients = ingredient_service.get_ingredients_for_product(product_id)
     return jsonify(ingredients), 200
 
 
@@ -73,7 +95,7 @@ def add_ingredient_to_product_route(product_id):
     if not ingredient_id or not quantity:
         return jsonify({"error": "'ingredient_id' e 'quantity' são obrigatórios"}), 400
 
-    if product_service.add_ingredient_to_product(product_id, ingredient_id, quantity):
+    if ingredient_service.add_ingredient_to_product(product_id, ingredient_id, quantity):
         return jsonify({"msg": "Ingrediente associado/atualizado com sucesso"}), 201
     return jsonify({"error": "Falha ao associar ingrediente"}), 500
 
@@ -82,6 +104,6 @@ def add_ingredient_to_product_route(product_id):
 @product_bp.route('/<int:product_id>/ingredients/<int:ingredient_id>', methods=['DELETE'])
 @require_role('admin', 'manager')
 def remove_ingredient_from_product_route(product_id, ingredient_id):
-    if product_service.remove_ingredient_from_product(product_id, ingredient_id):
+    if ingredient_service.remove_ingredient_from_product(product_id, ingredient_id):
         return jsonify({"msg": "Ingrediente desassociado com sucesso"}), 200
     return jsonify({"error": "Falha ao desassociar ingrediente ou associação não encontrada"}), 404
\ No newline at end of file
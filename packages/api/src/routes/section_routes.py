@@ -1,8 +1,9 @@
 # src/routes/section_routes.py
 
 from flask import Blueprint, request, jsonify
-from ..services import product_service
+from ..services import product_service, menu_service
 from ..services.auth_service import require_role
+from ..utils.http_cache import conditional_json_response
 from flask_jwt_extended import get_jwt
 
 section_bp = Blueprint('sections', __name__)
@@ -11,9 +12,19 @@ section_bp = Blueprint('sections', __name__)
 # ... (as rotas GET, POST, PUT, DELETE para /src/sections que já fizemos continuam aqui) ...
 @section_bp.route('/', methods=['GET'])
 def get_all_sections_route():
+    # Servido do snapshot do cardápio (ETag/304); consulta direta só se ele não puder ser montado
+    snapshot = menu_service.get_snapshot()
+    if snapshot is not None:
+        return conditional_json_response(*snapshot["bodies"]["sections"])
     sections = product_service.get_all_sections()
     return jsonify(sections), 200
 
+# GET /src/sections/tree -> Todas as seções, em ordem de exibição, com seus produtos (uma única consulta)
+@section_bp.route('/tree', methods=['GET'])
+def get_section_tree_route():
+    sections = product_service.get_section_tree()
+    return jsonify(sections), 200
+
 @section_bp.route('/', methods=['POST'])
 @require_role('admin', 'manager')
 def create_section_route():
@@ -3,11 +3,18 @@
 from flask import Blueprint, request, jsonify
 from ..services import user_service, auth_service  # Importamos os dois serviços
 from ..services.auth_service import require_role
+from .. import rate_limiter
 from flask_jwt_extended import jwt_required, get_jwt
 
 user_bp = Blueprint('users', __name__)
 
 
+def _too_many_attempts(retry_after):
+    response = jsonify({"error": "Muitas tentativas. Tente novamente mais tarde."})
+    response.headers['Retry-After'] = str(retry_after)
+    return response, 429
+
+
 # --- ROTAS DE AUTENTICAÇÃO PÚBLICAS ---
 
 @user_bp.route('/login', methods=['POST'])
@@ -19,10 +26,17 @@ def login_route():
     if not email or not password:
         return jsonify({"msg": "E-mail e senha são obrigatórios"}), 400
 
+    # Limites por IP/e-mail e bloqueio progressivo, antes de consultar o banco ou o bcrypt
+    retry_after = rate_limiter.check_login(request.remote_addr, email)
+    if retry_after:
+        return _too_many_attempts(retry_after)
+
     token = auth_service.authenticate(email, password)
 
     if token:
+        rate_limiter.login_succeeded(email)
         return jsonify(access_token=token), 200
+    rate_limiter.login_failed(email)
     return jsonify({"msg": "Credenciais inválidas"}), 401
 
 
@@ -32,6 +46,10 @@ def request_password_reset_route():
     email = data.get('email')
     if not email:
         return jsonify({"error": "O campo 'email' é obrigatório"}), 400
+    # Cada pedido grava um token e envia um e-mail: limitado por IP e por e-mail
+    retry_after = rate_limiter.check_password_reset(request.remote_addr, email)
+    if retry_after:
+        return _too_many_attempts(retry_after)
     user_service.initiate_password_reset(email)
     return jsonify({"msg": "Se um usuário com este e-mail existir, um link de recuperação foi enviado."}), 200
 
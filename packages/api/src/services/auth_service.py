@@ -1,10 +1,10 @@
 # src/services/auth_service.py
 
-import bcrypt
 import fdb
 from functools import wraps
 from flask import jsonify
 from ..database import get_db_connection
+from .. import password_hasher
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt
 
 
@@ -26,7 +26,14 @@ def authenticate(email, password):
             user_id, hashed_password, role, full_name = user_record
 
             # Verifica se a senha fornecida corresponde ao hash armazenado
-            if bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8')):
+            # (fora do hub do eventlet; com a fila cheia, PasswordHasherBusy vira 503)
+            if password_hasher.check_password(password, hashed_password):
+                # Hash gerado com um custo antigo: refaz com o custo atual, já que temos a senha
+                if password_hasher.needs_rehash(hashed_password):
+                    cur.execute("UPDATE USERS SET PASSWORD_HASH = ? WHERE ID = ?;",
+                                (password_hasher.hash_password(password), user_id))
+                    conn.commit()
+
                 # --- A CORREÇÃO ESTÁ AQUI ---
                 # 1. A 'identity' deve ser algo simples e único, como o ID do usuário.
                 #    Convertemos para string por segurança.
@@ -0,0 +1,199 @@
+# src/services/availability_service.py
+
+import threading
+import fdb
+from .. import socketio
+from ..database import get_db_connection
+
+# Sala do Socket.IO dos clientes com o cardápio aberto (evento 'join_menu')
+MENU_ROOM = 'menu'
+
+# Disponibilidade dos produtos calculada em memória, sem consultar o banco:
+# cada ingrediente ocupa um bit; cada produto guarda o bitset da sua receita e
+# um produto está disponível se (receita & esgotados) == 0.
+_lock = threading.Lock()
+_loaded = False
+_bits = {}            # {ingredient_id: posição do bit}
+_names = {}           # {ingredient_id: nome}, para as mensagens de erro
+_unavailable = 0      # bitset dos ingredientes esgotados
+_product_masks = {}   # {product_id: bitset dos ingredientes da receita}
+
+
+def _bit(ingredient_id):
+    """Máscara do ingrediente, reservando um bit novo na primeira vez (chamar com _lock)."""
+    position = _bits.get(ingredient_id)
+    if position is None:
+        position = _bits[ingredient_id] = len(_bits)
+    return 1 << position
+
+
+def load_from(ingredients, product_ingredients):
+    """
+    Substitui o índice a partir de dados já lidos do banco:
+    ingredients = [(id, nome, disponivel)], product_ingredients = [(product_id, ingredient_id)].
+    """
+    global _loaded, _unavailable, _bits, _names, _product_masks
+    with _lock:
+        _bits, _names, _product_masks, _unavailable = {}, {}, {}, 0
+        for ingredient_id, name, is_available in ingredients:
+            mask = _bit(ingredient_id)
+            _names[ingredient_id] = name
+            if not is_available:
+                _unavailable |= mask
+        for product_id, ingredient_id in product_ingredients:
+            _product_masks[product_id] = _product_masks.get(product_id, 0) | _bit(ingredient_id)
+        _loaded = True
+
+
+def load():
+    """Monta o índice a partir do banco (duas consultas)."""
+    conn = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        cur.execute("SELECT ID, NAME, IS_AVAILABLE FROM INGREDIENTS;")
+        ingredients = cur.fetchall()
+        cur.execute("SELECT PRODUCT_ID, INGREDIENT_ID FROM PRODUCT_INGREDIENTS;")
+        product_ingredients = cur.fetchall()
+        load_from(ingredients, product_ingredients)
+        return True
+    except fdb.Error as e:
+        print(f"Erro ao carregar o índice de disponibilidade: {e}")
+        return False
+    finally:
+        if conn: conn.close()
+
+
+def invalidate():
+    """Descarta o índice; a próxima consulta o remonta a partir do banco."""
+    global _loaded
+    with _lock:
+        _loaded = False
+
+
+def _ensure_loaded():
+    if not _loaded:
+        load()
+
+
+# --- Atualizações incrementais (agendadas com database.after_commit pelas escritas) ---
+
+def set_ingredient(ingredient_id, name=None, is_available=None):
+    """Registra um ingrediente novo ou atualiza o nome/disponibilidade de um existente."""
+    global _unavailable
+    if not _loaded:
+        return  # Ainda não carregado: a primeira consulta lerá o estado atual do banco
+    with _lock:
+        mask = _bit(ingredient_id)
+        if name is not None:
+            _names[ingredient_id] = name
+        if is_available is True:
+            _unavailable &= ~mask
+        elif is_available is False:
+            _unavailable |= mask
+
+
+def apply_availability(changes):
+    """
+    Aplica {ingredient_id: disponivel} ao índice e retorna o que mudou de fato:
+    ({ingredient_id: disponivel}, {product_id: disponivel}).
+    """
+    global _unavailable
+    _ensure_loaded()
+    with _lock:
+        new_unavailable = _unavailable
+        for ingredient_id, is_available in changes.items():
+            mask = _bit(ingredient_id)
+            if is_available:
+                new_unavailable &= ~mask
+            else:
+                new_unavailable |= mask
+        changed_mask = new_unavailable ^ _unavailable
+        if not changed_mask:
+            return {}, {}
+        old_unavailable, _unavailable = _unavailable, new_unavailable
+
+        ingredients = {
+            ingredient_id: not (new_unavailable >> position & 1)
+            for ingredient_id, position in _bits.items() if changed_mask >> position & 1
+        }
+        products = {}
+        for product_id, recipe in _product_masks.items():
+            if recipe & changed_mask:
+                was_available = not (recipe & old_unavailable)
+                is_available = not (recipe & new_unavailable)
+                if was_available != is_available:
+                    products[product_id] = is_available
+        return ingredients, products
+
+
+def publish(changes):
+    """
+    Aplica as mudanças de disponibilidade (já confirmadas no banco) ao índice e envia
+    um delta compacto aos clientes da sala do cardápio, para que não precisem
+    buscar a lista de produtos de novo. Só envia se algo mudou.
+    """
+    ingredients, products = apply_availability(changes)
+    if not ingredients:
+        return
+    socketio.emit('menu_availability_changed', {
+        "unavailable_ingredients": sorted(i for i, available in ingredients.items() if not available),
+        "available_ingredients": sorted(i for i, available in ingredients.items() if available),
+        "unavailable_products": sorted(p for p, available in products.items() if not available),
+        "available_products": sorted(p for p, available in products.items() if available),
+    }, to=MENU_ROOM)
+
+
+def add_product_ingredient(product_id, ingredient_id):
+    if not _loaded:
+        return
+    with _lock:
+        _product_masks[product_id] = _product_masks.get(product_id, 0) | _bit(ingredient_id)
+
+
+def remove_product_ingredient(product_id, ingredient_id):
+    if not _loaded:
+        return
+    with _lock:
+        _product_masks[product_id] = _product_masks.get(product_id, 0) & ~_bit(ingredient_id)
+
+
+# --- Consultas ---
+
+def _first_unavailable_name(mask):
+    blocked = mask & _unavailable
+    if not blocked:
+        return None
+    for ingredient_id, position in _bits.items():
+        if blocked >> position & 1:
+            return _names.get(ingredient_id, str(ingredient_id))
+    return None
+
+
+def is_product_available(product_id):
+    _ensure_loaded()
+    return not (_product_masks.get(product_id, 0) & _unavailable)
+
+
+def get_products_availability(product_ids):
+    """{product_id: disponivel} para vários produtos."""
+    _ensure_loaded()
+    unavailable = _unavailable
+    return {product_id: not (_product_masks.get(product_id, 0) & unavailable) for product_id in product_ids}
+
+
+def find_unavailable_ingredient(product_ids, extra_ingredient_ids=()):
+    """
+    Nome do primeiro ingrediente esgotado entre as receitas dos produtos e os extras
+    do carrinho, ou None se tudo estiver disponível.
+    """
+    _ensure_loaded()
+    with _lock:
+        mask = 0
+        for product_id in product_ids:
+            mask |= _product_masks.get(product_id, 0)
+        for ingredient_id in extra_ingredient_ids:
+            position = _bits.get(ingredient_id)
+            if position is not None:
+                mask |= 1 << position
+        return _first_unavailable_name(mask)
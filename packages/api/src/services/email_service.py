@@ -1,35 +1,282 @@
 # src/services/email_service.py
 
+import atexit
+import queue
+import smtplib
 import threading
-from flask import render_template
 from flask_mail import Message
-from .. import mail, create_app  # Importamos a instância do mail e o create_app
+from .. import mail  # Importamos a instância do mail
 
 
-# O envio de e-mail pode ser lento. Para não travar a aplicação,
-# vamos enviá-lo em uma thread separada (de forma assíncrona).
-def send_async_email(app, msg):
-    with app.app_context():
-        mail.send(msg)
+class MailQueueFullError(Exception):
+    """A fila de e-mails continuou cheia durante todo o MAIL_QUEUE_PUT_TIMEOUT."""
+
+
+# O envio de e-mail pode ser lento. Para não travar a aplicação, os e-mails vão
+# para uma fila limitada consumida por um único worker de vida longa, que usa
+# o app context do create_app() e reaproveita a conexão SMTP entre mensagens.
+_worker_lock = threading.Lock()
+_worker = None
+_queue = None
+_app = None
+_STOP = object()
+
+# Templates de e-mail compilados uma vez por processo: {nome: jinja2.Template}.
+# Os de maior volume são compilados já no init_app().
+EMAIL_TEMPLATES = ('welcome', 'order_status_update', 'password_reset')
+_template_cache = {}
+_template_cache_lock = threading.Lock()
+
+_stats_lock = threading.Lock()
+_stats = {"queued": 0, "sent": 0, "failed": 0, "rejected": 0, "smtp_connections": 0}
+
+
+def _count(key, amount=1):
+    with _stats_lock:
+        _stats[key] += amount
+
+
+def get_stats():
+    """Contadores do worker de e-mail e tamanho atual da fila."""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["pending"] = _queue.qsize() if _queue is not None else 0
+    return stats
+
+
+def init_app(app):
+    """Inicia o worker de e-mail. Só a primeira chamada do processo tem efeito."""
+    global _worker, _queue, _app
+    with _worker_lock:
+        if _worker is not None:
+            return False
+        _app = app
+        warm_template_cache()
+        _queue = queue.Queue(maxsize=app.config['MAIL_QUEUE_SIZE'])
+        _worker = threading.Thread(target=_run_worker, name='mail-worker', daemon=True)
+        _worker.start()
+    atexit.register(shutdown)
+    return True
 
 
 def send_email(to, subject, template, **kwargs):
     """
-    Função genérica para enviar e-mails.
+    Função genérica para enviar e-mails (coloca na fila do worker e retorna).
     'to': Destinatário
     'subject': Assunto
-    'template': Nome do arquivo de template (ex: 'welcome.html')
+    'template': Nome do template, sem extensão (ex: 'welcome')
     '**kwargs': Dados para passar para o template (ex: user=user_obj)
+    Se a fila estiver cheia, espera até MAIL_QUEUE_PUT_TIMEOUT segundos e então
+    lança MailQueueFullError, para quem chama decidir se tenta de novo depois.
+    """
+    if _queue is None:
+        raise RuntimeError("O worker de e-mail não foi iniciado (email_service.init_app).")
+    try:
+        _queue.put((to, subject, template, kwargs), timeout=_app.config['MAIL_QUEUE_PUT_TIMEOUT'])
+    except queue.Full:
+        _count("rejected")
+        raise MailQueueFullError(f"Fila de e-mails cheia; e-mail para {to} não foi enfileirado.")
+    _count("queued")
+    return True
+
+
+def shutdown(timeout=None):
+    """Envia o que ainda está na fila e encerra o worker, esperando até 'timeout' segundos."""
+    global _worker
+    with _worker_lock:
+        worker, _worker = _worker, None
+    if worker is None:
+        return
+    if timeout is None:
+        timeout = _app.config['MAIL_SHUTDOWN_TIMEOUT']
+    try:
+        _queue.put(_STOP, timeout=timeout)
+    except queue.Full:
+        print("AVISO: fila de e-mails cheia no encerramento; mensagens pendentes serão perdidas.")
+        return
+    worker.join(timeout)
+    if worker.is_alive():
+        print(f"AVISO: o worker de e-mail não terminou em {timeout}s; {_queue.qsize()} e-mail(s) na fila.")
+
+
+# --- Cache de templates ---
+
+def _get_template(name):
+    """
+    Retorna o template compilado do cache, compilando na primeira vez.
+    Com TEMPLATES_AUTO_RELOAD (ou em debug), recompila se o arquivo mudou.
+    """
+    template = _template_cache.get(name)
+    if template is not None and (not _app.jinja_env.auto_reload or template.is_up_to_date):
+        return template
+    with _template_cache_lock:
+        template = _app.jinja_env.get_template(f'{name}.html')
+        _template_cache[name] = template
+    return template
+
+
+def warm_template_cache(names=EMAIL_TEMPLATES):
+    """Compila os templates informados para que o primeiro envio não pague a compilação."""
+    for name in names:
+        try:
+            _get_template(name)
+        except Exception as e:
+            print(f"Erro ao compilar o template de e-mail '{name}': {e}")
+
+
+def invalidate_template_cache(name=None):
+    """
+    Descarta um template (ou todos) do cache após editar o arquivo; a próxima
+    renderização lê o arquivo de novo. Também limpa o cache interno do Jinja.
+    """
+    with _template_cache_lock:
+        if name is None:
+            _template_cache.clear()
+        else:
+            _template_cache.pop(name, None)
+        if _app is not None and _app.jinja_env.cache is not None:
+            _app.jinja_env.cache.clear()
+
+
+def render_email(template, **context):
+    """
+    Renderiza o HTML de um e-mail pelo template compilado em cache.
+    Os templates de e-mail só usam as variáveis recebidas, então dispensamos
+    os processadores de contexto do render_template().
     """
-    # Criamos um app context para a thread poder acessar as configurações
-    app = create_app()
+    return _get_template(template).render(**context)
+
+
+# --- Worker ---
+
+def _build_message(to, subject, template, context):
     msg = Message(subject, recipients=[to])
+    # Renderiza o corpo do e-mail usando o template HTML
+    msg.html = render_email(template, **context)
+    return msg
+
+
+def _open_connection():
+    connection = mail.connect()
+    connection.__enter__()
+    _count("smtp_connections")
+    return connection
+
+
+def _close_connection(connection):
+    if connection is None:
+        return None
+    try:
+        connection.__exit__(None, None, None)
+    except (smtplib.SMTPException, OSError):
+        pass  # O servidor já pode ter encerrado a conexão ociosa
+    return None
+
+
+def _send_batch(batch, connection):
+    """Envia um lote pela mesma conexão SMTP. Reconecta uma vez se ela tiver caído."""
+    for to, subject, template, context in batch:
+        try:
+            msg = _build_message(to, subject, template, context)
+        except Exception as e:
+            print(f"Erro ao montar e-mail '{template}' para {to}: {e}")
+            _count("failed")
+            continue
+
+        for attempt in range(2):
+            try:
+                if connection is None:
+                    connection = _open_connection()
+                connection.send(msg)
+                _count("sent")
+                break
+            except (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError) as e:
+                error = e
+            except smtplib.SMTPException as e:
+                # Recusa do destinatário/conteúdo: a conexão continua boa
+                print(f"Erro ao enviar e-mail para {to}: {e}")
+                _count("failed")
+                break
+            except OSError as e:
+                error = e
+            # Conexão caída (ou servidor fora do ar): descarta e tenta mais uma vez
+            connection = _close_connection(connection)
+            if attempt == 1:
+                print(f"Erro ao enviar e-mail para {to}: {error}")
+                _count("failed")
+    return connection
+
+
+class SmtpSession:
+    """
+    Envio síncrono por uma conexão SMTP aberta na primeira mensagem e reaproveitada até
+    close(). Para quem precisa saber se cada mensagem saiu (ex.: o outbox, que tenta de
+    novo depois): send() lança a exceção do SMTP em vez de só contar a falha.
+    """
+
+    def __init__(self):
+        self._connection = None
+
+    def send(self, to, subject, template, **kwargs):
+        msg = _build_message(to, subject, template, kwargs)
+        for attempt in range(2):
+            try:
+                if self._connection is None:
+                    self._connection = _open_connection()
+                self._connection.send(msg)
+                _count("sent")
+                return True
+            except (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError) as e:
+                error = e
+            except smtplib.SMTPException:
+                # Recusa do destinatário/conteúdo: a conexão continua boa
+                _count("failed")
+                raise
+            except OSError as e:
+                error = e
+            # Conexão caída (ou servidor fora do ar): descarta e tenta mais uma vez
+            self._connection = _close_connection(self._connection)
+        _count("failed")
+        raise error
+
+    def close(self):
+        self._connection = _close_connection(self._connection)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def _run_worker():
+    batch_size = _app.config['MAIL_BATCH_SIZE']
+    idle_timeout = _app.config['MAIL_SMTP_IDLE_TIMEOUT']
+    connection = None
+    with _app.app_context():
+        stopping = False
+        while not stopping:
+            try:
+                job = _queue.get(timeout=idle_timeout)
+            except queue.Empty:
+                # Sem e-mails por um tempo: fecha a conexão antes que o servidor a derrube
+                connection = _close_connection(connection)
+                continue
+            if job is _STOP:
+                break
 
-    # Renderiza o corpo do e-mail usando um template HTML e um de texto puro
-    msg.body = render_template(f'email/{template}.txt', **kwargs)
-    msg.html = render_template(f'email/{template}.html', **kwargs)
+            # Junta o que já estiver na fila em um lote, sem esperar por mais
+            batch = [job]
+            while len(batch) < batch_size:
+                try:
+                    job = _queue.get_nowait()
+                except queue.Empty:
+                    break
+                if job is _STOP:
+                    stopping = True
+                    break
+                batch.append(job)
 
-    # Inicia a thread para envio assíncrono
-    thr = threading.Thread(target=send_async_email, args=[app, msg])
-    thr.start()
-    return thr
\ No newline at end of file
+            connection = _send_batch(batch, connection)
+        _close_connection(connection)
@@ -0,0 +1,113 @@
+# src/services/idempotency_service.py
+
+import hashlib
+import json
+import fdb
+from datetime import datetime, timedelta
+from ..config import Config
+from ..database import get_db_connection
+
+MAX_KEY_LENGTH = 255
+
+# SQLCODE do Firebird para violação de PRIMARY/UNIQUE KEY
+_UNIQUE_VIOLATION_SQLCODE = -803
+
+
+def _is_unique_violation(error):
+    # O fdb levanta DatabaseError com (mensagem, sqlcode, gdscode), nunca IntegrityError
+    return len(error.args) > 1 and error.args[1] == _UNIQUE_VIOLATION_SQLCODE
+
+
+def request_fingerprint(payload):
+    """Hash do corpo da requisição, para recusar a mesma chave usada com outro pedido."""
+    canonical = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def claim_key(user_id, key, fingerprint):
+    """
+    Reserva a chave para esta requisição, na transação da requisição.
+    Se outra requisição com a mesma chave ainda estiver em andamento, o INSERT
+    espera a transação dela terminar (trava da PK no Firebird) em vez de competir.
+    Retorna uma tupla (reservada, resposta_gravada):
+      (True, None)  -> chave nova, processe a requisição e chame complete_key()
+      (False, dict) -> chave já usada: {"request_hash", "status", "body"}
+      (False, None) -> erro ao acessar o banco
+    """
+    conn = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        # Chaves vencidas do usuário deixam de valer (e não acumulam na tabela)
+        cur.execute(
+            "DELETE FROM IDEMPOTENCY_KEYS WHERE USER_ID = ? AND EXPIRES_AT < ?;",
+            (user_id, datetime.now())
+        )
+        expires_at = datetime.now() + timedelta(hours=Config.IDEMPOTENCY_KEY_TTL_HOURS)
+        try:
+            cur.execute(
+                "INSERT INTO IDEMPOTENCY_KEYS (USER_ID, IDEMPOTENCY_KEY, REQUEST_HASH, EXPIRES_AT) VALUES (?, ?, ?, ?);",
+                (user_id, key, fingerprint, expires_at)
+            )
+            conn.commit()
+            return True, None
+        except fdb.DatabaseError as e:
+            if not _is_unique_violation(e):
+                raise
+            conn.rollback()
+
+        cur.execute(
+            "SELECT REQUEST_HASH, RESPONSE_STATUS, RESPONSE_BODY FROM IDEMPOTENCY_KEYS WHERE USER_ID = ? AND IDEMPOTENCY_KEY = ?;",
+            (user_id, key)
+        )
+        row = cur.fetchone()
+        if not row:
+            return False, None
+        return False, {
+            "request_hash": row[0].strip(),
+            "status": row[1],
+            "body": json.loads(row[2]) if row[2] else None,
+        }
+    except fdb.Error as e:
+        print(f"Erro ao reservar chave de idempotência: {e}")
+        if conn: conn.rollback()
+        return False, None
+    finally:
+        if conn: conn.close()
+
+
+def complete_key(user_id, key, status_code, body):
+    """Grava a resposta final da requisição para ser devolvida nas repetições."""
+    conn = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        cur.execute(
+            "UPDATE IDEMPOTENCY_KEYS SET RESPONSE_STATUS = ?, RESPONSE_BODY = ? WHERE USER_ID = ? AND IDEMPOTENCY_KEY = ?;",
+            (status_code, json.dumps(body, default=str), user_id, key)
+        )
+        conn.commit()
+        return True
+    except fdb.Error as e:
+        print(f"Erro ao gravar resposta da chave de idempotência: {e}")
+        if conn: conn.rollback()
+        return False
+    finally:
+        if conn: conn.close()
+
+
+def release_key(user_id, key):
+    """Libera a chave sem guardar resposta (ex.: loja fechada), permitindo nova tentativa."""
+    conn = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        cur.execute("DELETE FROM IDEMPOTENCY_KEYS WHERE USER_ID = ? AND IDEMPOTENCY_KEY = ?;", (user_id, key))
+        conn.commit()
+        return True
+    except fdb.Error as e:
+        print(f"Erro ao liberar chave de idempotência: {e}")
+        if conn: conn.rollback()
+        return False
+    finally:
+        if conn: conn.close()
@@ -1,24 +1,38 @@
 # src/services/ingredient_service.py
 
 import fdb
-from ..database import get_db_connection
+from ..config import Config
+from ..database import after_commit, get_db_connection, in_placeholders
+from . import menu_service, search_service, availability_service
+
+# SQLCODEs do Firebird usados na reserva de estoque
+_CHECK_VIOLATION_SQLCODE = -297  # CHECK (STOCK_QUANTITY >= 0): estoque insuficiente
+_UPDATE_CONFLICT_SQLCODE = -913  # Outro pedido alterou o mesmo ingrediente (update conflict/deadlock)
 
 # --- CRUD de Ingredientes ---
 
 def create_ingredient(data):
-    """Cria um novo ingrediente, incluindo preço."""
+    """Cria um novo ingrediente, incluindo preço e, opcionalmente, o estoque inicial."""
+    stock_quantity = data.get('stock_quantity')
+    # Com controle de estoque, começar zerado já significa esgotado
+    is_available = stock_quantity is None or stock_quantity > 0
     conn = None
     try:
         conn = get_db_connection()
         cur = conn.cursor()
         # ATUALIZADO: Inclui o campo PRICE no insert
-        sql = "INSERT INTO INGREDIENTS (NAME, DESCRIPTION, PRICE) VALUES (?, ?, ?) RETURNING ID, NAME, DESCRIPTION, PRICE, IS_AVAILABLE;"
-        cur.execute(sql, (data['name'], data.get('description'), data.get('price', 0.0)))
+        sql = """
+            INSERT INTO INGREDIENTS (NAME, DESCRIPTION, PRICE, STOCK_QUANTITY, IS_AVAILABLE) VALUES (?, ?, ?, ?, ?)
+            RETURNING ID, NAME, DESCRIPTION, PRICE, IS_AVAILABLE, STOCK_QUANTITY;
+        """
+        cur.execute(sql, (data['name'], data.get('description'), data.get('price', 0.0), stock_quantity, is_available))
         row = cur.fetchone()
+        menu_service.bump_version(conn)
         conn.commit()
+        after_commit(lambda: availability_service.set_ingredient(row[0], name=row[1], is_available=row[4]))
         return {
             "id": row[0], "name": row[1], "description": row[2],
-            "price": row[3], "is_available": row[4]
+            "price": row[3], "is_available": row[4], "stock_quantity": row[5]
         }
     except fdb.Error as e:
         print(f"Erro ao criar ingrediente: {e}")
@@ -34,11 +48,11 @@ def get_all_ingredients():
         conn = get_db_connection()
         cur = conn.cursor()
         # ATUALIZADO: Busca também PRICE e IS_AVAILABLE
-        sql = "SELECT ID, NAME, DESCRIPTION, PRICE, IS_AVAILABLE FROM INGREDIENTS ORDER BY NAME;"
+        sql = "SELECT ID, NAME, DESCRIPTION, PRICE, IS_AVAILABLE, STOCK_QUANTITY FROM INGREDIENTS ORDER BY NAME;"
         cur.execute(sql)
         ingredients = [{
             "id": row[0], "name": row[1], "description": row[2],
-            "price": row[3], "is_available": row[4]
+            "price": row[3], "is_available": row[4], "stock_quantity": row[5]
         } for row in cur.fetchall()]
         return ingredients
     except fdb.Error as e:
@@ -63,8 +77,14 @@ def update_ingredient(ingredient_id, data):
         cur = conn.cursor()
         sql = f"UPDATE INGREDIENTS SET {', '.join(set_parts)} WHERE ID = ?;"
         cur.execute(sql, tuple(values))
+        updated = cur.rowcount > 0
+        menu_service.bump_version(conn)
         conn.commit()
-        return cur.rowcount > 0
+        if updated and 'name' in data:
+            # O nome do ingrediente faz parte do índice de busca dos produtos que o usam
+            after_commit(lambda: search_service.refresh_products_with_ingredient(ingredient_id))
+            after_commit(lambda: availability_service.set_ingredient(ingredient_id, name=data['name']))
+        return updated
     except fdb.Error as e:
         print(f"Erro ao atualizar ingrediente: {e}")
         if conn: conn.rollback()
@@ -83,8 +103,12 @@ def update_ingredient_availability(ingredient_id, is_available):
         cur = conn.cursor()
         sql = "UPDATE INGREDIENTS SET IS_AVAILABLE = ? WHERE ID = ?;"
         cur.execute(sql, (is_available, ingredient_id))
+        updated = cur.rowcount > 0
+        menu_service.bump_version(conn)
         conn.commit()
-        return cur.rowcount > 0
+        if updated:
+            after_commit(lambda: availability_service.publish({ingredient_id: is_available}))
+        return updated
     except fdb.Error as e:
         print(f"Erro ao atualizar disponibilidade do ingrediente: {e}")
         if conn: conn.rollback()
@@ -92,12 +116,266 @@ def update_ingredient_availability(ingredient_id, is_available):
     finally:
         if conn: conn.close()
 
+def update_ingredients_availability(available_ids, unavailable_ids):
+    """
+    Marca vários ingredientes como disponíveis/esgotados em uma única transação
+    (no máximo dois UPDATEs) e avisa os clientes do cardápio com um único delta.
+    Se algum ID não existir, nada é alterado.
+    Retorna uma tupla (alterados {id: disponivel}, ids_nao_encontrados);
+    em caso de erro no banco, (None, None).
+    """
+    wanted = {ingredient_id: True for ingredient_id in available_ids}
+    wanted.update({ingredient_id: False for ingredient_id in unavailable_ids})
+    if not wanted:
+        return {}, []
+
+    conn = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        placeholders, params = in_placeholders(wanted)
+        cur.execute(f"SELECT ID, IS_AVAILABLE FROM INGREDIENTS WHERE ID IN ({placeholders});", params)
+        current = dict(cur.fetchall())
+        missing = sorted(wanted.keys() - current.keys())
+        if missing:
+            return None, missing
+
+        # Só grava (e só avisa) o que realmente muda
+        changes = {ingredient_id: value for ingredient_id, value in wanted.items() if current[ingredient_id] != value}
+        for value in (True, False):
+            ids = [ingredient_id for ingredient_id, new_value in changes.items() if new_value is value]
+            if ids:
+                placeholders, params = in_placeholders(ids)
+                cur.execute(f"UPDATE INGREDIENTS SET IS_AVAILABLE = ? WHERE ID IN ({placeholders});", (value,) + params)
+        if changes:
+            menu_service.bump_version(conn)
+        conn.commit()
+        if changes:
+            after_commit(lambda: availability_service.publish(changes))
+        return changes, []
+    except fdb.Error as e:
+        print(f"Erro ao atualizar disponibilidade dos ingredientes em lote: {e}")
+        if conn: conn.rollback()
+        return None, None
+    finally:
+        if conn: conn.close()
+
 def deactivate_ingredient(ingredient_id):
     """Inativa um ingrediente marcando-o como indisponível."""
     # ATUALIZADO: Agora esta função usa a nova lógica de disponibilidade
     return update_ingredient_availability(ingredient_id, False)
 
 
+# --- Estoque ---
+
+def set_ingredient_stock(ingredient_id, stock_quantity):
+    """
+    Define o estoque de um ingrediente (contagem de inventário). None desliga o
+    controle de estoque; com estoque, o ingrediente fica disponível se ele for > 0.
+    Retorna o ingrediente atualizado ou None se não existir.
+    """
+    conn = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        sql = """
+            UPDATE INGREDIENTS
+            SET STOCK_QUANTITY = ?,
+                IS_AVAILABLE = CASE WHEN CAST(? AS NUMERIC(12, 3)) IS NULL THEN IS_AVAILABLE
+                                    ELSE CAST(? AS NUMERIC(12, 3)) > 0 END
+            WHERE ID = ?
+            RETURNING ID, STOCK_QUANTITY, IS_AVAILABLE;
+        """
+        cur.execute(sql, (stock_quantity, stock_quantity, stock_quantity, ingredient_id))
+        row = cur.fetchone()
+        if not row:
+            return None
+        menu_service.bump_version(conn)
+        conn.commit()
+        after_commit(lambda: availability_service.publish({row[0]: row[2]}))
+        return {"id": row[0], "stock_quantity": row[1], "is_available": row[2]}
+    except fdb.Error as e:
+        print(f"Erro ao definir estoque do ingrediente: {e}")
+        if conn: conn.rollback()
+        return None
+    finally:
+        if conn: conn.close()
+
+
+def restock_ingredient(ingredient_id, amount):
+    """
+    Soma 'amount' ao estoque (entrada de mercadoria), sem sobrescrever as baixas
+    feitas por pedidos concorrentes. Um ingrediente que estava zerado volta a ficar disponível.
+    Retorna o ingrediente atualizado ou None se não existir.
+    """
+    conn = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        sql = """
+            UPDATE INGREDIENTS
+            SET STOCK_QUANTITY = COALESCE(STOCK_QUANTITY, 0) + ?,
+                IS_AVAILABLE = CASE WHEN COALESCE(STOCK_QUANTITY, 0) <= 0 THEN TRUE ELSE IS_AVAILABLE END
+            WHERE ID = ?
+            RETURNING ID, STOCK_QUANTITY, IS_AVAILABLE;
+        """
+        cur.execute(sql, (amount, ingredient_id))
+        row = cur.fetchone()
+        if not row:
+            return None
+        menu_service.bump_version(conn)
+        conn.commit()
+        after_commit(lambda: availability_service.publish({row[0]: row[2]}))
+        return {"id": row[0], "stock_quantity": row[1], "is_available": row[2]}
+    except fdb.Error as e:
+        print(f"Erro ao repor estoque do ingrediente: {e}")
+        if conn: conn.rollback()
+        return None
+    finally:
+        if conn: conn.close()
+
+
+def _sqlcode(error):
+    # O fdb levanta DatabaseError com (mensagem, sqlcode, gdscode)
+    return error.args[1] if len(error.args) > 1 else None
+
+
+def _cart_requirements(items):
+    """
+    Tabela derivada (INGREDIENT_ID, NEEDED) com o consumo do carrinho por ingrediente:
+    quantidade da receita x quantidade do item, mais os extras (na quantidade pedida,
+    como no preço). Ordenada por ID, para que pedidos concorrentes travem as linhas
+    na mesma ordem. Retorna (sql, parametros).
+    """
+    product_quantities, extra_quantities = {}, {}
+    for item in items:
+        product_quantities[item['product_id']] = product_quantities.get(item['product_id'], 0) + item.get('quantity', 1)
+        for extra in item.get('extras') or []:
+            extra_quantities[extra['ingredient_id']] = extra_quantities.get(extra['ingredient_id'], 0) + extra.get('quantity', 1)
+
+    cart = " UNION ALL ".join(
+        ["SELECT CAST(? AS INTEGER) AS PRODUCT_ID, CAST(? AS INTEGER) AS QTY FROM RDB$DATABASE"] * len(product_quantities)
+    )
+    parts = [f"""
+        SELECT pi.INGREDIENT_ID AS INGREDIENT_ID, CAST(pi.QUANTITY * c.QTY AS NUMERIC(12, 3)) AS NEEDED
+        FROM PRODUCT_INGREDIENTS pi
+        JOIN ({cart}) c ON c.PRODUCT_ID = pi.PRODUCT_ID
+    """]
+    params = [value for pair in product_quantities.items() for value in pair]
+    for ingredient_id, quantity in extra_quantities.items():
+        parts.append("SELECT CAST(? AS INTEGER), CAST(? AS NUMERIC(12, 3)) FROM RDB$DATABASE")
+        params += [ingredient_id, quantity]
+
+    sql = f"""
+        SELECT r.INGREDIENT_ID, SUM(r.NEEDED) AS NEEDED
+        FROM ({" UNION ALL ".join(parts)}) r
+        GROUP BY r.INGREDIENT_ID
+        ORDER BY r.INGREDIENT_ID
+    """
+    return sql, params
+
+
+def _execute_stock_merge(cur, sql, params, cache=True):
+    """
+    Executa o MERGE de estoque. Se outro pedido alterou o mesmo ingrediente, o Firebird
+    espera a transação dele terminar e acusa o conflito; como a transação é READ COMMITTED,
+    basta repetir a instrução para ela ler o estoque já atualizado.
+    """
+    for attempt in range(Config.STOCK_RESERVE_MAX_RETRIES + 1):
+        try:
+            cur.execute(sql, params, cache=cache)
+            return
+        except fdb.DatabaseError as e:
+            if _sqlcode(e) != _UPDATE_CONFLICT_SQLCODE or attempt == Config.STOCK_RESERVE_MAX_RETRIES:
+                raise
+
+
+def reserve_stock_for_items(cur, order_id, items):
+    """
+    Baixa o estoque de todo o carrinho em um único MERGE, na transação de 'cur', e registra
+    em ORDER_STOCK_RESERVATIONS o que foi baixado para o pedido 'order_id'.
+    Ingredientes sem controle de estoque (STOCK_QUANTITY nulo) não são alterados nem travados;
+    os que chegam a zero ficam indisponíveis na mesma instrução.
+    Lança ValueError se algum ingrediente não tiver estoque suficiente (nada é baixado).
+    Retorna [(id, nome)] dos ingredientes que se esgotaram com esta reserva.
+    """
+    # O SQL muda com o formato do carrinho: nenhuma destas instruções entra no cache de statements
+    requirements, params = _cart_requirements(items)
+    sql = f"""
+        MERGE INTO INGREDIENTS i
+        USING ({requirements}) r
+        ON i.ID = r.INGREDIENT_ID
+        WHEN MATCHED AND i.STOCK_QUANTITY IS NOT NULL AND r.NEEDED > 0 THEN
+            UPDATE SET i.STOCK_QUANTITY = i.STOCK_QUANTITY - r.NEEDED,
+                       i.IS_AVAILABLE = CASE WHEN i.STOCK_QUANTITY - r.NEEDED <= 0 THEN FALSE ELSE i.IS_AVAILABLE END;
+    """
+    try:
+        _execute_stock_merge(cur, sql, params, cache=False)
+    except fdb.DatabaseError as e:
+        if _sqlcode(e) != _CHECK_VIOLATION_SQLCODE:
+            raise
+        # O CHECK desfez a instrução inteira; só resta descobrir qual ingrediente faltou
+        cur.execute(f"""
+            SELECT FIRST 1 i.NAME
+            FROM INGREDIENTS i
+            JOIN ({requirements}) r ON r.INGREDIENT_ID = i.ID
+            WHERE i.STOCK_QUANTITY < r.NEEDED;
+        """, params, cache=False)
+        row = cur.fetchone()
+        name = row[0] if row else "do pedido"
+        raise ValueError(f"Desculpe, não há estoque suficiente do ingrediente '{name}'.")
+
+    # As linhas baixadas continuam travadas por esta transação: o filtro vê o mesmo estoque do MERGE
+    cur.execute(f"""
+        INSERT INTO ORDER_STOCK_RESERVATIONS (ORDER_ID, INGREDIENT_ID, QUANTITY)
+        SELECT CAST(? AS INTEGER), r.INGREDIENT_ID, r.NEEDED
+        FROM ({requirements}) r
+        JOIN INGREDIENTS i ON i.ID = r.INGREDIENT_ID
+        WHERE i.STOCK_QUANTITY IS NOT NULL AND r.NEEDED > 0;
+    """, [order_id] + params, cache=False)
+
+    cur.execute(f"""
+        SELECT i.ID, i.NAME
+        FROM INGREDIENTS i
+        JOIN ({requirements}) r ON r.INGREDIENT_ID = i.ID
+        WHERE i.STOCK_QUANTITY <= 0 AND r.NEEDED > 0;
+    """, params, cache=False)
+    return cur.fetchall()
+
+
+def release_stock_for_order(cur, order_id):
+    """
+    Devolve ao estoque o que foi registrado na reserva do pedido (cancelado antes do preparo)
+    e apaga o registro, na transação de 'cur'. Um pedido sem reserva (já devolvida ou anterior
+    ao controle de estoque) não devolve nada. Ingredientes que estavam zerados voltam a ficar disponíveis.
+    Retorna os IDs dos ingredientes que voltaram a ficar disponíveis.
+    """
+    cur.execute("""
+        SELECT i.ID
+        FROM ORDER_STOCK_RESERVATIONS r
+        JOIN INGREDIENTS i ON i.ID = r.INGREDIENT_ID
+        WHERE r.ORDER_ID = ? AND i.STOCK_QUANTITY <= 0 AND i.IS_AVAILABLE = FALSE;
+    """, (order_id,))
+    replenished = [row[0] for row in cur.fetchall()]
+
+    sql = """
+        MERGE INTO INGREDIENTS i
+        USING (SELECT INGREDIENT_ID, QUANTITY FROM ORDER_STOCK_RESERVATIONS WHERE ORDER_ID = ?) r
+        ON i.ID = r.INGREDIENT_ID
+        WHEN MATCHED AND i.STOCK_QUANTITY IS NOT NULL THEN
+            UPDATE SET i.STOCK_QUANTITY = i.STOCK_QUANTITY + r.QUANTITY,
+                       i.IS_AVAILABLE = CASE WHEN i.STOCK_QUANTITY <= 0 THEN TRUE ELSE i.IS_AVAILABLE END;
+    """
+    _execute_stock_merge(cur, sql, (order_id,))
+    consume_stock_reservation(cur, order_id)
+    return replenished
+
+
+def consume_stock_reservation(cur, order_id):
+    """Apaga o registro da reserva: os ingredientes foram usados (ou já devolvidos) e não voltam mais ao estoque."""
+    cur.execute("DELETE FROM ORDER_STOCK_RESERVATIONS WHERE ORDER_ID = ?;", (order_id,))
+
+
 # --- Associação Produto <-> Ingrediente ---
 # (Todas as suas funções de associação foram mantidas, pois estão perfeitas)
 
@@ -119,7 +397,10 @@ def add_ingredient_to_product(product_id, ingredient_id, quantity):
                 VALUES (new_data.PRODUCT_ID, new_data.INGREDIENT_ID, new_data.QUANTITY);
         """
         cur.execute(sql, (product_id, ingredient_id, quantity))
+        menu_service.bump_version(conn)
         conn.commit()
+        after_commit(lambda: search_service.refresh_product(product_id))
+        after_commit(lambda: availability_service.add_product_ingredient(product_id, ingredient_id))
         return True
     except fdb.Error as e:
         print(f"Erro ao associar ingrediente ao produto: {e}")
@@ -137,8 +418,13 @@ def remove_ingredient_from_product(product_id, ingredient_id):
         cur = conn.cursor()
         sql = "DELETE FROM PRODUCT_INGREDIENTS WHERE PRODUCT_ID = ? AND INGREDIENT_ID = ?;"
         cur.execute(sql, (product_id, ingredient_id))
+        removed = cur.rowcount > 0
+        menu_service.bump_version(conn)
         conn.commit()
-        return cur.rowcount > 0
+        if removed:
+            after_commit(lambda: search_service.refresh_product(product_id))
+            after_commit(lambda: availability_service.remove_product_ingredient(product_id, ingredient_id))
+        return removed
     except fdb.Error as e:
         print(f"Erro ao remover associação de ingrediente: {e}")
         if conn: conn.rollback()
@@ -1,9 +1,21 @@
 # src/services/loyalty_service.py
 
+import atexit
+import threading
+import time
 import fdb
-from datetime import date
+from datetime import date, datetime, timedelta
+from .. import socketio
+from ..config import Config
 from ..database import get_db_connection
 
+_UPDATE_CONFLICT_SQLCODE = -913  # Um pedido alterou a mesma conta ao mesmo tempo
+_UNIQUE_VIOLATION_SQLCODE = -803
+
+_scheduler_lock = threading.Lock()
+_scheduler_started = False
+_stop_event = threading.Event()
+
 
 def create_loyalty_account_if_not_exists(user_id, cur):
     """Garante que o usuário tenha uma entrada na tabela LOYALTY_POINTS."""
@@ -47,60 +59,57 @@ def earn_points_for_order(user_id, order_id, total_amount, cur):
     print(f"{points_to_earn} pontos ganhos e validade renovada para o usuário {user_id}.")
 
 
+def _balance(accumulated, spent, expiration_date):
+    """
+    Saldo considerando a expiração de forma virtual: com a validade vencida, os pontos
+    restantes já contam como gastos, mesmo antes de o job de expiração gravar isso.
+    """
+    if expiration_date and expiration_date < date.today() and accumulated > spent:
+        spent = accumulated
+    return {"accumulated_points": accumulated, "spent_points": spent, "current_balance": accumulated - spent}
+
+
 def get_loyalty_balance(user_id):
     """
-    Busca o saldo de pontos da tabela LOYALTY_POINTS, verificando a expiração.
+    Busca o saldo de pontos da tabela LOYALTY_POINTS. Somente leitura: a expiração é
+    calculada a partir de POINTS_EXPIRATION_DATE e gravada pelo job diário.
     """
     conn = None
     try:
         conn = get_db_connection()
         cur = conn.cursor()
-        create_loyalty_account_if_not_exists(user_id, cur)
-        conn.commit()
-
-        # AJUSTE: Usa LOYALTY_POINTS
         sql_get = "SELECT ACCUMULATED_POINTS, SPENT_POINTS, POINTS_EXPIRATION_DATE FROM LOYALTY_POINTS WHERE USER_ID = ?;"
         cur.execute(sql_get, (user_id,))
         account = cur.fetchone()
-
-        accumulated, spent, expiration_date = account or (0, 0, None)
-        current_balance = accumulated - spent
-
-        if expiration_date and expiration_date < date.today() and current_balance > 0:
-            points_to_expire = current_balance
-
-            # AJUSTE: Usa LOYALTY_POINTS
-            sql_expire = "UPDATE LOYALTY_POINTS SET SPENT_POINTS = ACCUMULATED_POINTS WHERE USER_ID = ?;"
-            cur.execute(sql_expire, (user_id,))
-
-            sql_add_history = "INSERT INTO LOYALTY_POINTS_HISTORY (USER_ID, POINTS, REASON) VALUES (?, ?, 'Pontos expirados por inatividade');"
-            cur.execute(sql_add_history, (user_id, -points_to_expire))
-            conn.commit()
-
-            return {"accumulated_points": accumulated, "spent_points": accumulated, "current_balance": 0}
-
-        return {"accumulated_points": accumulated, "spent_points": spent, "current_balance": current_balance}
+        # Sem conta ainda: saldo zerado (a conta é criada no primeiro pedido concluído)
+        return _balance(*(account or (0, 0, None)))
     except fdb.Error as e:
         print(f"Erro ao buscar saldo de pontos: {e}")
-        if conn: conn.rollback()
         return None
     finally:
         if conn: conn.close()
 
 
 def redeem_points_for_discount(user_id, points_to_redeem, order_id, cur):
-    """Resgata pontos para aplicar como desconto em um pedido."""
-    balance_data = get_loyalty_balance(user_id)
-    current_balance = balance_data.get("current_balance", 0)
-
-    if current_balance < points_to_redeem:
+    """
+    Resgata pontos para aplicar como desconto em um pedido, na transação de 'cur'.
+    Um único UPDATE condicional confere saldo e validade e debita os pontos; a linha
+    fica travada até o fim do pedido, então resgates simultâneos não gastam o mesmo saldo.
+    """
+    sql_redeem = """
+        UPDATE LOYALTY_POINTS SET SPENT_POINTS = SPENT_POINTS + ?
+        WHERE USER_ID = ? AND ACCUMULATED_POINTS - SPENT_POINTS >= ?
+          AND (POINTS_EXPIRATION_DATE IS NULL OR POINTS_EXPIRATION_DATE >= CURRENT_DATE);
+    """
+    cur.execute(sql_redeem, (points_to_redeem, user_id, points_to_redeem))
+    if cur.rowcount == 0:
+        # Só no caminho de erro: lê o saldo (já com a expiração) para a mensagem
+        cur.execute("SELECT ACCUMULATED_POINTS, SPENT_POINTS, POINTS_EXPIRATION_DATE FROM LOYALTY_POINTS WHERE USER_ID = ?;",
+                    (user_id,))
+        current_balance = _balance(*(cur.fetchone() or (0, 0, None)))["current_balance"]
         raise ValueError(
             f"Saldo de pontos insuficiente. Saldo atual: {current_balance}, Pontos para resgate: {points_to_redeem}")
 
-    # AJUSTE: Usa LOYALTY_POINTS
-    sql_update_account = "UPDATE LOYALTY_POINTS SET SPENT_POINTS = SPENT_POINTS + ? WHERE USER_ID = ?;"
-    cur.execute(sql_update_account, (points_to_redeem, user_id))
-
     sql_add_history = "INSERT INTO LOYALTY_POINTS_HISTORY (USER_ID, ORDER_ID, POINTS, REASON) VALUES (?, ?, ?, ?);"
     reason = f"Resgate de pontos no pedido #{order_id}"
     cur.execute(sql_add_history, (user_id, order_id, -points_to_redeem, reason))
@@ -129,39 +138,195 @@ def get_loyalty_history(user_id):
         if conn: conn.close()
 
 
-def expire_inactive_accounts():
-    """Função para ser rodada por um processo diário (cron job)."""
+# --- Expiração diária dos saldos vencidos ---
+
+def _ensure_expiry_run(run_date):
+    """Cria o registro de progresso da execução do dia, se ainda não existir. Retorna o último USER_ID já processado."""
     conn = None
     try:
         conn = get_db_connection()
         cur = conn.cursor()
-
-        # AJUSTE: Usa LOYALTY_POINTS
-        sql_find_expired = """
-            SELECT USER_ID, ACCUMULATED_POINTS, SPENT_POINTS 
-            FROM LOYALTY_POINTS 
-            WHERE POINTS_EXPIRATION_DATE < CURRENT_DATE 
-            AND ACCUMULATED_POINTS > SPENT_POINTS;
+        sql_create = """
+            MERGE INTO LOYALTY_EXPIRY_RUNS r
+            USING (SELECT CAST(? AS DATE) AS RUN_DATE FROM RDB$DATABASE) s
+            ON r.RUN_DATE = s.RUN_DATE
+            WHEN NOT MATCHED THEN INSERT (RUN_DATE) VALUES (s.RUN_DATE);
         """
-        cur.execute(sql_find_expired)
-        expired_accounts = cur.fetchall()
+        try:
+            cur.execute(sql_create, (run_date,))
+        except fdb.Error as e:
+            # Outro processo criou o registro ao mesmo tempo; seguimos com o dele
+            if (e.args[1] if len(e.args) > 1 else None) != _UNIQUE_VIOLATION_SQLCODE:
+                raise
+            conn.rollback()
+        cur.execute("SELECT LAST_USER_ID FROM LOYALTY_EXPIRY_RUNS WHERE RUN_DATE = ?;", (run_date,))
+        last_user_id = cur.fetchone()[0]
+        conn.commit()
+        return last_user_id
+    finally:
+        if conn: conn.close()
 
-        for user_id, accumulated, spent in expired_accounts:
-            points_to_expire = accumulated - spent
 
-            # AJUSTE: Usa LOYALTY_POINTS
-            sql_expire = "UPDATE LOYALTY_POINTS SET SPENT_POINTS = ACCUMULATED_POINTS WHERE USER_ID = ?;"
-            cur.execute(sql_expire, (user_id,))
+def _expire_chunk(run_date, chunk_size):
+    """
+    Expira o próximo lote de contas vencidas em uma transação curta e grava o progresso nela.
+    A linha da execução do dia é travada primeiro, então dois processos não disputam o mesmo lote.
+    Retorna (contas expiradas, linhas de histórico, pontos expirados, terminou).
+    """
+    conn = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        cur.execute("SELECT LAST_USER_ID, FINISHED_AT FROM LOYALTY_EXPIRY_RUNS WHERE RUN_DATE = ? WITH LOCK;", (run_date,))
+        last_user_id, finished_at = cur.fetchone()
+        if finished_at is not None:
+            conn.commit()
+            return 0, 0, 0, True
+
+        # Trava as contas do lote (na ordem da PK) antes de calcular o que expira
+        sql_lock = """
+            SELECT FIRST ? USER_ID, ACCUMULATED_POINTS - SPENT_POINTS
+            FROM LOYALTY_POINTS
+            WHERE USER_ID > ? AND POINTS_EXPIRATION_DATE < ? AND ACCUMULATED_POINTS > SPENT_POINTS
+            ORDER BY USER_ID
+            WITH LOCK;
+        """
+        cur.execute(sql_lock, (chunk_size, last_user_id, run_date))
+        rows = cur.fetchall()
+        finished = len(rows) < chunk_size
+
+        accounts = history_rows = points = 0
+        if rows:
+            chunk_filter = """
+                USER_ID > ? AND USER_ID <= ?
+                AND POINTS_EXPIRATION_DATE < ? AND ACCUMULATED_POINTS > SPENT_POINTS
+            """
+            chunk_params = (last_user_id, rows[-1][0], run_date)
+
+            sql_history = f"""
+                INSERT INTO LOYALTY_POINTS_HISTORY (USER_ID, POINTS, REASON)
+                SELECT USER_ID, SPENT_POINTS - ACCUMULATED_POINTS, 'Pontos expirados por inatividade'
+                FROM LOYALTY_POINTS
+                WHERE {chunk_filter};
+            """
+            cur.execute(sql_history, chunk_params)
+            history_rows = cur.rowcount
+
+            cur.execute(f"UPDATE LOYALTY_POINTS SET SPENT_POINTS = ACCUMULATED_POINTS WHERE {chunk_filter};", chunk_params)
+            accounts = cur.rowcount
+            points = sum(row[1] for row in rows)
+            last_user_id = rows[-1][0]
+
+        sql_progress = """
+            UPDATE LOYALTY_EXPIRY_RUNS
+            SET LAST_USER_ID = ?, ACCOUNTS_EXPIRED = ACCOUNTS_EXPIRED + ?, POINTS_EXPIRED = POINTS_EXPIRED + ?,
+                FINISHED_AT = IIF(? = 1, CURRENT_TIMESTAMP, NULL)
+            WHERE RUN_DATE = ?;
+        """
+        cur.execute(sql_progress, (last_user_id, accounts, points, int(finished), run_date))
+        conn.commit()
+        return accounts, history_rows, points, finished
+    except fdb.Error:
+        if conn: conn.rollback()
+        raise
+    finally:
+        if conn: conn.close()
 
-            sql_add_history = "INSERT INTO LOYALTY_POINTS_HISTORY (USER_ID, POINTS, REASON) VALUES (?, ?, 'Pontos expirados por inatividade');"
-            cur.execute(sql_add_history, (user_id, -points_to_expire))
-            print(f"Expirado saldo de {points_to_expire} pontos para o usuário {user_id}")
 
-        conn.commit()
-        return len(expired_accounts)
+def expire_inactive_accounts(run_date=None, chunk_size=None):
+    """
+    Expira os saldos com validade anterior a run_date (padrão: hoje), rodado diariamente
+    pelo agendador. Cada lote de LOYALTY_EXPIRY_CHUNK_SIZE contas usa um INSERT ... SELECT
+    no histórico e um UPDATE nos saldos e é confirmado separadamente, então as travas na
+    tabela de pontos duram só um lote. Uma execução interrompida retoma do último lote confirmado.
+    Retorna o relatório da execução, ou None em caso de erro.
+    """
+    run_date = run_date or date.today()
+    chunk_size = chunk_size or Config.LOYALTY_EXPIRY_CHUNK_SIZE
+    started = time.perf_counter()
+    report = {"run_date": run_date.isoformat(), "chunks": 0, "accounts_expired": 0,
+              "history_rows": 0, "points_expired": 0}
+    try:
+        report["resumed_from_user_id"] = _ensure_expiry_run(run_date)
+        finished = False
+        while not finished:
+            for attempt in range(Config.LOYALTY_EXPIRY_MAX_RETRIES + 1):
+                try:
+                    accounts, history_rows, points, finished = _expire_chunk(run_date, chunk_size)
+                    break
+                except fdb.Error as e:
+                    # Um pedido alterou uma conta do lote ao mesmo tempo: refaz o lote
+                    code = e.args[1] if len(e.args) > 1 else None
+                    if code != _UPDATE_CONFLICT_SQLCODE or attempt == Config.LOYALTY_EXPIRY_MAX_RETRIES:
+                        raise
+            if accounts:
+                report["chunks"] += 1
+                report["accounts_expired"] += accounts
+                report["history_rows"] += history_rows
+                report["points_expired"] += points
     except fdb.Error as e:
         print(f"Erro durante o processo de expiração de pontos: {e}")
-        if conn: conn.rollback()
-        return -1
+        return None
+
+    report["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+    print(f"Expiração de pontos ({report['run_date']}): {report['accounts_expired']} conta(s), "
+          f"{report['points_expired']} ponto(s) em {report['chunks']} lote(s), {report['elapsed_seconds']}s.")
+    return report
+
+
+# --- Agendador ---
+
+def _seconds_until_next_run(now=None):
+    """Segundos até o próximo LOYALTY_EXPIRY_TIME (HH:MM, hora local)."""
+    now = now or datetime.now()
+    hour, minute = (int(part) for part in Config.LOYALTY_EXPIRY_TIME.split(':'))
+    next_run = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if next_run <= now:
+        next_run += timedelta(days=1)
+    return (next_run - now).total_seconds()
+
+
+def _has_unfinished_run(run_date):
+    conn = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        cur.execute("SELECT 1 FROM LOYALTY_EXPIRY_RUNS WHERE RUN_DATE = ? AND FINISHED_AT IS NULL;", (run_date,))
+        return cur.fetchone() is not None
+    except fdb.Error as e:
+        print(f"Erro ao verificar a expiração de pontos pendente: {e}")
+        return False
     finally:
-        if conn: conn.close()
\ No newline at end of file
+        if conn: conn.close()
+
+
+def _run_expiry_scheduler(app):
+    with app.app_context():
+        # Execução do dia interrompida (processo reiniciado no meio): retoma já
+        try:
+            if _has_unfinished_run(date.today()):
+                expire_inactive_accounts()
+        except Exception as e:
+            print(f"Erro ao retomar a expiração de pontos pendente: {e}")
+        while not _stop_event.wait(_seconds_until_next_run()):
+            try:
+                expire_inactive_accounts()
+            except Exception as e:
+                print(f"Erro no agendador de expiração de pontos: {e}")
+
+
+def start_expiry_scheduler(app):
+    """Inicia a expiração diária em segundo plano. Só a primeira chamada do processo tem efeito."""
+    global _scheduler_started
+    with _scheduler_lock:
+        if _scheduler_started:
+            return False
+        _scheduler_started = True
+    _stop_event.clear()
+    socketio.start_background_task(_run_expiry_scheduler, app)
+    atexit.register(stop_expiry_scheduler)
+    return True
+
+
+def stop_expiry_scheduler():
+    _stop_event.set()
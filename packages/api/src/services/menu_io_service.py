@@ -0,0 +1,548 @@
+# src/services/menu_io_service.py
+
+import csv
+import io
+import json
+from decimal import Decimal, InvalidOperation
+
+import fdb
+from ..database import after_commit, get_db_connection, in_placeholders
+from . import menu_service, search_service, availability_service
+
+# Importação/exportação do cardápio inteiro. Os registros são identificados pelo NOME
+# (seções, ingredientes e produtos), para que o mesmo arquivo funcione em qualquer base.
+#
+# CSV: uma linha por registro, com a coluna 'record' dizendo o tipo:
+#   section    -> name, display_order
+#   ingredient -> name, description, price, is_available
+#   product    -> name, description, price, sections (nomes separados por '|')
+#   recipe     -> name (do produto), ingredient, quantity
+# JSON: {"sections": [...], "ingredients": [...],
+#        "products": [{..., "sections": [nomes], "ingredients": [{"name", "quantity"}]}]}
+#
+# Para cada produto do arquivo, a receita e as seções do arquivo substituem as do banco.
+CSV_COLUMNS = ['record', 'name', 'description', 'price', 'display_order', 'is_available',
+               'sections', 'ingredient', 'quantity']
+SECTION_SEPARATOR = '|'
+
+# Linhas por MERGE (cada linha é um SELECT ... FROM RDB$DATABASE no UNION ALL da origem)
+_BATCH_SIZE = 100
+# Máximo de erros de validação devolvidos
+_MAX_ERRORS = 100
+
+_TRUE_VALUES = {'true', '1', 'sim', 's', 'yes', 'y'}
+_FALSE_VALUES = {'false', '0', 'nao', 'não', 'n', 'no'}
+
+
+class MenuImportError(ValueError):
+    """Arquivo inválido. 'errors' traz a lista de problemas encontrados ({"where", "error"})."""
+
+    def __init__(self, errors):
+        super().__init__(f"{len(errors)} erro(s) no arquivo do cardápio.")
+        self.errors = errors
+
+
+# --- Leitura e validação ---
+
+class _Validator:
+    def __init__(self):
+        self.errors = []
+
+    def error(self, where, message):
+        if len(self.errors) < _MAX_ERRORS:
+            self.errors.append({"where": where, "error": message})
+
+    def text(self, where, value, field, required=False):
+        value = value.strip() if isinstance(value, str) else value
+        if value in (None, ''):
+            if required:
+                self.error(where, f"O campo '{field}' é obrigatório.")
+            return None
+        if not isinstance(value, str):
+            self.error(where, f"O campo '{field}' deve ser texto.")
+            return None
+        return value
+
+    def decimal(self, where, value, field, required=False, positive=False):
+        if value in (None, ''):
+            if required:
+                self.error(where, f"O campo '{field}' é obrigatório.")
+            return None
+        try:
+            if isinstance(value, bool):
+                raise InvalidOperation
+            number = Decimal(str(value).strip().replace(',', '.'))
+        except (InvalidOperation, ValueError):
+            self.error(where, f"O campo '{field}' deve ser um número.")
+            return None
+        if not number.is_finite() or number < 0 or (positive and number == 0):
+            self.error(where, f"O campo '{field}' deve ser {'maior que zero' if positive else 'zero ou mais'}.")
+            return None
+        return number
+
+    def integer(self, where, value, field, default=0):
+        if value in (None, ''):
+            return default
+        try:
+            if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+                raise ValueError
+            return int(str(value).strip()) if isinstance(value, str) else int(value)
+        except ValueError:
+            self.error(where, f"O campo '{field}' deve ser um número inteiro.")
+            return default
+
+    def boolean(self, where, value, field):
+        if value in (None, ''):
+            return None
+        if isinstance(value, bool):
+            return value
+        normalized = str(value).strip().lower()
+        if normalized in _TRUE_VALUES:
+            return True
+        if normalized in _FALSE_VALUES:
+            return False
+        self.error(where, f"O campo '{field}' deve ser verdadeiro ou falso.")
+        return None
+
+
+def _new_menu():
+    return {"sections": {}, "ingredients": {}, "products": {}}
+
+
+def _add_unique(validator, collection, kind, where, record):
+    if record["name"] is None:
+        return
+    if record["name"] in collection:
+        validator.error(where, f"{kind} '{record['name']}' aparece mais de uma vez no arquivo.")
+        return
+    collection[record["name"]] = record
+
+
+def _add_recipe_line(validator, product, where, ingredient, quantity):
+    if ingredient is None or quantity is None:
+        return
+    if ingredient in product["ingredients"]:
+        validator.error(where, f"O ingrediente '{ingredient}' aparece duas vezes na receita de '{product['name']}'.")
+        return
+    product["ingredients"][ingredient] = quantity
+
+
+def parse_json(data):
+    """Lê o cardápio de um documento JSON já decodificado. Lança MenuImportError."""
+    v = _Validator()
+    menu = _new_menu()
+    if not isinstance(data, dict):
+        raise MenuImportError([{"where": "$", "error": "O documento deve ser um objeto JSON."}])
+
+    def records(key):
+        items = data.get(key, [])
+        if not isinstance(items, list):
+            v.error(key, f"'{key}' deve ser uma lista.")
+            return []
+        valid = []
+        for i, item in enumerate(items):
+            if isinstance(item, dict):
+                valid.append((f"{key}[{i}]", item))
+            else:
+                v.error(f"{key}[{i}]", "Cada registro deve ser um objeto.")
+        return valid
+
+    for where, item in records('sections'):
+        _add_unique(v, menu["sections"], "Seção", where, {
+            "name": v.text(where, item.get('name'), 'name', required=True),
+            "display_order": v.integer(where, item.get('display_order'), 'display_order'),
+        })
+
+    for where, item in records('ingredients'):
+        _add_unique(v, menu["ingredients"], "Ingrediente", where, {
+            "name": v.text(where, item.get('name'), 'name', required=True),
+            "description": v.text(where, item.get('description'), 'description'),
+            "price": v.decimal(where, item.get('price'), 'price'),
+            "is_available": v.boolean(where, item.get('is_available'), 'is_available'),
+        })
+
+    for where, item in records('products'):
+        product = {
+            "name": v.text(where, item.get('name'), 'name', required=True),
+            "description": v.text(where, item.get('description'), 'description'),
+            "price": v.decimal(where, item.get('price'), 'price', required=True),
+            "sections": [],
+            "ingredients": {},
+        }
+        sections = item.get('sections', [])
+        if not isinstance(sections, list):
+            v.error(where, "'sections' deve ser uma lista de nomes de seção.")
+            sections = []
+        for name in sections:
+            name = v.text(where, name, 'sections')
+            if name and name not in product["sections"]:
+                product["sections"].append(name)
+        lines = item.get('ingredients', [])
+        if not isinstance(lines, list):
+            v.error(where, "'ingredients' deve ser uma lista de {name, quantity}.")
+            lines = []
+        for j, line in enumerate(lines):
+            line_where = f"{where}.ingredients[{j}]"
+            if not isinstance(line, dict):
+                v.error(line_where, "Cada linha da receita deve ser um objeto {name, quantity}.")
+                continue
+            _add_recipe_line(v, product, line_where,
+                             v.text(line_where, line.get('name'), 'name', required=True),
+                             v.decimal(line_where, line.get('quantity'), 'quantity', required=True, positive=True))
+        _add_unique(v, menu["products"], "Produto", where, product)
+
+    if v.errors:
+        raise MenuImportError(v.errors)
+    return menu
+
+
+def parse_csv(text):
+    """Lê o cardápio de um CSV (ver CSV_COLUMNS). Lança MenuImportError."""
+    v = _Validator()
+    menu = _new_menu()
+    reader = csv.DictReader(io.StringIO(text))
+    missing_columns = {'record', 'name'} - set(reader.fieldnames or [])
+    if missing_columns:
+        raise MenuImportError([{"where": "cabeçalho", "error": f"Colunas obrigatórias ausentes: {sorted(missing_columns)}."}])
+
+    recipes = []
+    for row in reader:
+        where = f"linha {reader.line_num}"
+        record = (row.get('record') or '').strip().lower()
+        if record == 'section':
+            _add_unique(v, menu["sections"], "Seção", where, {
+                "name": v.text(where, row.get('name'), 'name', required=True),
+                "display_order": v.integer(where, row.get('display_order'), 'display_order'),
+            })
+        elif record == 'ingredient':
+            _add_unique(v, menu["ingredients"], "Ingrediente", where, {
+                "name": v.text(where, row.get('name'), 'name', required=True),
+                "description": v.text(where, row.get('description'), 'description'),
+                "price": v.decimal(where, row.get('price'), 'price'),
+                "is_available": v.boolean(where, row.get('is_available'), 'is_available'),
+            })
+        elif record == 'product':
+            sections = []
+            for name in (row.get('sections') or '').split(SECTION_SEPARATOR):
+                name = name.strip()
+                if name and name not in sections:
+                    sections.append(name)
+            _add_unique(v, menu["products"], "Produto", where, {
+                "name": v.text(where, row.get('name'), 'name', required=True),
+                "description": v.text(where, row.get('description'), 'description'),
+                "price": v.decimal(where, row.get('price'), 'price', required=True),
+                "sections": sections,
+                "ingredients": {},
+            })
+        elif record == 'recipe':
+            # Resolvidas depois, para que a receita possa vir antes ou depois do produto
+            recipes.append((where, v.text(where, row.get('name'), 'name', required=True),
+                            v.text(where, row.get('ingredient'), 'ingredient', required=True),
+                            v.decimal(where, row.get('quantity'), 'quantity', required=True, positive=True)))
+        else:
+            v.error(where, "A coluna 'record' deve ser section, ingredient, product ou recipe.")
+
+    for where, product_name, ingredient, quantity in recipes:
+        if product_name is None:
+            continue
+        product = menu["products"].get(product_name)
+        if product is None:
+            v.error(where, f"Receita de um produto que não está no arquivo: '{product_name}'.")
+            continue
+        _add_recipe_line(v, product, where, ingredient, quantity)
+
+    if v.errors:
+        raise MenuImportError(v.errors)
+    return menu
+
+
+def load_menu(text, fmt):
+    """Lê o cardápio de um texto no formato 'csv' ou 'json'. Lança MenuImportError."""
+    if fmt == 'csv':
+        return parse_csv(text)
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise MenuImportError([{"where": f"linha {e.lineno}", "error": f"JSON inválido: {e.msg}."}])
+    return parse_json(data)
+
+
+# --- Importação ---
+
+def _derived_rows(columns, rows):
+    """
+    Tabela derivada com as linhas dadas (SELECT CAST(? AS tipo) ... FROM RDB$DATABASE UNION ALL ...).
+    Lotes do mesmo tamanho geram o mesmo SQL e reaproveitam o statement preparado.
+    Retorna (sql, parametros).
+    """
+    select = "SELECT " + ", ".join(f"CAST(? AS {type_}) AS {name}" for name, type_ in columns) + " FROM RDB$DATABASE"
+    return " UNION ALL ".join([select] * len(rows)), [value for row in rows for value in row]
+
+
+def _merge(cur, columns, rows, merge_sql):
+    """Executa 'merge_sql' (com {source} no lugar da origem) em lotes de _BATCH_SIZE linhas."""
+    for start in range(0, len(rows), _BATCH_SIZE):
+        source, params = _derived_rows(columns, rows[start:start + _BATCH_SIZE])
+        cur.execute(merge_sql.format(source=source), params)
+
+
+def _execute_in_batches(cur, sql, ids, extra_params=()):
+    """Executa 'sql' (com {ids} no lugar da lista do IN) para os IDs, em lotes."""
+    ids = list(ids)
+    for start in range(0, len(ids), _BATCH_SIZE):
+        placeholders, params = in_placeholders(ids[start:start + _BATCH_SIZE])
+        cur.execute(sql.format(ids=placeholders), tuple(extra_params) + params)
+
+
+def _name_map(cur, sql):
+    """
+    {nome: id} a partir de (ID, NOME[, ATIVO]) ordenado de forma que a linha
+    preferida (ativa e mais nova) venha por último.
+    """
+    cur.execute(sql)
+    return {row[1]: row[0] for row in cur.fetchall()}
+
+
+def _load_maps(cur):
+    return (
+        _name_map(cur, "SELECT ID, NAME FROM PRODUCT_SECTIONS ORDER BY ID;"),
+        _name_map(cur, "SELECT ID, NAME FROM INGREDIENTS ORDER BY ID;"),
+        _name_map(cur, "SELECT ID, NAME FROM PRODUCTS ORDER BY IS_ACTIVE, ID;"),
+    )
+
+
+def _check_references(menu, section_ids, ingredient_ids):
+    """Seções e ingredientes citados pelos produtos precisam estar no arquivo ou no banco."""
+    v = _Validator()
+    for product in menu["products"].values():
+        for name in product["sections"]:
+            if name not in menu["sections"] and name not in section_ids:
+                v.error(f"produto '{product['name']}'", f"Seção '{name}' não existe no arquivo nem no banco.")
+        for name in product["ingredients"]:
+            if name not in menu["ingredients"] and name not in ingredient_ids:
+                v.error(f"produto '{product['name']}'", f"Ingrediente '{name}' não existe no arquivo nem no banco.")
+    return v.errors
+
+
+def _count(records, existing):
+    created = sum(1 for name in records if name not in existing)
+    return {"created": created, "updated": len(records) - created}
+
+
+def import_menu(menu, user_id=None, deactivate_missing=False, dry_run=False):
+    """
+    Aplica um cardápio lido por parse_json/parse_csv em uma única transação:
+    MERGE em lotes de seções, ingredientes e produtos (por nome) e, para cada produto
+    do arquivo, troca a receita e as seções pelas do arquivo.
+    deactivate_missing inativa os produtos ativos que não estão no arquivo.
+    dry_run valida tudo (inclusive as referências ao banco) sem gravar.
+    Retorna o resumo do que foi (ou seria) feito. Lança MenuImportError se o arquivo
+    citar seções/ingredientes inexistentes; retorna None em caso de erro no banco.
+    """
+    conn = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        section_ids, ingredient_ids, product_ids = _load_maps(cur)
+
+        errors = _check_references(menu, section_ids, ingredient_ids)
+        if errors:
+            raise MenuImportError(errors)
+
+        summary = {
+            "sections": _count(menu["sections"], section_ids),
+            "ingredients": _count(menu["ingredients"], ingredient_ids),
+            "products": _count(menu["products"], product_ids),
+            "recipe_lines": sum(len(p["ingredients"]) for p in menu["products"].values()),
+            "section_items": sum(len(p["sections"]) for p in menu["products"].values()),
+            "deactivated": 0,
+            "dry_run": dry_run,
+        }
+        # Produtos ativos fora do arquivo (só consulta; o ID preferido de cada nome é o ativo)
+        missing_ids = []
+        if deactivate_missing:
+            cur.execute("SELECT ID, NAME FROM PRODUCTS WHERE IS_ACTIVE = TRUE;")
+            missing_ids = [row[0] for row in cur.fetchall() if row[1] not in menu["products"]]
+            summary["deactivated"] = len(missing_ids)
+        if dry_run:
+            return summary
+
+        _merge(cur, [
+            ("ID", "INTEGER"), ("NAME", "TYPE OF COLUMN PRODUCT_SECTIONS.NAME"),
+            ("DISPLAY_ORDER", "TYPE OF COLUMN PRODUCT_SECTIONS.DISPLAY_ORDER"),
+            ("USER_ID", "INTEGER"),
+        ], [(section_ids.get(s["name"]), s["name"], s["display_order"], user_id) for s in menu["sections"].values()], """
+            MERGE INTO PRODUCT_SECTIONS t USING ({source}) s ON t.ID = s.ID
+            WHEN MATCHED THEN UPDATE SET t.DISPLAY_ORDER = s.DISPLAY_ORDER
+            WHEN NOT MATCHED THEN INSERT (NAME, DISPLAY_ORDER, CREATED_BY_USER_ID)
+                VALUES (s.NAME, s.DISPLAY_ORDER, s.USER_ID);
+        """)
+
+        _merge(cur, [
+            ("ID", "INTEGER"), ("NAME", "TYPE OF COLUMN INGREDIENTS.NAME"),
+            ("DESCRIPTION", "TYPE OF COLUMN INGREDIENTS.DESCRIPTION"),
+            ("PRICE", "TYPE OF COLUMN INGREDIENTS.PRICE"), ("IS_AVAILABLE", "BOOLEAN"),
+        ], [(ingredient_ids.get(i["name"]), i["name"], i["description"], i["price"], i["is_available"])
+            for i in menu["ingredients"].values()], """
+            MERGE INTO INGREDIENTS t USING ({source}) s ON t.ID = s.ID
+            WHEN MATCHED THEN UPDATE SET
+                t.DESCRIPTION = s.DESCRIPTION,
+                t.PRICE = COALESCE(s.PRICE, t.PRICE),
+                t.IS_AVAILABLE = COALESCE(s.IS_AVAILABLE, t.IS_AVAILABLE)
+            WHEN NOT MATCHED THEN INSERT (NAME, DESCRIPTION, PRICE, IS_AVAILABLE)
+                VALUES (s.NAME, s.DESCRIPTION, COALESCE(s.PRICE, 0), COALESCE(s.IS_AVAILABLE, TRUE));
+        """)
+
+        _merge(cur, [
+            ("ID", "INTEGER"), ("NAME", "TYPE OF COLUMN PRODUCTS.NAME"),
+            ("DESCRIPTION", "TYPE OF COLUMN PRODUCTS.DESCRIPTION"), ("PRICE", "TYPE OF COLUMN PRODUCTS.PRICE"),
+        ], [(product_ids.get(p["name"]), p["name"], p["description"], p["price"]) for p in menu["products"].values()], """
+            MERGE INTO PRODUCTS t USING ({source}) s ON t.ID = s.ID
+            WHEN MATCHED THEN UPDATE SET t.DESCRIPTION = s.DESCRIPTION, t.PRICE = s.PRICE, t.IS_ACTIVE = TRUE
+            WHEN NOT MATCHED THEN INSERT (NAME, DESCRIPTION, PRICE) VALUES (s.NAME, s.DESCRIPTION, s.PRICE);
+        """)
+
+        # IDs dos registros recém-criados
+        section_ids, ingredient_ids, product_ids = _load_maps(cur)
+        imported_ids = [product_ids[name] for name in menu["products"]]
+
+        # Receitas e seções dos produtos do arquivo são substituídas pelas do arquivo
+        _execute_in_batches(cur, "DELETE FROM PRODUCT_INGREDIENTS WHERE PRODUCT_ID IN ({ids});", imported_ids)
+        _execute_in_batches(cur, "DELETE FROM PRODUCT_SECTION_ITEMS WHERE PRODUCT_ID IN ({ids});", imported_ids)
+
+        _merge(cur, [
+            ("PRODUCT_ID", "INTEGER"), ("INGREDIENT_ID", "INTEGER"),
+            ("QUANTITY", "TYPE OF COLUMN PRODUCT_INGREDIENTS.QUANTITY"),
+        ], [(product_ids[p["name"]], ingredient_ids[name], quantity)
+            for p in menu["products"].values() for name, quantity in p["ingredients"].items()], """
+            MERGE INTO PRODUCT_INGREDIENTS t USING ({source}) s
+            ON t.PRODUCT_ID = s.PRODUCT_ID AND t.INGREDIENT_ID = s.INGREDIENT_ID
+            WHEN MATCHED THEN UPDATE SET t.QUANTITY = s.QUANTITY
+            WHEN NOT MATCHED THEN INSERT (PRODUCT_ID, INGREDIENT_ID, QUANTITY)
+                VALUES (s.PRODUCT_ID, s.INGREDIENT_ID, s.QUANTITY);
+        """)
+
+        _merge(cur, [
+            ("PRODUCT_ID", "INTEGER"), ("SECTION_ID", "INTEGER"),
+        ], [(product_ids[p["name"]], section_ids[name]) for p in menu["products"].values() for name in p["sections"]], """
+            MERGE INTO PRODUCT_SECTION_ITEMS t USING ({source}) s
+            ON t.PRODUCT_ID = s.PRODUCT_ID AND t.SECTION_ID = s.SECTION_ID
+            WHEN NOT MATCHED THEN INSERT (PRODUCT_ID, SECTION_ID) VALUES (s.PRODUCT_ID, s.SECTION_ID);
+        """)
+
+        if missing_ids:
+            _execute_in_batches(cur, "UPDATE PRODUCTS SET IS_ACTIVE = FALSE WHERE ID IN ({ids});", missing_ids)
+
+        menu_service.bump_version(conn)
+        conn.commit()
+        # Os índices em memória são remontados a partir do banco na próxima consulta
+        after_commit(search_service.invalidate_index)
+        after_commit(availability_service.invalidate)
+        return summary
+    except fdb.Error as e:
+        print(f"Erro ao importar o cardápio: {e}")
+        if conn: conn.rollback()
+        return None
+    finally:
+        if conn: conn.close()
+
+
+# --- Exportação ---
+
+def _export_records():
+    """
+    Gera o cardápio atual como (tipo, registro), lendo o banco aos poucos:
+    seções, ingredientes e produtos ativos (cada um com suas seções e receita).
+    """
+    conn = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+
+        cur.execute("SELECT NAME, DISPLAY_ORDER FROM PRODUCT_SECTIONS ORDER BY DISPLAY_ORDER, NAME;")
+        for row in cur:
+            yield "section", {"name": row[0], "display_order": row[1]}
+
+        cur.execute("SELECT NAME, DESCRIPTION, PRICE, IS_AVAILABLE FROM INGREDIENTS ORDER BY NAME;")
+        for row in cur:
+            yield "ingredient", {"name": row[0], "description": row[1], "price": row[2], "is_available": row[3]}
+
+        cur.execute("""
+            SELECT psi.PRODUCT_ID, s.NAME
+            FROM PRODUCT_SECTION_ITEMS psi
+            JOIN PRODUCT_SECTIONS s ON s.ID = psi.SECTION_ID
+            ORDER BY s.DISPLAY_ORDER, s.NAME;
+        """)
+        sections_by_product = {}
+        for product_id, section_name in cur.fetchall():
+            sections_by_product.setdefault(product_id, []).append(section_name)
+
+        # Produtos e receitas em uma consulta, agrupados em uma passada (linhas ordenadas por produto)
+        cur.execute("""
+            SELECT p.ID, p.NAME, p.DESCRIPTION, p.PRICE, i.NAME, pi.QUANTITY
+            FROM PRODUCTS p
+            LEFT JOIN PRODUCT_INGREDIENTS pi ON pi.PRODUCT_ID = p.ID
+            LEFT JOIN INGREDIENTS i ON i.ID = pi.INGREDIENT_ID
+            WHERE p.IS_ACTIVE = TRUE
+            ORDER BY p.NAME, p.ID, i.NAME;
+        """)
+        product = None
+        for row in cur:
+            if product is None or product["id"] != row[0]:
+                if product is not None:
+                    yield "product", product
+                product = {"id": row[0], "name": row[1], "description": row[2], "price": row[3],
+                           "sections": sections_by_product.get(row[0], []), "ingredients": []}
+            if row[4] is not None:
+                product["ingredients"].append({"name": row[4], "quantity": row[5]})
+        if product is not None:
+            yield "product", product
+    finally:
+        if conn: conn.close()
+
+
+def _json_value(value):
+    return str(value) if isinstance(value, Decimal) else value
+
+
+def export_csv():
+    """Gera o CSV do cardápio em pedaços de texto (para resposta em streaming)."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_COLUMNS, extrasaction='ignore')
+
+    def flush():
+        chunk = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return chunk
+
+    writer.writeheader()
+    yield flush()
+    for kind, record in _export_records():
+        if kind == "product":
+            writer.writerow({"record": kind, "name": record["name"], "description": record["description"],
+                             "price": record["price"], "sections": SECTION_SEPARATOR.join(record["sections"])})
+            for line in record["ingredients"]:
+                writer.writerow({"record": "recipe", "name": record["name"],
+                                 "ingredient": line["name"], "quantity": line["quantity"]})
+        else:
+            writer.writerow(dict(record, record=kind))
+        yield flush()
+
+
+def export_json():
+    """Gera o JSON do cardápio em pedaços de texto (para resposta em streaming)."""
+    keys = {"section": "sections", "ingredient": "ingredients", "product": "products"}
+    current = None
+    first = True
+    yield "{"
+    for kind, record in _export_records():
+        if kind == "product":
+            record = {key: value for key, value in record.items() if key != "id"}
+            record["ingredients"] = [{k: _json_value(v) for k, v in line.items()} for line in record["ingredients"]]
+        if keys[kind] != current:
+            yield ("]," if current else "") + json.dumps(keys[kind]) + ": ["
+            current, first = keys[kind], True
+        yield ("" if first else ",") + "\n" + json.dumps({k: _json_value(v) for k, v in record.items()}, ensure_ascii=False)
+        first = False
+    yield ("]" if current else "") + "}\n"
@@ -0,0 +1,207 @@
+# src/services/menu_service.py
+
+import hashlib
+import threading
+import time
+import fdb
+from flask import current_app
+from ..config import Config
+from ..database import after_commit, current_unit_of_work, get_db_connection, get_pool
+from . import availability_service
+
+# Snapshot do cardápio, montado e serializado uma vez por versão:
+# {"version": int, "bodies": {nome: (json_bytes, etag)}, "product_ingredients": {id: (json_bytes, etag)}}
+_snapshot = None
+_snapshot_lock = threading.Lock()
+# Momento (time.monotonic) da última conferência da versão no banco
+_last_version_check = 0.0
+# Incrementado a cada versão nova confirmada por este processo: uma conferência que
+# começou antes dela não pode marcar a versão como conferida
+_version_bumps = 0
+
+
+# SQLCODE do Firebird para conflito de atualização (outra transação alterou MENU_VERSION)
+_UPDATE_CONFLICT_SQLCODE = -913
+_BUMP_MAX_RETRIES = 3
+
+
+def bump_version(conn):
+    """
+    Incrementa a versão do cardápio depois que a escrita de 'conn' for confirmada. Toda
+    escrita em produtos, seções, ingredientes e suas associações chama isto antes do commit.
+    Dentro da unidade de trabalho, o incremento roda após a confirmação real, numa transação
+    curta própria: a linha única de MENU_VERSION não fica travada pela requisição e um
+    conflito nela não desfaz a escrita (ex.: o pedido que esgotou um ingrediente).
+    Fora dela, roda na transação de 'conn'.
+    """
+    if current_unit_of_work() is not None:
+        after_commit(_bump_committed_version)
+        return
+    _execute_bump(conn.cursor())
+    _schedule_version_check()
+
+
+def _execute_bump(cur):
+    # Em READ COMMITTED, repetir a instrução após o conflito lê a versão já confirmada
+    for attempt in range(_BUMP_MAX_RETRIES + 1):
+        try:
+            cur.execute("UPDATE MENU_VERSION SET VERSION = VERSION + 1 WHERE ID = 1;")
+            return
+        except fdb.DatabaseError as e:
+            code = e.args[1] if len(e.args) > 1 else None
+            if code != _UPDATE_CONFLICT_SQLCODE or attempt == _BUMP_MAX_RETRIES:
+                raise
+
+
+def _bump_committed_version():
+    conn = None
+    try:
+        conn = get_pool().acquire()
+        _execute_bump(conn.cursor())
+        conn.commit()
+    except fdb.Error as e:
+        print(f"Erro ao incrementar a versão do cardápio: {e}")
+        if conn: conn.rollback()
+    finally:
+        if conn: conn.close()
+    # Só agora a mudança é visível: uma conferência feita antes leu a versão antiga
+    _schedule_version_check()
+
+
+def _schedule_version_check():
+    """Confere a versão já na próxima leitura, sem esperar o intervalo."""
+    global _last_version_check, _version_bumps
+    _version_bumps += 1
+    _last_version_check = 0.0
+
+
+def _serialize(data):
+    body = current_app.json.dumps(data).encode('utf-8')
+    return body, hashlib.sha256(body).hexdigest()[:32]
+
+
+def _build_snapshot(cur, version):
+    """Monta o cardápio completo em 5 consultas e serializa cada visão uma única vez."""
+    cur.execute("SELECT ID, NAME, DISPLAY_ORDER FROM PRODUCT_SECTIONS ORDER BY DISPLAY_ORDER, NAME;")
+    sections = [{"id": row[0], "name": row[1], "display_order": row[2]} for row in cur.fetchall()]
+
+    cur.execute("SELECT SECTION_ID, PRODUCT_ID FROM PRODUCT_SECTION_ITEMS;")
+    section_items = cur.fetchall()
+
+    cur.execute("SELECT ID, NAME, DESCRIPTION, PRICE FROM PRODUCTS WHERE IS_ACTIVE = TRUE ORDER BY NAME;")
+    products = [{"id": row[0], "name": row[1], "description": row[2], "price": str(row[3])} for row in cur.fetchall()]
+
+    sql_product_ingredients = """
+        SELECT pi.PRODUCT_ID, i.ID, i.NAME, pi.QUANTITY, i.PRICE, i.IS_AVAILABLE
+        FROM PRODUCT_INGREDIENTS pi
+        JOIN INGREDIENTS i ON pi.INGREDIENT_ID = i.ID
+        JOIN PRODUCTS p ON pi.PRODUCT_ID = p.ID
+        WHERE p.IS_ACTIVE = TRUE;
+    """
+    cur.execute(sql_product_ingredients)
+    ingredients_by_product = {}
+    for row in cur.fetchall():
+        ingredients_by_product.setdefault(row[0], []).append({
+            "ingredient_id": row[1], "name": row[2], "quantity": row[3],
+            "price": row[4], "is_available": row[5]
+        })
+
+    cur.execute("SELECT ID, NAME, DESCRIPTION, PRICE, IS_AVAILABLE FROM INGREDIENTS ORDER BY NAME;")
+    ingredients = [{
+        "id": row[0], "name": row[1], "description": row[2],
+        "price": row[3], "is_available": row[4]
+    } for row in cur.fetchall()]
+
+    # O índice de disponibilidade em memória (checkout) é recarregado com os mesmos dados,
+    # o que também traz as mudanças feitas por outros processos
+    availability_service.load_from(
+        [(i["id"], i["name"], i["is_available"]) for i in ingredients],
+        [(product_id, item["ingredient_id"]) for product_id, items in ingredients_by_product.items() for item in items]
+    )
+    availability = availability_service.get_products_availability(product["id"] for product in products)
+    for product in products:
+        # Um produto fica indisponível se qualquer ingrediente estiver esgotado
+        product["is_available"] = availability[product["id"]]
+
+    product_ids = {product["id"] for product in products}
+    section_products = {}
+    for section_id, product_id in section_items:
+        if product_id in product_ids:
+            section_products.setdefault(section_id, []).append(product_id)
+
+    menu = {
+        "version": version,
+        "sections": [dict(section, product_ids=section_products.get(section["id"], [])) for section in sections],
+        "products": [
+            dict(product, ingredients=ingredients_by_product.get(product["id"], []))
+            for product in products
+        ],
+        "ingredients": ingredients,
+    }
+
+    return {
+        "version": version,
+        "bodies": {
+            "menu": _serialize(menu),
+            "products": _serialize(products),
+            "sections": _serialize(sections),
+        },
+        "product_ingredients": {
+            product_id: _serialize(items) for product_id, items in ingredients_by_product.items()
+        },
+    }
+
+
+def get_snapshot():
+    """
+    Retorna o snapshot atual do cardápio. A versão no banco é conferida no máximo a
+    cada MENU_VERSION_CHECK_INTERVAL segundos; o snapshot só é remontado se ela mudou.
+    Em caso de erro no banco, devolve o último snapshot (ou None se nunca houve um).
+    """
+    global _snapshot, _last_version_check
+    snapshot = _snapshot
+    if snapshot is not None and time.monotonic() - _last_version_check < Config.MENU_VERSION_CHECK_INTERVAL:
+        return snapshot
+
+    with _snapshot_lock:
+        # Outra requisição pode ter conferido/remontado enquanto esperávamos o lock
+        snapshot = _snapshot
+        if snapshot is not None and time.monotonic() - _last_version_check < Config.MENU_VERSION_CHECK_INTERVAL:
+            return snapshot
+
+        bumps = _version_bumps
+        conn = None
+        try:
+            conn = get_db_connection()
+            cur = conn.cursor()
+            cur.execute("SELECT VERSION FROM MENU_VERSION WHERE ID = 1;")
+            row = cur.fetchone()
+            version = row[0] if row else 0
+            if snapshot is None or snapshot["version"] != version:
+                snapshot = _build_snapshot(cur, version)
+                _snapshot = snapshot
+                print(f"Snapshot do cardápio montado (versão {version}).")
+            if bumps == _version_bumps:
+                _last_version_check = time.monotonic()
+            return snapshot
+        except fdb.Error as e:
+            print(f"Erro ao montar o snapshot do cardápio: {e}")
+            return snapshot
+        finally:
+            if conn: conn.close()
+
+
+def ensure_current():
+    """
+    Confere a versão do cardápio (no máximo a cada MENU_VERSION_CHECK_INTERVAL segundos) e,
+    se outro processo a alterou, recarrega o snapshot e o índice de disponibilidade em memória.
+    Chamado antes de decisões que leem o índice, como o checkout.
+    """
+    get_snapshot()
+
+
+def invalidate_snapshot():
+    """Descarta o snapshot deste processo; a próxima leitura remonta a partir do banco."""
+    global _snapshot
+    with _snapshot_lock:
+        _snapshot = None
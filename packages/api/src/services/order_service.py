@@ -4,9 +4,14 @@ import fdb
 import random
 import string
 
-from . import loyalty_service, notification_service, user_service, email_service, store_service
-from ..database import get_db_connection
-from ..utils import validators
+from . import loyalty_service, store_service, outbox_service, availability_service, ingredient_service, menu_service
+from ..config import Config
+from ..database import after_commit, get_db_connection, in_placeholders
+from ..utils import validators, pagination
+
+
+class OrderWriteError(Exception):
+    """Falha do banco ao gravar o pedido (conflito de trava, pool esgotado, conexão): pode dar certo se repetida."""
 
 
 def _generate_confirmation_code(length=8):
@@ -17,15 +22,22 @@ def _generate_confirmation_code(length=8):
 def create_order(user_id, address_id, items, payment_method, change_for_amount=None, notes="", cpf_on_invoice=None,
                  points_to_redeem=0):
     """
-    Cria um novo pedido validando TUDO: horário da loja, disponibilidade de ingredientes, CPF, etc.
+    Cria um novo pedido validando TUDO: horário da loja, disponibilidade e estoque de ingredientes, CPF, etc.
+    Retorna uma tupla (dados_do_pedido, None) ou (None, "mensagem de erro").
+    Lança OrderWriteError se o banco falhar (a requisição pode ser repetida).
     """
     # NOVO: Adicionar a verificação de loja aberta NO INÍCIO da função
     is_open, message = store_service.is_store_open()
     if not is_open:
-        raise ValueError(message)  # Interrompe a criação do pedido se a loja estiver fechada
+        return None, message  # Interrompe a criação do pedido se a loja estiver fechada
 
     if cpf_on_invoice and not validators.is_valid_cpf(cpf_on_invoice):
-        raise ValueError(f"O CPF informado '{cpf_on_invoice}' é inválido.")
+        return None, f"O CPF informado '{cpf_on_invoice}' é inválido."
+
+    if len(items) > Config.ORDER_MAX_ITEMS:
+        return None, f"O pedido pode ter no máximo {Config.ORDER_MAX_ITEMS} itens."
+    if any(len(item.get('extras') or []) > Config.ORDER_MAX_EXTRAS_PER_ITEM for item in items):
+        return None, f"Cada item pode ter no máximo {Config.ORDER_MAX_EXTRAS_PER_ITEM} extras."
 
     conn = None
     try:
@@ -33,10 +45,7 @@ def create_order(user_id, address_id, items, payment_method, change_for_amount=N
         cur = conn.cursor()
         # --- INÍCIO DA TRANSAÇÃO ---
 
-        # ... (O RESTO DA SUA FUNÇÃO CONTINUA EXATAMENTE IGUAL) ...
-
-        # ETAPA 1: AGREGAÇÃO E VERIFICAÇÃO DE DISPONIBILIDADE DE INGREDIENTES
-        required_ingredients = set()
+        # ETAPA 1: IDS DO CARRINHO
         product_ids = {item['product_id'] for item in items}
         extra_ingredient_ids = set()
 
@@ -45,158 +54,283 @@ def create_order(user_id, address_id, items, payment_method, change_for_amount=N
                 for extra in item['extras']:
                     extra_ingredient_ids.add(extra['ingredient_id'])
 
-        if product_ids:
-            placeholders = ', '.join(['?' for _ in product_ids])
-            sql_base_ingredients = f"SELECT INGREDIENT_ID FROM PRODUCT_INGREDIENTS WHERE PRODUCT_ID IN ({placeholders});"
-            cur.execute(sql_base_ingredients, tuple(product_ids))
-            for row in cur.fetchall():
-                required_ingredients.add(row[0])
-
-        required_ingredients.update(extra_ingredient_ids)
-
-        if required_ingredients:
-            placeholders = ', '.join(['?' for _ in required_ingredients])
-            sql_check_availability = f"SELECT NAME FROM INGREDIENTS WHERE ID IN ({placeholders}) AND IS_AVAILABLE = FALSE;"
-            cur.execute(sql_check_availability, tuple(required_ingredients))
-            unavailable_ingredient = cur.fetchone()
-            if unavailable_ingredient:
-                raise ValueError(f"Desculpe, o ingrediente '{unavailable_ingredient[0]}' está esgotado.")
-
-        # ETAPAS 2 E 3 ... (TODA A LÓGICA DE PREÇOS, PONTOS E INSERÇÃO NO BANCO)
-        # ...
-        sql_get_id = "SELECT GEN_ID(GEN_ORDERS_ID, 1) FROM RDB$DATABASE;"
-        cur.execute(sql_get_id)
-        new_order_id = cur.fetchone()[0]
+        # ETAPA 2: DISPONIBILIDADE PELO ÍNDICE EM MEMÓRIA
+        # O índice é deste processo: antes de usá-lo, traz as mudanças feitas pelos outros
+        menu_service.ensure_current()
+        unavailable_name = availability_service.find_unavailable_ingredient(product_ids, extra_ingredient_ids)
+        if unavailable_name:
+            raise ValueError(f"Desculpe, o ingrediente '{unavailable_name}' está esgotado.")
+
+        # ETAPA 3: ID DO PEDIDO E PREÇOS EM UMA ÚNICA CONSULTA
+        new_order_id, product_prices, extra_prices = _fetch_order_pricing(cur, product_ids, extra_ingredient_ids)
 
+        # ETAPA 4: PONTOS E TOTAL
         discount_amount = loyalty_service.redeem_points_for_discount(user_id, points_to_redeem, new_order_id,
                                                                      cur) if points_to_redeem > 0 else 0.0
 
-        product_prices = {}
         order_total = 0
-        if product_ids:
-            placeholders = ', '.join(['?' for _ in product_ids])
-            sql_prices = f"SELECT ID, PRICE FROM PRODUCTS WHERE ID IN ({placeholders});"
-            cur.execute(sql_prices, tuple(product_ids))
-            product_prices = {row[0]: row[1] for row in cur.fetchall()}
-            for item in items:
-                order_total += product_prices.get(item['product_id'], 0) * item.get('quantity', 1)
-
-        extra_prices = {}
-        if extra_ingredient_ids:
-            placeholders = ', '.join(['?' for _ in extra_ingredient_ids])
-            sql_extra_prices = f"SELECT ID, PRICE FROM INGREDIENTS WHERE ID IN ({placeholders});"
-            cur.execute(sql_extra_prices, tuple(extra_ingredient_ids))
-            extra_prices = {row[0]: row[1] for row in cur.fetchall()}
-            for item in items:
-                if 'extras' in item and item['extras']:
-                    for extra in item['extras']:
-                        order_total += extra_prices.get(extra['ingredient_id'], 0) * extra.get('quantity', 1)
+        for item in items:
+            order_total += product_prices[item['product_id']] * item.get('quantity', 1)
+            if 'extras' in item and item['extras']:
+                for extra in item['extras']:
+                    order_total += extra_prices[extra['ingredient_id']] * extra.get('quantity', 1)
 
         if discount_amount > order_total:
             raise ValueError("O valor do desconto não pode ser maior que o total do pedido.")
 
+        # ETAPA 5: PEDIDO, ITENS E EXTRAS GRAVADOS EM UM ÚNICO EXECUTE BLOCK
         confirmation_code = _generate_confirmation_code()
-        sql_order = """
-            INSERT INTO ORDERS (ID, USER_ID, ADDRESS_ID, STATUS, CONFIRMATION_CODE, NOTES, PAYMENT_METHOD, CHANGE_FOR_AMOUNT, CPF_ON_INVOICE, DISCOUNT_AMOUNT)
-            VALUES (?, ?, ?, 'pending', ?, ?, ?, ?, ?, ?);
-        """
-        cur.execute(sql_order, (
-        new_order_id, user_id, address_id, confirmation_code, notes, payment_method, change_for_amount, cpf_on_invoice,
-        discount_amount))
-
-        for item in items:
-            product_id = item.get('product_id')
-            quantity = item.get('quantity')
-            unit_price = product_prices[product_id]
-
-            sql_item = "INSERT INTO ORDER_ITEMS (ORDER_ID, PRODUCT_ID, QUANTITY, UNIT_PRICE) VALUES (?, ?, ?, ?) RETURNING ID;"
-            cur.execute(sql_item, (new_order_id, product_id, quantity, unit_price))
-            new_order_item_id = cur.fetchone()[0]
-
-            if 'extras' in item and item['extras']:
-                for extra in item['extras']:
-                    extra_id = extra['ingredient_id']
-                    extra_qty = extra.get('quantity', 1)
-                    extra_price = extra_prices[extra_id]
-                    sql_extra = "INSERT INTO ORDER_ITEM_EXTRAS (ORDER_ITEM_ID, INGREDIENT_ID, QUANTITY, UNIT_PRICE) VALUES (?, ?, ?, ?);"
-                    cur.execute(sql_extra, (new_order_item_id, extra_id, extra_qty, extra_price))
+        order_values = (new_order_id, user_id, address_id, confirmation_code, notes, payment_method,
+                        change_for_amount, cpf_on_invoice, discount_amount)
+        sql_write, params = _build_order_write_block(order_values, items, product_prices, extra_prices)
+        # O texto muda com o formato do carrinho: fora do cache de statements da conexão
+        cur.execute(sql_write, params, cache=False)
+
+        # ETAPA 6: BAIXA DO ESTOQUE DE TODO O CARRINHO EM UM ÚNICO MERGE
+        # Fica por último para segurar as travas dos ingredientes pelo menor tempo possível
+        depleted = ingredient_service.reserve_stock_for_items(cur, new_order_id, items)
+        if depleted:
+            menu_service.bump_version(conn)
 
         conn.commit()
         # --- FIM DA TRANSAÇÃO ---
+        if depleted:
+            depleted_changes = {ingredient_id: False for ingredient_id, _ in depleted}
+            after_commit(lambda: availability_service.publish(depleted_changes))
 
         new_order_data = {"order_id": new_order_id, "confirmation_code": confirmation_code, "status": "pending"}
         # ... (código de notificações e e-mails que já temos) ...
 
-        return new_order_data
+        return new_order_data, None
 
-    except (fdb.Error, ValueError) as e:
+    except ValueError as e:
         print(f"Erro ao criar pedido: {e}")
         if conn: conn.rollback()
         # Retornamos a mensagem de erro específica para a rota
         return None, str(e)
+    except fdb.Error as e:
+        print(f"Erro ao criar pedido: {e}")
+        if conn: conn.rollback()
+        # Erro transitório do banco: a rota responde 503 sem expor a mensagem do Firebird
+        raise OrderWriteError("Falha ao gravar o pedido.") from e
     finally:
         if conn: conn.close()
 
-def get_orders_by_user_id(user_id):
-    """Busca o histórico de pedidos de um usuário específico."""
+
+def _fetch_order_pricing(cur, product_ids, extra_ingredient_ids):
+    """
+    Em uma única ida ao banco: reserva o ID do pedido e busca os preços dos produtos
+    e dos extras. A disponibilidade já foi conferida pelo availability_service.
+    Retorna (new_order_id, product_prices, extra_prices).
+    """
+    if not product_ids:
+        raise ValueError("O pedido deve ter pelo menos um item.")
+
+    # Cada linha: (TIPO, ID, PRECO)
+    parts = ["SELECT 'O', GEN_ID(GEN_ORDERS_ID, 1), CAST(NULL AS NUMERIC(18, 2)) FROM RDB$DATABASE"]
+    product_placeholders, params = in_placeholders(product_ids)
+    parts.append(f"""
+        SELECT 'P', p.ID, p.PRICE
+        FROM PRODUCTS p
+        WHERE p.ID IN ({product_placeholders}) AND p.IS_ACTIVE = TRUE
+    """)
+    if extra_ingredient_ids:
+        extra_placeholders, extra_params = in_placeholders(extra_ingredient_ids)
+        parts.append(f"""
+            SELECT 'I', i.ID, i.PRICE
+            FROM INGREDIENTS i
+            WHERE i.ID IN ({extra_placeholders})
+        """)
+        params += extra_params
+
+    cur.execute(" UNION ALL ".join(parts) + ";", params)
+
+    new_order_id = None
+    product_prices = {}
+    extra_prices = {}
+    for kind, row_id, price in cur.fetchall():
+        kind = kind.strip()
+        if kind == 'O':
+            new_order_id = row_id
+        elif kind == 'P':
+            product_prices[row_id] = price
+        else:
+            extra_prices[row_id] = price
+
+    missing_products = product_ids - product_prices.keys()
+    if missing_products:
+        raise ValueError(f"Produto(s) não encontrado(s) ou inativo(s): {sorted(missing_products)}.")
+    missing_extras = extra_ingredient_ids - extra_prices.keys()
+    if missing_extras:
+        raise ValueError(f"Ingrediente(s) extra(s) não encontrado(s): {sorted(missing_extras)}.")
+
+    return new_order_id, product_prices, extra_prices
+
+
+def _build_order_write_block(order_values, items, product_prices, extra_prices):
+    """
+    Monta um EXECUTE BLOCK que insere o pedido, todos os itens e todos os extras
+    em uma única ida ao banco (o carrinho é limitado por ORDER_MAX_ITEMS/ORDER_MAX_EXTRAS_PER_ITEM).
+    (O executemany do fdb faria uma execução por linha.)
+    Retorna (sql, parametros).
+    """
+    declarations = [
+        "ORDER_ID TYPE OF COLUMN ORDERS.ID = ?",
+        "USER_ID TYPE OF COLUMN ORDERS.USER_ID = ?",
+        "ADDRESS_ID TYPE OF COLUMN ORDERS.ADDRESS_ID = ?",
+        "CONFIRMATION_CODE TYPE OF COLUMN ORDERS.CONFIRMATION_CODE = ?",
+        "NOTES TYPE OF COLUMN ORDERS.NOTES = ?",
+        "PAYMENT_METHOD TYPE OF COLUMN ORDERS.PAYMENT_METHOD = ?",
+        "CHANGE_FOR_AMOUNT TYPE OF COLUMN ORDERS.CHANGE_FOR_AMOUNT = ?",
+        "CPF_ON_INVOICE TYPE OF COLUMN ORDERS.CPF_ON_INVOICE = ?",
+        "DISCOUNT_AMOUNT TYPE OF COLUMN ORDERS.DISCOUNT_AMOUNT = ?",
+    ]
+    params = list(order_values)
+    body = ["""
+        INSERT INTO ORDERS (ID, USER_ID, ADDRESS_ID, STATUS, CONFIRMATION_CODE, NOTES, PAYMENT_METHOD, CHANGE_FOR_AMOUNT, CPF_ON_INVOICE, DISCOUNT_AMOUNT)
+        VALUES (:ORDER_ID, :USER_ID, :ADDRESS_ID, 'pending', :CONFIRMATION_CODE, :NOTES, :PAYMENT_METHOD, :CHANGE_FOR_AMOUNT, :CPF_ON_INVOICE, :DISCOUNT_AMOUNT);
+    """]
+
+    for i, item in enumerate(items):
+        product_id = item.get('product_id')
+        declarations += [
+            f"P{i} TYPE OF COLUMN ORDER_ITEMS.PRODUCT_ID = ?",
+            f"Q{i} TYPE OF COLUMN ORDER_ITEMS.QUANTITY = ?",
+            f"U{i} TYPE OF COLUMN ORDER_ITEMS.UNIT_PRICE = ?",
+        ]
+        params += [product_id, item.get('quantity', 1), product_prices[product_id]]
+        body.append(f"""
+        INSERT INTO ORDER_ITEMS (ORDER_ID, PRODUCT_ID, QUANTITY, UNIT_PRICE)
+        VALUES (:ORDER_ID, :P{i}, :Q{i}, :U{i}) RETURNING ID INTO :ITEM_ID;
+        """)
+
+        for j, extra in enumerate(item.get('extras') or []):
+            extra_id = extra['ingredient_id']
+            declarations += [
+                f"E{i}_{j} TYPE OF COLUMN ORDER_ITEM_EXTRAS.INGREDIENT_ID = ?",
+                f"EQ{i}_{j} TYPE OF COLUMN ORDER_ITEM_EXTRAS.QUANTITY = ?",
+                f"EU{i}_{j} TYPE OF COLUMN ORDER_ITEM_EXTRAS.UNIT_PRICE = ?",
+            ]
+            params += [extra_id, extra.get('quantity', 1), extra_prices[extra_id]]
+            body.append(f"""
+        INSERT INTO ORDER_ITEM_EXTRAS (ORDER_ITEM_ID, INGREDIENT_ID, QUANTITY, UNIT_PRICE)
+        VALUES (:ITEM_ID, :E{i}_{j}, :EQ{i}_{j}, :EU{i}_{j});
+            """)
+
+    sql = (
+        "EXECUTE BLOCK (" + ", ".join(declarations) + ")\n"
+        "AS\n"
+        "DECLARE VARIABLE ITEM_ID TYPE OF COLUMN ORDER_ITEMS.ID;\n"
+        "BEGIN" + "".join(body) + "END"
+    )
+    return sql, tuple(params)
+
+
+def _keyset_filters(alias, status=None, date_from=None, date_to=None, user_id=None, cursor=None):
+    """
+    Monta o WHERE das listagens de pedidos (filtros + paginação por chave).
+    A ordem é sempre (CREATED_AT DESC, ID DESC); o cursor traz o par da última linha vista.
+    Retorna (clausula_where, parametros).
+    """
+    conditions, params = [], []
+    if user_id is not None:
+        conditions.append(f"{alias}.USER_ID = ?")
+        params.append(user_id)
+    if status:
+        conditions.append(f"{alias}.STATUS = ?")
+        params.append(status)
+    if date_from:
+        conditions.append(f"{alias}.CREATED_AT >= ?")
+        params.append(date_from)
+    if date_to:
+        conditions.append(f"{alias}.CREATED_AT < ?")
+        params.append(date_to)
+    if cursor:
+        last_created_at, last_id = cursor
+        conditions.append(f"({alias}.CREATED_AT < ? OR ({alias}.CREATED_AT = ? AND {alias}.ID < ?))")
+        params.extend([last_created_at, last_created_at, last_id])
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return where, params
+
+
+def get_orders_by_user_id(user_id, limit=50, cursor=None, status=None):
+    """
+    Busca uma página do histórico de pedidos de um usuário, do mais novo para o mais antigo.
+    Retorna uma tupla: (pedidos, cursor_da_proxima_pagina ou None).
+    """
     conn = None
     try:
         conn = get_db_connection()
         cur = conn.cursor()
+        where, params = _keyset_filters('o', status=status, user_id=user_id, cursor=pagination.decode_cursor(cursor))
         # Trazemos também alguns detalhes do endereço para conveniência
-        sql = """
-            SELECT o.ID, o.STATUS, o.CONFIRMATION_CODE, o.CREATED_AT, a.STREET, a."NUMBER"
+        sql = f"""
+            SELECT FIRST ? o.ID, o.STATUS, o.CONFIRMATION_CODE, o.CREATED_AT, a.STREET, a."NUMBER"
             FROM ORDERS o
             JOIN ADDRESSES a ON o.ADDRESS_ID = a.ID
-            WHERE o.USER_ID = ?
-            ORDER BY o.CREATED_AT DESC;
+            {where}
+            ORDER BY o.CREATED_AT DESC, o.ID DESC;
         """
-        cur.execute(sql, (user_id,))
+        cur.execute(sql, [limit + 1] + params)
+        rows, has_more = pagination.fetch_page(cur, limit)
         orders = []
-        for row in cur.fetchall():
+        for row in rows:
             orders.append({
                 "order_id": row[0], "status": row[1], "confirmation_code": row[2],
                 "created_at": row[3].strftime('%Y-%m-%d %H:%M:%S'),
                 "address": f"{row[4]}, {row[5]}"
             })
-        return orders
+        next_cursor = pagination.encode_cursor(rows[-1][3], rows[-1][0]) if has_more else None
+        return orders, next_cursor
     except fdb.Error as e:
         print(f"Erro ao buscar pedidos do usuário: {e}")
-        return []
+        return [], None
     finally:
         if conn: conn.close()
 
-def get_all_orders():
-    """Busca todos os pedidos para a visão do administrador."""
+def get_all_orders(limit=50, cursor=None, status=None, date_from=None, date_to=None, customer_id=None):
+    """
+    Busca uma página de pedidos para a visão do administrador, com filtros opcionais
+    de status, período [date_from, date_to) e cliente.
+    Retorna uma tupla: (pedidos, cursor_da_proxima_pagina ou None).
+    """
     conn = None
     try:
         conn = get_db_connection()
         cur = conn.cursor()
+        where, params = _keyset_filters('o', status=status, date_from=date_from, date_to=date_to,
+                                        user_id=customer_id, cursor=pagination.decode_cursor(cursor))
         # Usamos JOIN para trazer o nome do cliente, enriquecendo o resultado
-        sql = """
-            SELECT o.ID, o.STATUS, o.CONFIRMATION_CODE, o.CREATED_AT, u.FULL_NAME
+        sql = f"""
+            SELECT FIRST ? o.ID, o.STATUS, o.CONFIRMATION_CODE, o.CREATED_AT, u.FULL_NAME
             FROM ORDERS o
             JOIN USERS u ON o.USER_ID = u.ID
-            ORDER BY o.CREATED_AT DESC;
+            {where}
+            ORDER BY o.CREATED_AT DESC, o.ID DESC;
         """
-        cur.execute(sql)
+        cur.execute(sql, [limit + 1] + params)
+        rows, has_more = pagination.fetch_page(cur, limit)
         orders = []
-        for row in cur.fetchall():
+        for row in rows:
             orders.append({
                 "order_id": row[0], "status": row[1], "confirmation_code": row[2],
                 "created_at": row[3].strftime('%Y-%m-%d %H:%M:%S'),
                 "customer_name": row[4]
             })
-        return orders
+        next_cursor = pagination.encode_cursor(rows[-1][3], rows[-1][0]) if has_more else None
+        return orders, next_cursor
     except fdb.Error as e:
         print(f"Erro ao buscar todos os pedidos: {e}")
-        return []
+        return [], None
     finally:
         if conn: conn.close()
 
 
 def update_order_status(order_id, new_status):
-    """Atualiza o status de um pedido e adiciona pontos de fidelidade se concluído."""
+    """
+    Atualiza o status de um pedido e adiciona pontos de fidelidade se concluído.
+    Notificação, e-mail e Socket.IO saem pelo outbox, depois do commit.
+    """
     allowed_statuses = ['pending', 'preparing', 'on_the_way', 'completed', 'cancelled']
     if new_status not in allowed_statuses:
         return False
@@ -207,42 +341,38 @@ def update_order_status(order_id, new_status):
         cur = conn.cursor()
 
         # --- Início da Transação ---
-        sql_update = "UPDATE ORDERS SET STATUS = ? WHERE ID = ?;"
+        sql_update = "UPDATE ORDERS SET STATUS = ? WHERE ID = ? RETURNING USER_ID, OLD.STATUS;"
         cur.execute(sql_update, (new_status, order_id))
+        result = cur.fetchone()
+        if not result:
+            return False  # Pedido não encontrado
+        user_id, old_status = result
 
         if new_status == 'completed':
-            sql_get_user = "SELECT USER_ID FROM ORDERS WHERE ID = ?;"
-            cur.execute(sql_get_user, (order_id,))
-            result = cur.fetchone()
-            if result:
-                user_id = result[0]
-                loyalty_service.add_points_for_order(user_id, order_id, cur)
+            loyalty_service.add_points_for_order(user_id, order_id, cur)
+
+        # Cancelado antes do preparo: os ingredientes reservados voltam ao estoque.
+        # Ao sair de 'pending' para o preparo, a reserva vira consumo e não é mais devolvida.
+        replenished = []
+        if old_status == 'pending' and new_status == 'cancelled':
+            replenished = ingredient_service.release_stock_for_order(cur, order_id)
+            if replenished:
+                menu_service.bump_version(conn)
+        elif old_status == 'pending' and new_status != 'pending':
+            ingredient_service.consume_stock_reservation(cur, order_id)
+
+        outbox_service.enqueue_event(
+            outbox_service.ORDER_STATUS_CHANGED,
+            {"order_id": order_id, "user_id": user_id, "new_status": new_status},
+            cur
+        )
 
         conn.commit()
         # --- Fim da Transação ---
-
-        # Notificação para o cliente (fora da transação)
-        # (código da notificação que já implementamos)
-        sql_get_user = "SELECT USER_ID FROM ORDERS WHERE ID = ?;"
-        cur.execute(sql_get_user, (order_id,))
-        result = cur.fetchone()
-        if result:
-            user_id = result[0]
-            notification_message = f"O status do seu pedido #{order_id} foi atualizado para: {new_status}."
-            notification_link = f"/my-orders/{order_id}"
-            notification_service.create_notification(user_id, notification_message, notification_link)
-            customer = user_service.get_user_by_id(user_id)
-            if customer:
-                email_service.send_email(
-                    to=customer['email'],
-                    subject=f"Atualização sobre seu pedido #{order_id}",
-                    template='order_status_update',
-                    user=customer,
-                    order={"order_id": order_id},
-                    new_status=new_status
-                )
-
-        return cur.rowcount > 0
+        if replenished:
+            replenished_changes = {ingredient_id: True for ingredient_id in replenished}
+            after_commit(lambda: availability_service.publish(replenished_changes))
+        return True
     except fdb.Error as e:
         print(f"Erro ao atualizar status do pedido: {e}")
         if conn: conn.rollback()
@@ -250,6 +380,21 @@ def update_order_status(order_id, new_status):
     finally:
         if conn: conn.close()
 
+def get_order_owner(order_id):
+    """ID do cliente dono do pedido, ou None se o pedido não existir."""
+    conn = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        cur.execute("SELECT USER_ID FROM ORDERS WHERE ID = ?;", (order_id,))
+        row = cur.fetchone()
+        return row[0] if row else None
+    except fdb.Error as e:
+        print(f"Erro ao buscar o dono do pedido: {e}")
+        return None
+    finally:
+        if conn: conn.close()
+
 def get_order_details(order_id, user_id, user_role):
     """
     Busca os detalhes completos de um pedido, incluindo seus itens.
@@ -344,29 +489,22 @@ def cancel_order_by_customer(order_id, user_id):
         if status != 'pending':
             return (False, f"Não é possível cancelar um pedido que já está com o status '{status}'.")
 
-        # 4. Se todas as verificações passarem, atualiza o status
+        # 4. Se todas as verificações passarem, atualiza o status.
+        # A notificação e o e-mail de cancelamento saem pelo outbox, na mesma transação.
         sql_update = "UPDATE ORDERS SET STATUS = 'cancelled' WHERE ID = ?;"
         cur.execute(sql_update, (order_id,))
+        replenished = ingredient_service.release_stock_for_order(cur, order_id)
+        if replenished:
+            menu_service.bump_version(conn)
+        outbox_service.enqueue_event(
+            outbox_service.ORDER_STATUS_CHANGED,
+            {"order_id": order_id, "user_id": user_id, "new_status": 'cancelled', "cancelled_by_customer": True},
+            cur
+        )
         conn.commit()
-
-        # 5. (Opcional, mas recomendado) Envia notificação e e-mail de cancelamento
-        try:
-            message = f"Seu pedido #{order_id} foi cancelado com sucesso."
-            link = f"/my-orders/{order_id}"
-            notification_service.create_notification(user_id, message, link)
-
-            customer = user_service.get_user_by_id(user_id)
-            if customer:
-                 email_service.send_email(
-                    to=customer['email'],
-                    subject=f"Seu pedido #{order_id} foi cancelado",
-                    template='order_status_update', # Reutilizamos o template
-                    user=customer,
-                    order={"order_id": order_id},
-                    new_status='cancelled'
-                )
-        except Exception as e:
-            print(f"AVISO: Falha ao enviar notificação de cancelamento para o pedido {order_id}. Erro: {e}")
+        if replenished:
+            replenished_changes = {ingredient_id: True for ingredient_id in replenished}
+            after_commit(lambda: availability_service.publish(replenished_changes))
 
         return (True, "Pedido cancelado com sucesso.")
 
@@ -0,0 +1,260 @@
+# src/services/outbox_service.py
+
+import atexit
+import json
+import threading
+import fdb
+from datetime import datetime, timedelta
+from .. import socketio
+from ..config import Config
+from ..database import get_db_connection, in_placeholders
+from . import notification_service, user_service, email_service
+
+# Tipos de evento gravados pelos services
+ORDER_STATUS_CHANGED = 'order_status_changed'
+
+# Canais entregues para cada tipo de evento, nesta ordem. Os já entregues ficam em
+# CHANNELS_DONE, então uma nova tentativa não repete notificação ou e-mail.
+_EVENT_CHANNELS = {
+    ORDER_STATUS_CHANGED: ('notification', 'email', 'socket'),
+}
+
+# Espera máxima entre tentativas, por mais que o backoff dobre
+_MAX_RETRY_DELAY_SECONDS = 3600
+
+_dispatcher_lock = threading.Lock()
+_dispatcher_started = False
+_stop_event = threading.Event()
+
+
+def enqueue_event(event_type, payload, cur):
+    """
+    Grava um evento no outbox usando o cursor (e a transação) de quem chama:
+    ele só existe se a mudança no pedido for confirmada.
+    """
+    if event_type not in _EVENT_CHANNELS:
+        raise ValueError(f"Tipo de evento desconhecido: {event_type}")
+    sql = "INSERT INTO OUTBOX_EVENTS (EVENT_TYPE, PAYLOAD) VALUES (?, ?);"
+    cur.execute(sql, (event_type, json.dumps(payload)))
+
+
+# --- Entrega por canal ---
+
+def _order_status_texts(payload):
+    """Mensagem da notificação e assunto do e-mail de uma mudança de status."""
+    order_id = payload['order_id']
+    if payload.get('cancelled_by_customer'):
+        return (f"Seu pedido #{order_id} foi cancelado com sucesso.",
+                f"Seu pedido #{order_id} foi cancelado")
+    return (f"O status do seu pedido #{order_id} foi atualizado para: {payload['new_status']}.",
+            f"Atualização sobre seu pedido #{order_id}")
+
+
+def _deliver_notification(payload, customers, smtp):
+    message, _ = _order_status_texts(payload)
+    link = f"/my-orders/{payload['order_id']}"
+    if not notification_service.create_notification(payload['user_id'], message, link):
+        raise RuntimeError("Falha ao gravar a notificação.")
+
+
+def order_room(order_id):
+    """Sala do Socket.IO de um pedido (o cliente entra pelo evento 'join_order')."""
+    return f"order_{order_id}"
+
+
+def _deliver_email(payload, customers, smtp):
+    customer = customers.get(payload['user_id'])
+    if not customer:
+        return  # Usuário inativo ou removido: não há para quem enviar
+    _, subject = _order_status_texts(payload)
+    # Envio síncrono pela conexão do lote: o canal só fica entregue se o SMTP aceitou a mensagem
+    smtp.send(
+        to=customer['email'],
+        subject=subject,
+        template='order_status_update',
+        user=customer,
+        order={"order_id": payload['order_id']},
+        new_status=payload['new_status']
+    )
+
+
+def _deliver_socket(payload, customers, smtp):
+    socketio.emit(
+        'order_status_updated',
+        {"order_id": payload['order_id'], "status": payload['new_status']},
+        to=order_room(payload['order_id'])
+    )
+
+
+_CHANNEL_HANDLERS = {
+    'notification': _deliver_notification,
+    'email': _deliver_email,
+    'socket': _deliver_socket,
+}
+
+
+# --- Despachante ---
+
+def _claim_batch(batch_size):
+    """
+    Marca como 'processing' o próximo lote de eventos pendentes e vencidos.
+    Eventos presos em 'processing' (processo reiniciado no meio) voltam para a fila.
+    """
+    conn = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        now = datetime.now()
+
+        sql_recover = """
+            UPDATE OUTBOX_EVENTS SET STATUS = 'pending', LOCKED_AT = NULL
+            WHERE STATUS = 'processing' AND LOCKED_AT < ?;
+        """
+        cur.execute(sql_recover, (now - timedelta(seconds=Config.OUTBOX_LOCK_TIMEOUT),))
+
+        sql_select = """
+            SELECT FIRST ? ID, EVENT_TYPE, PAYLOAD, CHANNELS_DONE, ATTEMPTS
+            FROM OUTBOX_EVENTS
+            WHERE STATUS = 'pending' AND NEXT_ATTEMPT_AT <= ?
+            ORDER BY NEXT_ATTEMPT_AT, ID;
+        """
+        cur.execute(sql_select, (batch_size, now))
+        rows = cur.fetchall()
+        if not rows:
+            conn.commit()
+            return []
+
+        placeholders, params = in_placeholders([row[0] for row in rows])
+        sql_claim = f"UPDATE OUTBOX_EVENTS SET STATUS = 'processing', LOCKED_AT = ? WHERE STATUS = 'pending' AND ID IN ({placeholders});"
+        cur.execute(sql_claim, (now,) + params)
+        if cur.rowcount != len(rows):
+            # Outro processo pegou parte do lote; tenta de novo no próximo ciclo
+            conn.rollback()
+            return []
+        conn.commit()
+
+        return [{
+            "id": row[0],
+            "event_type": row[1],
+            "payload": json.loads(row[2]),
+            "channels_done": set(filter(None, row[3].split(','))),
+            "attempts": row[4],
+        } for row in rows]
+    except fdb.Error as e:
+        print(f"Erro ao buscar eventos do outbox: {e}")
+        if conn: conn.rollback()
+        return []
+    finally:
+        if conn: conn.close()
+
+
+def _mark_done(event_ids):
+    if not event_ids:
+        return
+    conn = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        placeholders, params = in_placeholders(event_ids)
+        sql = f"UPDATE OUTBOX_EVENTS SET STATUS = 'done', LOCKED_AT = NULL, PROCESSED_AT = ? WHERE ID IN ({placeholders});"
+        cur.execute(sql, (datetime.now(),) + params)
+        conn.commit()
+    except fdb.Error as e:
+        # Os eventos voltam para a fila após OUTBOX_LOCK_TIMEOUT; os canais já entregues
+        # não ficaram registrados, então podem ser repetidos
+        print(f"Erro ao concluir eventos do outbox: {e}")
+        if conn: conn.rollback()
+    finally:
+        if conn: conn.close()
+
+
+def _schedule_retry(event, error):
+    """Registra a falha: agenda nova tentativa com backoff ou desiste após OUTBOX_MAX_ATTEMPTS."""
+    attempts = event['attempts'] + 1
+    status = 'failed' if attempts >= Config.OUTBOX_MAX_ATTEMPTS else 'pending'
+    delay = min(Config.OUTBOX_RETRY_BASE_SECONDS * 2 ** (attempts - 1), _MAX_RETRY_DELAY_SECONDS)
+
+    conn = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        sql = """
+            UPDATE OUTBOX_EVENTS
+            SET STATUS = ?, ATTEMPTS = ?, NEXT_ATTEMPT_AT = ?, CHANNELS_DONE = ?, LOCKED_AT = NULL, LAST_ERROR = ?
+            WHERE ID = ?;
+        """
+        cur.execute(sql, (status, attempts, datetime.now() + timedelta(seconds=delay),
+                          ','.join(sorted(event['channels_done'])), str(error)[:1000], event['id']))
+        conn.commit()
+    except fdb.Error as e:
+        print(f"Erro ao reagendar evento {event['id']} do outbox: {e}")
+        if conn: conn.rollback()
+    finally:
+        if conn: conn.close()
+
+    if status == 'failed':
+        print(f"ERRO: evento {event['id']} do outbox desistido após {attempts} tentativas: {error}")
+
+
+def _dispatch_batch(events):
+    """
+    Entrega um lote de eventos. Os clientes do lote são buscados em uma única consulta
+    e os e-mails do lote saem pela mesma conexão SMTP (aberta só se houver e-mail).
+    """
+    customers = user_service.get_users_by_ids(event['payload'].get('user_id') for event in events)
+    done_ids = []
+    with email_service.SmtpSession() as smtp:
+        for event in events:
+            try:
+                channels = _EVENT_CHANNELS.get(event['event_type'])
+                if channels is None:
+                    raise ValueError(f"Tipo de evento desconhecido: {event['event_type']}")
+                for channel in channels:
+                    if channel in event['channels_done']:
+                        continue
+                    _CHANNEL_HANDLERS[channel](event['payload'], customers, smtp)
+                    event['channels_done'].add(channel)
+                done_ids.append(event['id'])
+            except Exception as e:
+                print(f"AVISO: falha ao entregar o evento {event['id']} do outbox: {e}")
+                _schedule_retry(event, e)
+    _mark_done(done_ids)
+
+
+def dispatch_pending(batch_size=None):
+    """Processa um lote de eventos pendentes. Retorna quantos eventos foram pegos."""
+    events = _claim_batch(batch_size or Config.OUTBOX_BATCH_SIZE)
+    if events:
+        _dispatch_batch(events)
+    return len(events)
+
+
+def _run_dispatcher(app):
+    with app.app_context():
+        while not _stop_event.is_set():
+            try:
+                claimed = dispatch_pending()
+            except Exception as e:
+                print(f"Erro no despachante do outbox: {e}")
+                claimed = 0
+            # Lote cheio: provavelmente há mais na fila, segue sem esperar
+            if claimed < Config.OUTBOX_BATCH_SIZE:
+                _stop_event.wait(Config.OUTBOX_POLL_INTERVAL)
+
+
+def start_dispatcher(app):
+    """Inicia o despachante em segundo plano. Só a primeira chamada do processo tem efeito."""
+    global _dispatcher_started
+    with _dispatcher_lock:
+        if _dispatcher_started:
+            return False
+        _dispatcher_started = True
+    _stop_event.clear()
+    socketio.start_background_task(_run_dispatcher, app)
+    atexit.register(stop_dispatcher)
+    return True
+
+
+def stop_dispatcher():
+    """Pede ao despachante que termine após o lote atual."""
+    _stop_event.set()
@@ -1,7 +1,8 @@
 # src/services/product_service.py
 
 import fdb
-from ..database import get_db_connection
+from ..database import after_commit, get_db_connection
+from . import menu_service, search_service, availability_service
 
 
 def create_product(product_data):
@@ -17,7 +18,9 @@ def create_product(product_data):
         sql = "INSERT INTO PRODUCTS (NAME, DESCRIPTION, PRICE) VALUES (?, ?, ?) RETURNING ID;"
         cur.execute(sql, (name, description, price))
         new_product_id = cur.fetchone()[0]
+        menu_service.bump_version(conn)
         conn.commit()
+        after_commit(lambda: search_service.refresh_product(new_product_id))
         return {"id": new_product_id, "name": name, "description": description, "price": price}
     except fdb.Error as e:
         print(f"Erro ao criar produto: {e}")
@@ -37,6 +40,9 @@ def get_all_products():
         cur.execute(sql)
         products = [{"id": row[0], "name": row[1], "description": row[2], "price": str(row[3])} for row in
                     cur.fetchall()]
+        availability = availability_service.get_products_availability(product["id"] for product in products)
+        for product in products:
+            product["is_available"] = availability[product["id"]]
         return products
     except fdb.Error as e:
         print(f"Erro ao buscar produtos: {e}")
@@ -79,8 +85,12 @@ def update_product(product_id, update_data):
         cur = conn.cursor()
         sql = f"UPDATE PRODUCTS SET {', '.join(set_parts)} WHERE ID = ? AND IS_ACTIVE = TRUE;"
         cur.execute(sql, tuple(values))
+        updated = cur.rowcount > 0
+        menu_service.bump_version(conn)
         conn.commit()
-        return cur.rowcount > 0
+        if updated:
+            after_commit(lambda: search_service.refresh_product(product_id))
+        return updated
     except fdb.Error as e:
         print(f"Erro ao atualizar produto: {e}")
         if conn: conn.rollback()
@@ -97,8 +107,12 @@ def deactivate_product(product_id):
         cur = conn.cursor()
         sql = "UPDATE PRODUCTS SET IS_ACTIVE = FALSE WHERE ID = ?;"
         cur.execute(sql, (product_id,))
+        updated = cur.rowcount > 0
+        menu_service.bump_version(conn)
         conn.commit()
-        return cur.rowcount > 0
+        if updated:
+            after_commit(lambda: search_service.refresh_product(product_id))
+        return updated
     except fdb.Error as e:
         print(f"Erro ao inativar produto: {e}")
         if conn: conn.rollback()
@@ -114,6 +128,7 @@ def add_product_to_section(product_id, section_id):
         cur = conn.cursor()
         sql = "INSERT INTO PRODUCT_SECTION_ITEMS (PRODUCT_ID, SECTION_ID) VALUES (?, ?);"
         cur.execute(sql, (product_id, section_id))
+        menu_service.bump_version(conn)
         conn.commit()
         return True
     except fdb.IntegrityError:
@@ -134,6 +149,7 @@ def remove_product_from_section(product_id, section_id):
         cur = conn.cursor()
         sql = "DELETE FROM PRODUCT_SECTION_ITEMS WHERE PRODUCT_ID = ? AND SECTION_ID = ?;"
         cur.execute(sql, (product_id, section_id))
+        menu_service.bump_version(conn)
         conn.commit()
         return cur.rowcount > 0
     except fdb.Error as e:
@@ -157,6 +173,7 @@ def create_section(section_data, user_id):
         sql = "INSERT INTO PRODUCT_SECTIONS (NAME, DISPLAY_ORDER, CREATED_BY_USER_ID) VALUES (?, ?, ?) RETURNING ID;"
         cur.execute(sql, (name, display_order, user_id))
         new_section_id = cur.fetchone()[0]
+        menu_service.bump_version(conn)
         conn.commit()
         return {"id": new_section_id, "name": name, "display_order": display_order}
     except fdb.Error as e:
@@ -199,6 +216,7 @@ def update_section(section_id, update_data):
         cur = conn.cursor()
         sql = f"UPDATE PRODUCT_SECTIONS SET {', '.join(set_parts)} WHERE ID = ?;"
         cur.execute(sql, tuple(values))
+        menu_service.bump_version(conn)
         conn.commit()
         return cur.rowcount > 0
     except fdb.Error as e:
@@ -217,6 +235,7 @@ def delete_section(section_id):
         cur = conn.cursor()
         sql = "DELETE FROM PRODUCT_SECTIONS WHERE ID = ?;"
         cur.execute(sql, (section_id,))
+        menu_service.bump_version(conn)
         conn.commit()
         return cur.rowcount > 0
     except fdb.Error as e:
@@ -227,48 +246,60 @@ def delete_section(section_id):
         if conn: conn.close()
 
 
+def _fetch_section_tree(cur, section_id=None):
+    """
+    Seções com seus produtos ativos (via PRODUCT_SECTION_ITEMS) em uma única consulta,
+    agrupadas em uma passada. Seções sem produtos vêm com a lista vazia.
+    """
+    sql = """
+        SELECT s.ID, s.NAME, s.DISPLAY_ORDER, p.ID, p.NAME, p.DESCRIPTION, p.PRICE
+        FROM PRODUCT_SECTIONS s
+        LEFT JOIN PRODUCT_SECTION_ITEMS psi ON psi.SECTION_ID = s.ID
+        LEFT JOIN PRODUCTS p ON p.ID = psi.PRODUCT_ID AND p.IS_ACTIVE = TRUE
+    """
+    params = ()
+    if section_id is not None:
+        sql += " WHERE s.ID = ?"
+        params = (section_id,)
+    sql += " ORDER BY s.DISPLAY_ORDER, s.NAME, s.ID, p.NAME;"
+    cur.execute(sql, params)
+
+    sections = []
+    current = None
+    for row in cur.fetchall():
+        # As linhas chegam ordenadas por seção: uma nova seção começa quando o ID muda
+        if current is None or current["id"] != row[0]:
+            current = {"id": row[0], "name": row[1], "display_order": row[2], "products": []}
+            sections.append(current)
+        if row[3] is not None:
+            current["products"].append({"id": row[3], "name": row[4], "description": row[5], "price": str(row[6])})
+    return sections
+
+
+def get_section_tree():
+    """Busca todas as seções, na ordem de exibição, cada uma com seus produtos ativos."""
+    conn = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        return _fetch_section_tree(cur)
+    except fdb.Error as e:
+        print(f"Erro ao buscar árvore de seções: {e}")
+        return []
+    finally:
+        if conn: conn.close()
+
+
 def get_section_by_id(section_id):
     """Busca uma única seção pelo seu ID, incluindo seus produtos."""
     conn = None
     try:
         conn = get_db_connection()
         cur = conn.cursor()
-
-        # Busca os dados da seção
-        sql_section = "SELECT ID, NAME, DISPLAY_ORDER FROM SECTIONS WHERE ID = ? AND IS_ACTIVE = TRUE;"
-        cur.execute(sql_section, (section_id,))
-        section_data = cur.fetchone()
-
-        if not section_data:
-            return None  # Retorna None se a seção não for encontrada
-
-        section = {
-            "id": section_data[0],
-            "name": section_data[1],
-            "display_order": section_data[2],
-            "products": []
-        }
-
-        # Busca os produtos associados a essa seção
-        sql_products = """
-            SELECT ID, NAME, DESCRIPTION, PRICE, IMAGE_URL
-            FROM PRODUCTS 
-            WHERE SECTION_ID = ? AND IS_ACTIVE = TRUE 
-            ORDER BY NAME;
-        """
-        cur.execute(sql_products, (section_id,))
-        for row in cur.fetchall():
-            section["products"].append({
-                "id": row[0],
-                "name": row[1],
-                "description": row[2],
-                "price": row[3],
-                "image_url": row[4]
-            })
-
-        return section
+        sections = _fetch_section_tree(cur, section_id)
+        return sections[0] if sections else None  # None se a seção não for encontrada
     except fdb.Error as e:
         print(f"Erro ao buscar seção por ID: {e}")
         return None
     finally:
-        if conn: conn.close()
\ No newline at end of file
+        if conn: conn.close()
@@ -0,0 +1,257 @@
+# src/services/search_service.py
+
+import bisect
+import heapq
+import re
+import threading
+import unicodedata
+import fdb
+from ..database import get_db_connection
+
+# Índice invertido em memória dos produtos ativos. Montado inteiro na primeira busca
+# e atualizado produto a produto pelas escritas em product_service/ingredient_service.
+_lock = threading.RLock()
+_loaded = False
+_docs = {}          # {product_id: {"id", "name", "description", "price"}}
+_doc_tokens = {}    # {product_id: set(tokens)}  -> para remover o produto do índice
+_postings = {}      # {token: {product_id: peso do campo}}
+_trigrams = {}      # {trigrama: set(tokens)}    -> candidatos para a busca aproximada
+_vocabulary = []    # tokens ordenados, para a busca por prefixo
+_vocabulary_dirty = False
+
+# Peso de cada campo no ranking
+_FIELD_WEIGHTS = {"name": 3.0, "ingredient": 2.0, "description": 1.0}
+# Peso do tipo de casamento do termo
+_EXACT, _PREFIX, _FUZZY = 1.0, 0.8, 0.6
+# Similaridade mínima (coeficiente de Dice sobre trigramas) para aceitar um erro de digitação
+_MIN_SIMILARITY = 0.45
+
+_STOPWORDS = {"a", "o", "as", "os", "e", "de", "da", "do", "das", "dos", "com", "em", "no", "na", "um", "uma"}
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def fold(text):
+    """Minúsculas, sem acentos (pão -> pao, açaí -> acai) e só letras/números."""
+    if not text:
+        return ""
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    stripped = ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return _NON_ALNUM.sub(' ', stripped).strip()
+
+
+def tokenize(text):
+    return [token for token in fold(text).split() if token not in _STOPWORDS]
+
+
+def _token_trigrams(token):
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+# --- Manutenção do índice (chamar com _lock) ---
+
+def _add_token(token, product_id, weight):
+    postings = _postings.get(token)
+    if postings is None:
+        global _vocabulary_dirty
+        postings = _postings[token] = {}
+        for trigram in _token_trigrams(token):
+            _trigrams.setdefault(trigram, set()).add(token)
+        _vocabulary_dirty = True
+    if weight > postings.get(product_id, 0):
+        postings[product_id] = weight
+
+
+def _remove_doc(product_id):
+    global _vocabulary_dirty
+    _docs.pop(product_id, None)
+    for token in _doc_tokens.pop(product_id, ()):
+        postings = _postings.get(token)
+        if postings is None:
+            continue
+        postings.pop(product_id, None)
+        if not postings:
+            del _postings[token]
+            for trigram in _token_trigrams(token):
+                tokens = _trigrams.get(trigram)
+                if tokens is not None:
+                    tokens.discard(token)
+                    if not tokens:
+                        del _trigrams[trigram]
+            _vocabulary_dirty = True
+
+
+def _add_doc(product, ingredient_names):
+    product_id = product["id"]
+    _remove_doc(product_id)
+    _docs[product_id] = product
+    tokens = set()
+    fields = [("name", product["name"]), ("description", product["description"])]
+    fields += [("ingredient", name) for name in ingredient_names]
+    for field, text in fields:
+        for token in tokenize(text):
+            _add_token(token, product_id, _FIELD_WEIGHTS[field])
+            tokens.add(token)
+    _doc_tokens[product_id] = tokens
+
+
+def _fetch_products(cur, product_id=None):
+    """Produtos ativos com os nomes dos ingredientes, em uma consulta: {id: (produto, [ingredientes])}."""
+    sql = """
+        SELECT p.ID, p.NAME, p.DESCRIPTION, p.PRICE, i.NAME
+        FROM PRODUCTS p
+        LEFT JOIN PRODUCT_INGREDIENTS pi ON pi.PRODUCT_ID = p.ID
+        LEFT JOIN INGREDIENTS i ON i.ID = pi.INGREDIENT_ID
+        WHERE p.IS_ACTIVE = TRUE
+    """
+    params = ()
+    if product_id is not None:
+        sql += " AND p.ID = ?"
+        params = (product_id,)
+    cur.execute(sql + ";", params)
+
+    products = {}
+    for row in cur.fetchall():
+        entry = products.get(row[0])
+        if entry is None:
+            entry = products[row[0]] = (
+                {"id": row[0], "name": row[1], "description": row[2], "price": str(row[3])}, []
+            )
+        if row[4]:
+            entry[1].append(row[4])
+    return products
+
+
+def rebuild_index():
+    """Monta o índice inteiro a partir do banco."""
+    global _loaded
+    conn = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        products = _fetch_products(cur)
+        with _lock:
+            for product_id in list(_docs):
+                _remove_doc(product_id)
+            for product, ingredient_names in products.values():
+                _add_doc(product, ingredient_names)
+            _loaded = True
+        print(f"Índice de busca montado com {len(products)} produto(s).")
+        return True
+    except fdb.Error as e:
+        print(f"Erro ao montar o índice de busca: {e}")
+        return False
+    finally:
+        if conn: conn.close()
+
+
+def invalidate_index():
+    """Descarta o índice (ex.: após uma importação do cardápio); a próxima busca o remonta do banco."""
+    global _loaded
+    with _lock:
+        _loaded = False
+
+
+def refresh_product(product_id):
+    """
+    Reindexa um produto após uma escrita (ou o remove, se foi inativado).
+    Deve ser agendado com database.after_commit por quem alterou o produto.
+    """
+    if not _loaded:
+        return  # O índice ainda não foi montado; a primeira busca já lerá o estado atual
+    conn = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        products = _fetch_products(cur, product_id)
+        with _lock:
+            if product_id in products:
+                _add_doc(*products[product_id])
+            else:
+                _remove_doc(product_id)
+    except fdb.Error as e:
+        print(f"Erro ao reindexar o produto {product_id}: {e}")
+    finally:
+        if conn: conn.close()
+
+
+def refresh_products_with_ingredient(ingredient_id):
+    """Reindexa os produtos que usam um ingrediente (ex.: o ingrediente foi renomeado)."""
+    if not _loaded:
+        return
+    conn = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        cur.execute("SELECT PRODUCT_ID FROM PRODUCT_INGREDIENTS WHERE INGREDIENT_ID = ?;", (ingredient_id,))
+        product_ids = [row[0] for row in cur.fetchall()]
+    except fdb.Error as e:
+        print(f"Erro ao buscar produtos do ingrediente {ingredient_id}: {e}")
+        return
+    finally:
+        if conn: conn.close()
+    for product_id in product_ids:
+        refresh_product(product_id)
+
+
+# --- Consulta ---
+
+def _matching_tokens(term):
+    """Tokens do vocabulário que casam com o termo: {token: peso do casamento}."""
+    global _vocabulary, _vocabulary_dirty
+    matches = {}
+    if term in _postings:
+        matches[term] = _EXACT
+
+    if len(term) >= 2:
+        if _vocabulary_dirty:
+            _vocabulary = sorted(_postings)
+            _vocabulary_dirty = False
+        index = bisect.bisect_left(_vocabulary, term)
+        while index < len(_vocabulary) and _vocabulary[index].startswith(term):
+            matches.setdefault(_vocabulary[index], _PREFIX)
+            index += 1
+
+    if len(term) >= 3:
+        term_trigrams = _token_trigrams(term)
+        shared = {}
+        for trigram in term_trigrams:
+            for token in _trigrams.get(trigram, ()):
+                shared[token] = shared.get(token, 0) + 1
+        for token, count in shared.items():
+            if token in matches:
+                continue
+            # Um token de n letras tem n + 1 trigramas (com o preenchimento das bordas)
+            similarity = 2.0 * count / (len(term) + len(token) + 2)
+            if similarity >= _MIN_SIMILARITY:
+                matches[token] = _FUZZY * similarity
+    return matches
+
+
+def search_products(query, limit=20):
+    """
+    Busca produtos por nome, descrição e ingredientes, sem acentos e tolerando erros
+    de digitação. Produtos que casam com mais termos vêm primeiro; depois, pela pontuação.
+    """
+    terms = tokenize(query)
+    if not terms:
+        return []
+    if not _loaded:
+        rebuild_index()
+
+    with _lock:
+        scores = {}
+        matched_terms = {}
+        for term in terms:
+            term_scores = {}
+            for token, match_weight in _matching_tokens(term).items():
+                for product_id, field_weight in _postings[token].items():
+                    score = match_weight * field_weight
+                    if score > term_scores.get(product_id, 0):
+                        term_scores[product_id] = score
+            for product_id, score in term_scores.items():
+                scores[product_id] = scores.get(product_id, 0) + score
+                matched_terms[product_id] = matched_terms.get(product_id, 0) + 1
+
+        ranked = heapq.nsmallest(limit, scores, key=lambda pid: (-matched_terms[pid], -scores[pid], _docs[pid]["name"]))
+        return [dict(_docs[pid], score=round(scores[pid], 3)) for pid in ranked]
@@ -0,0 +1,171 @@
+# src/services/user_cache.py
+
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import fdb
+from ..config import Config
+from ..database import after_commit, get_db_connection, get_pool
+
+# Cache LRU com TTL dos usuários ativos por ID: {user_id: (expira_em, usuario)}.
+# Só guarda usuários encontrados; quem não existe (ou foi inativado) vai sempre ao banco.
+_lock = threading.Lock()
+_entries = OrderedDict()
+# Incrementada a cada invalidação: uma leitura do banco iniciada antes dela não
+# pode guardar o resultado (poderia ser o valor antigo)
+_generation = 0
+_stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0,
+          "remote_invalidations": 0, "remote_clears": 0}
+
+# Sincronização entre processos pelo log USER_CACHE_INVALIDATIONS (só com USER_CACHE_SYNC_INTERVAL > 0).
+# Os IDs não chegam em ordem (uma transação pode confirmar depois de outra mais nova), então
+# cada conferência relê as linhas dos últimos _LOOKBACK e aplica só as que ainda não tinha visto.
+_LOOKBACK = timedelta(minutes=5)
+# Linhas mais antigas que isto são apagadas (por qualquer processo, a cada _PRUNE_INTERVAL segundos)
+_RETENTION = timedelta(hours=1)
+_PRUNE_INTERVAL = 600
+_seen_ids = set()
+_last_sync = 0.0
+_last_sync_ok = None  # time.monotonic() da última conferência bem-sucedida
+_next_prune = 0.0
+
+
+def generation():
+    """Marca a ser passada para put() por quem vai ler o usuário do banco."""
+    return _generation
+
+
+def get(user_id):
+    """Cópia do usuário em cache, ou None (ausente ou expirado)."""
+    _sync_if_due()
+    with _lock:
+        entry = _entries.get(user_id)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                _entries.move_to_end(user_id)
+                _stats["hits"] += 1
+                return dict(entry[1])
+            del _entries[user_id]
+        _stats["misses"] += 1
+        return None
+
+
+def put(user_id, user, read_generation):
+    """Guarda o usuário lido do banco, a menos que tenha havido invalidação desde read_generation."""
+    if Config.USER_CACHE_SIZE <= 0:
+        return
+    with _lock:
+        if read_generation != _generation:
+            return
+        _entries[user_id] = (time.monotonic() + Config.USER_CACHE_TTL, dict(user))
+        _entries.move_to_end(user_id)
+        while len(_entries) > Config.USER_CACHE_SIZE:
+            _entries.popitem(last=False)
+            _stats["evictions"] += 1
+
+
+def _evict(user_id):
+    global _generation
+    with _lock:
+        _generation += 1
+        if _entries.pop(user_id, None) is not None:
+            _stats["invalidations"] += 1
+
+
+def invalidate(user_id, cur):
+    """
+    Chamado por quem altera o usuário, antes do commit, com o cursor da própria transação.
+    Remove o usuário agora e de novo após a confirmação real (uma leitura concorrente
+    ainda veria os dados antigos até lá). Com a sincronização ligada, registra a
+    invalidação em USER_CACHE_INVALIDATIONS para os outros processos (só um INSERT).
+    """
+    _evict(user_id)
+    after_commit(lambda: _evict(user_id))
+    if Config.USER_CACHE_SYNC_INTERVAL > 0:
+        cur.execute("INSERT INTO USER_CACHE_INVALIDATIONS (USER_ID) VALUES (?);", (user_id,))
+
+
+def clear():
+    """Esvazia o cache deste processo."""
+    global _generation
+    with _lock:
+        _generation += 1
+        _entries.clear()
+
+
+def _sync_if_due():
+    """
+    A cada USER_CACHE_SYNC_INTERVAL segundos lê as invalidações recentes e descarta os
+    usuários alterados por outros processos (e pelas escritas deste: elas são raras).
+    Se a última conferência bem-sucedida for mais antiga que _LOOKBACK, esvazia o cache.
+    """
+    global _last_sync, _last_sync_ok, _seen_ids, _generation
+    interval = Config.USER_CACHE_SYNC_INTERVAL
+    if interval <= 0 or time.monotonic() - _last_sync < interval:
+        return
+    _last_sync = time.monotonic()
+
+    conn = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT ID, USER_ID FROM USER_CACHE_INVALIDATIONS WHERE CREATED_AT > ?;",
+            (datetime.now() - _LOOKBACK,)
+        )
+        rows = cur.fetchall()
+    except fdb.Error as e:
+        print(f"Erro ao conferir as invalidações do cache de usuários: {e}")
+        return
+    finally:
+        if conn: conn.close()
+
+    now = time.monotonic()
+    with _lock:
+        if _last_sync_ok is None or now - _last_sync_ok > _LOOKBACK.total_seconds():
+            # Primeira conferência ou conferências falhando há muito tempo: pode ter perdido invalidações
+            if _entries:
+                _stats["remote_clears"] += 1
+            _generation += 1
+            _entries.clear()
+        else:
+            new_rows = [(row_id, user_id) for row_id, user_id in rows if row_id not in _seen_ids]
+            if new_rows:
+                _generation += 1
+                for _, user_id in new_rows:
+                    if _entries.pop(user_id, None) is not None:
+                        _stats["remote_invalidations"] += 1
+        _seen_ids = {row[0] for row in rows}
+        _last_sync_ok = now
+
+    _prune_if_due(now)
+
+
+def _prune_if_due(now):
+    """Apaga as invalidações antigas, numa transação curta própria (fora da unidade de trabalho)."""
+    global _next_prune
+    if now < _next_prune:
+        return
+    _next_prune = now + _PRUNE_INTERVAL
+    conn = None
+    try:
+        conn = get_pool().acquire()
+        cur = conn.cursor()
+        cur.execute("DELETE FROM USER_CACHE_INVALIDATIONS WHERE CREATED_AT < ?;", (datetime.now() - _RETENTION,))
+        conn.commit()
+    except fdb.Error as e:
+        # Outro processo pode estar apagando as mesmas linhas; fica para a próxima vez
+        print(f"Erro ao limpar as invalidações do cache de usuários: {e}")
+        if conn: conn.rollback()
+    finally:
+        if conn: conn.close()
+
+
+def get_stats():
+    """Acertos, faltas, taxa de acerto e tamanho atual do cache."""
+    with _lock:
+        stats = dict(_stats, size=len(_entries))
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+    return stats
@@ -1,14 +1,27 @@
 # src/services/user_service.py
 
+import re
 import fdb
-import bcrypt
 from datetime import datetime, timedelta
-from . import email_service
-from ..database import get_db_connection
-from ..utils import token_helper
+from . import email_service, user_cache
+from ..database import after_commit, get_db_connection, in_placeholders
+from .. import password_hasher
+from ..config import Config
+from ..utils import pagination, token_helper
 from ..utils import validators
 
 
+def _send_email_quietly(description, **email):
+    """
+    Enfileira um e-mail sem deixar a falha (fila cheia ou worker parado) chegar à rota:
+    a resposta não pode mudar conforme o envio, ou ela revelaria se a conta existe.
+    """
+    try:
+        email_service.send_email(**email)
+    except (email_service.MailQueueFullError, RuntimeError) as e:
+        print(f"AVISO: Falha ao enviar e-mail de {description} para {email['to']}. Erro: {e}")
+
+
 def create_user(user_data):
     """Cria um novo usuário (cliente ou interno) e envia e-mail de boas-vindas."""
     full_name = user_data.get('full_name')
@@ -23,7 +36,7 @@ def create_user(user_data):
         return (None, message)
 
     role = user_data.get('role', 'customer')
-    hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+    hashed_password = password_hasher.hash_password(password)
 
     conn = None
     try:
@@ -37,7 +50,7 @@ def create_user(user_data):
             RETURNING ID;
         """
         # NOVO: Passa date_of_birth como parâmetro
-        cur.execute(sql, (full_name, email, hashed_password.decode('utf-8'), role, date_of_birth))
+        cur.execute(sql, (full_name, email, hashed_password, role, date_of_birth))
         new_user_id = cur.fetchone()[0]
         conn.commit()
 
@@ -51,15 +64,14 @@ def create_user(user_data):
         }
 
         if role == 'customer':
-            try:
-                email_service.send_email(
-                    to=new_user['email'],
-                    subject='Bem-vindo ao Royal Burger!',
-                    template='welcome',
-                    user=new_user
-                )
-            except Exception as e:
-                print(f"AVISO: Falha ao enviar e-mail de boas-vindas para {new_user['email']}. Erro: {e}")
+            # Só depois da confirmação real: um cadastro desfeito não recebe boas-vindas
+            after_commit(lambda: _send_email_quietly(
+                'boas-vindas',
+                to=new_user['email'],
+                subject='Bem-vindo ao Royal Burger!',
+                template='welcome',
+                user=new_user
+            ))
 
         # Retorna o novo usuário e None para a mensagem de erro
         return (new_user, None)
@@ -90,8 +102,97 @@ def get_users_by_role(role='customer'):
         if conn: conn.close()
 
 
+_DIGITS_QUERY = re.compile(r'^[\d\s.()/+-]+$')
+# Pontuação removida de CPF/PHONE na busca; os índices da migração 012 usam a mesma expressão
+_FORMAT_CHARS = ('.', '-', ' ', '(', ')', '/', '+')
+
+
+def _digits_only(column):
+    """Expressão SQL com os dígitos de 'column' (REPLACEs aninhados, como nos índices)."""
+    expression = column
+    for char in _FORMAT_CHARS:
+        expression = f"REPLACE({expression}, '{char}', '')"
+    return expression
+
+
+def _customer_search_filter(query):
+    """
+    Condição de busca por prefixo conforme o formato do termo: e-mail se tiver '@',
+    CPF/telefone (só os dígitos) se for numérico e, nos demais casos, o nome.
+    Retorna (condicao, parametros); sem termo, ("", []).
+    """
+    query = (query or '').strip()
+    if not query:
+        return "", []
+    if '@' in query:
+        return "LOWER(u.EMAIL) STARTING WITH ?", [query.lower()]
+    if _DIGITS_QUERY.match(query):
+        digits = re.sub(r'\D', '', query)
+        if digits:
+            return f"({_digits_only('u.CPF')} STARTING WITH ? OR {_digits_only('u.PHONE')} STARTING WITH ?)", [digits, digits]
+    return "UPPER(u.FULL_NAME) STARTING WITH ?", [query.upper()]
+
+
+def search_customers(query=None, limit=50, cursor=None):
+    """
+    Busca uma página de clientes ativos ordenada pelo nome (sem diferenciar maiúsculas),
+    com busca opcional por prefixo de nome, e-mail, telefone ou CPF.
+    Na primeira página (sem cursor) também conta os resultados, até CUSTOMER_COUNT_LIMIT.
+    Retorna uma tupla: (clientes, cursor_da_proxima_pagina ou None, total ou None),
+    onde total = {"count": n, "exact": False se a contagem parou no limite}.
+    """
+    conditions = ["u.ROLE = 'customer'", "u.IS_ACTIVE = TRUE"]
+    params = []
+    search, search_params = _customer_search_filter(query)
+    if search:
+        conditions.append(search)
+        params.extend(search_params)
+    filters = ' AND '.join(conditions)
+    filter_params = list(params)
+
+    last = pagination.decode_cursor(cursor)
+    if last:
+        last_name, last_id = last
+        conditions.append("(UPPER(u.FULL_NAME) > ? OR (UPPER(u.FULL_NAME) = ? AND u.ID > ?))")
+        params.extend([last_name, last_name, last_id])
+
+    conn = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        sql = f"""
+            SELECT FIRST ? u.ID, u.FULL_NAME, u.EMAIL, u.PHONE, u.CPF, UPPER(u.FULL_NAME)
+            FROM USERS u
+            WHERE {' AND '.join(conditions)}
+            ORDER BY UPPER(u.FULL_NAME), u.ID;
+        """
+        cur.execute(sql, [limit + 1] + params)
+        rows, has_more = pagination.fetch_page(cur, limit)
+        customers = [{"id": row[0], "full_name": row[1], "email": row[2], "phone": row[3], "cpf": row[4]} for row in rows]
+        next_cursor = pagination.encode_cursor(rows[-1][5], rows[-1][0]) if has_more else None
+
+        total = None
+        if not last:
+            # Contagem limitada: acima de CUSTOMER_COUNT_LIMIT só informamos que há "mais de"
+            count_limit = Config.CUSTOMER_COUNT_LIMIT
+            sql_count = f"SELECT COUNT(*) FROM (SELECT FIRST ? 1 AS X FROM USERS u WHERE {filters});"
+            cur.execute(sql_count, [count_limit + 1] + filter_params)
+            count = cur.fetchone()[0]
+            total = {"count": min(count, count_limit), "exact": count <= count_limit}
+        return customers, next_cursor, total
+    except fdb.Error as e:
+        print(f"Erro ao buscar clientes: {e}")
+        return [], None, None
+    finally:
+        if conn: conn.close()
+
+
 def get_user_by_id(user_id):
-    """Busca um único usuário ativo pelo ID."""
+    """Busca um único usuário ativo pelo ID (do cache em memória, quando possível)."""
+    user = user_cache.get(user_id)
+    if user is not None:
+        return user
+    read_generation = user_cache.generation()
     conn = None
     try:
         conn = get_db_connection()
@@ -100,7 +201,9 @@ def get_user_by_id(user_id):
         cur.execute(sql, (user_id,))
         row = cur.fetchone()
         if row:
-            return {"id": row[0], "full_name": row[1], "email": row[2], "phone": row[3], "cpf": row[4], "role": row[5]}
+            user = {"id": row[0], "full_name": row[1], "email": row[2], "phone": row[3], "cpf": row[4], "role": row[5]}
+            user_cache.put(user_id, user, read_generation)
+            return user
         return None
     except fdb.Error as e:
         print(f"Erro ao buscar usuário por ID: {e}")
@@ -109,6 +212,29 @@ def get_user_by_id(user_id):
         if conn: conn.close()
 
 
+def get_users_by_ids(user_ids):
+    """Busca vários usuários ativos em uma única consulta. Retorna {id: usuario}."""
+    user_ids = [user_id for user_id in set(user_ids) if user_id is not None]
+    if not user_ids:
+        return {}
+    conn = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        placeholders, params = in_placeholders(user_ids)
+        sql = f"SELECT ID, FULL_NAME, EMAIL, PHONE, CPF, ROLE FROM USERS WHERE ID IN ({placeholders}) AND IS_ACTIVE = TRUE;"
+        cur.execute(sql, params)
+        return {
+            row[0]: {"id": row[0], "full_name": row[1], "email": row[2], "phone": row[3], "cpf": row[4], "role": row[5]}
+            for row in cur.fetchall()
+        }
+    except fdb.Error as e:
+        print(f"Erro ao buscar usuários por IDs: {e}")
+        return {}
+    finally:
+        if conn: conn.close()
+
+
 def update_user(user_id, update_data):
     """
     Atualiza dados de um usuário com validações específicas para cada campo.
@@ -160,6 +286,7 @@ def update_user(user_id, update_data):
 
         sql_update = f"UPDATE USERS SET {', '.join(set_parts)} WHERE ID = ?;"
         cur.execute(sql_update, tuple(values))
+        user_cache.invalidate(user_id, cur)
         conn.commit()
 
         # --- LÓGICA DE RETORNO CORRIGIDA ---
@@ -182,8 +309,11 @@ def deactivate_user(user_id):
         cur = conn.cursor()
         sql = "UPDATE USERS SET IS_ACTIVE = FALSE WHERE ID = ?;"
         cur.execute(sql, (user_id,))
+        deactivated = cur.rowcount > 0
+        if deactivated:
+            user_cache.invalidate(user_id, cur)
         conn.commit()
-        return cur.rowcount > 0
+        return deactivated
     except fdb.Error as e:
         print(f"Erro ao inativar usuário: {e}")
         if conn: conn.rollback()
@@ -198,9 +328,10 @@ def get_user_ids_by_roles(roles):
         conn = get_db_connection()
         cur = conn.cursor()
         # O 'IN' do SQL não funciona bem com placeholders, então formatamos a string com segurança.
-        placeholders = ', '.join(['?' for _ in roles])
+        # A aridade é arredondada para reaproveitar o statement preparado.
+        placeholders, params = in_placeholders(roles)
         sql = f"SELECT ID FROM USERS WHERE ROLE IN ({placeholders}) AND IS_ACTIVE = TRUE;"
-        cur.execute(sql, tuple(roles))
+        cur.execute(sql, params)
         return [row[0] for row in cur.fetchall()]
     except fdb.Error as e:
         print(f"Erro ao buscar usuários por cargos: {e}")
@@ -240,13 +371,14 @@ def initiate_password_reset(email):
             # O link aponta para a rota do nosso frontend React
             reset_link = f"http://localhost:5173/reset-password?token={token}"
 
-            email_service.send_email(
+            after_commit(lambda: _send_email_quietly(
+                'recuperação de senha',
                 to=email,
                 subject="Recuperação de Senha - Royal Burger",
                 template='password_reset',
                 user={"full_name": full_name},
                 reset_link=reset_link
-            )
+            ))
 
         # Sempre retorna True para não vazar informação sobre e-mails existentes
         return True
@@ -296,9 +428,10 @@ def finalize_password_reset(token, new_password):
             return (False, "Este token de recuperação expirou.")
 
         # 2. Se o token é válido, atualiza a senha do usuário
-        hashed_password = bcrypt.hashpw(new_password.encode('utf-8'), bcrypt.gensalt())
+        hashed_password = password_hasher.hash_password(new_password)
         sql_update_password = "UPDATE USERS SET PASSWORD_HASH = ? WHERE ID = ?;"
-        cur.execute(sql_update_password, (hashed_password.decode('utf-8'), user_id))
+        cur.execute(sql_update_password, (hashed_password, user_id))
+        user_cache.invalidate(user_id, cur)
 
         # 3. Marca o token como utilizado para invalidá-lo
         sql_invalidate_token = "UPDATE PASSWORD_RESET_TOKENS SET USED_AT = CURRENT_TIMESTAMP WHERE TOKEN = ?;"
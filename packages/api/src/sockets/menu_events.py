@@ -0,0 +1,22 @@
+# src/sockets/menu_events.py
+
+from flask import request
+from flask_socketio import join_room, leave_room
+
+from .. import socketio
+from ..services import availability_service
+
+
+@socketio.on('join_menu')
+def handle_join_menu():
+    """
+    Cliente com o cardápio aberto passa a receber 'menu_availability_changed'
+    (deltas de ingredientes/produtos esgotados). O cardápio é público: não exige token.
+    """
+    join_room(availability_service.MENU_ROOM)
+    print(f"Cliente {request.sid} entrou na sala {availability_service.MENU_ROOM}")
+
+
+@socketio.on('leave_menu')
+def handle_leave_menu():
+    leave_room(availability_service.MENU_ROOM)
@@ -0,0 +1,49 @@
+# src/sockets/order_events.py
+
+from flask import request
+from flask_jwt_extended import decode_token
+from flask_socketio import join_room, leave_room
+
+from .. import socketio
+from ..services import order_service, outbox_service
+
+# Cargos da equipe, que acompanham qualquer pedido
+STAFF_ROLES = ('admin', 'manager', 'attendant')
+
+
+@socketio.on('join_order')
+def handle_join_order(data):
+    """
+    Cliente passa a receber 'order_status_updated' de um pedido.
+    Espera receber: {'token': 'seu_jwt_aqui', 'order_id': 123}
+    Só o dono do pedido ou alguém da equipe entra na sala. Retorna (ack) True se entrou.
+    """
+    token = (data or {}).get('token')
+    order_id = (data or {}).get('order_id')
+    if not token or not isinstance(order_id, int):
+        return False
+
+    try:
+        decoded_token = decode_token(token)
+    except Exception as e:
+        print(f"Token inválido ao entrar na sala do pedido {order_id}: {e}")
+        return False
+
+    user_role = decoded_token.get('role') or next(iter(decoded_token.get('roles') or []), None)
+    if user_role not in STAFF_ROLES:
+        owner_id = order_service.get_order_owner(order_id)
+        if owner_id is None or str(owner_id) != str(decoded_token.get('sub')):
+            print(f"Cliente {request.sid} sem permissão para acompanhar o pedido {order_id}")
+            return False
+
+    room = outbox_service.order_room(order_id)
+    join_room(room)
+    print(f"Cliente {request.sid} entrou na sala {room}")
+    return True
+
+
+@socketio.on('leave_order')
+def handle_leave_order(data):
+    order_id = (data or {}).get('order_id')
+    if isinstance(order_id, int):
+        leave_room(outbox_service.order_room(order_id))
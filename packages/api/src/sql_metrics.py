@@ -0,0 +1,132 @@
+# src/sql_metrics.py
+
+import logging
+import re
+
+from flask import g, has_app_context, request
+
+# Log dedicado às consultas lentas e aos padrões N+1
+slow_query_logger = logging.getLogger('royalburger.sql')
+
+_slow_query_ms = 200
+_n_plus_one_threshold = 10
+
+_LITERAL_STRING = re.compile(r"'(?:[^']|'')*'")
+_LITERAL_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_sql(sql):
+    """
+    Normaliza um SQL para agrupar execuções equivalentes: colapsa espaços,
+    troca literais por '?' e listas IN de qualquer tamanho por '(?...)'.
+    """
+    sql = _LITERAL_STRING.sub('?', sql)
+    sql = _LITERAL_NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('(?...)', sql)
+    return _WHITESPACE.sub(' ', sql).strip().rstrip(';')
+
+
+class RequestSqlStats:
+    """Totais de SQL de uma requisição."""
+
+    def __init__(self):
+        self.queries = 0
+        self.total_ms = 0.0
+        self.rows = 0
+        self.per_statement = {}
+        self.n_plus_one = set()
+
+
+class QueryRecord:
+    """Uma execução de statement: tempo de execução + fetches e linhas lidas."""
+
+    __slots__ = ('sql', 'normalized', 'elapsed_ms', 'rows', 'finished')
+
+    def __init__(self, sql):
+        self.sql = sql
+        self.normalized = normalize_sql(sql) if isinstance(sql, str) else repr(sql)
+        self.elapsed_ms = 0.0
+        self.rows = 0
+        self.finished = False
+
+
+def _request_stats():
+    if has_app_context():
+        return g.get('_sql_stats')
+    return None
+
+
+def start(sql, elapsed):
+    """Registra a execução de um statement e retorna o registro para acumular os fetches."""
+    record = QueryRecord(sql)
+    record.elapsed_ms = elapsed * 1000
+
+    stats = _request_stats()
+    if stats is not None:
+        stats.queries += 1
+        stats.total_ms += record.elapsed_ms
+        count = stats.per_statement.get(record.normalized, 0) + 1
+        stats.per_statement[record.normalized] = count
+        if count > _n_plus_one_threshold and record.normalized not in stats.n_plus_one:
+            stats.n_plus_one.add(record.normalized)
+            slow_query_logger.warning(
+                "Possível N+1 em %s %s: statement executado mais de %d vezes: %s",
+                request.method, request.path, _n_plus_one_threshold, record.normalized
+            )
+    return record
+
+
+def add_fetch(record, rows, elapsed):
+    """Soma linhas e tempo de um fetch ao registro e aos totais da requisição."""
+    elapsed_ms = elapsed * 1000
+    record.rows += rows
+    record.elapsed_ms += elapsed_ms
+
+    stats = _request_stats()
+    if stats is not None:
+        stats.rows += rows
+        stats.total_ms += elapsed_ms
+
+
+def finish(record):
+    """Fecha o registro e grava no log se o statement passou do limite de lentidão."""
+    if record is None or record.finished:
+        return
+    record.finished = True
+    if _slow_query_ms and record.elapsed_ms >= _slow_query_ms:
+        slow_query_logger.warning(
+            "Consulta lenta (%.1f ms, %d linhas): %s", record.elapsed_ms, record.rows, record.normalized
+        )
+
+
+def init_app(app):
+    """
+    Configura o log de consultas lentas e a contagem de SQL por requisição.
+    Em modo debug, os totais vão nos cabeçalhos X-SQL-* da resposta.
+    """
+    global _slow_query_ms, _n_plus_one_threshold
+    _slow_query_ms = app.config['SQL_SLOW_QUERY_MS']
+    _n_plus_one_threshold = app.config['SQL_N_PLUS_ONE_THRESHOLD']
+
+    log_file = app.config['SQL_SLOW_QUERY_LOG']
+    if log_file and not slow_query_logger.handlers:
+        handler = logging.FileHandler(log_file, encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(message)s'))
+        slow_query_logger.addHandler(handler)
+        slow_query_logger.setLevel(logging.INFO)
+
+    @app.before_request
+    def _start_sql_stats():
+        g._sql_stats = RequestSqlStats()
+
+    @app.after_request
+    def _sql_stats_headers(response):
+        stats = g.get('_sql_stats')
+        if stats is not None and app.debug:
+            response.headers['X-SQL-Queries'] = str(stats.queries)
+            response.headers['X-SQL-Time-Ms'] = f"{stats.total_ms:.1f}"
+            response.headers['X-SQL-Rows'] = str(stats.rows)
+            response.headers['X-SQL-N-Plus-One'] = str(len(stats.n_plus_one))
+        return response
@@ -0,0 +1,14 @@
+# src/utils/http_cache.py
+
+from flask import Response, request
+
+
+def conditional_json_response(body, etag):
+    """
+    Resposta JSON já serializada com ETag forte. Se o cliente mandar If-None-Match
+    com a mesma ETag, devolve 304 sem corpo. 'no-cache' faz o cliente sempre revalidar.
+    """
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
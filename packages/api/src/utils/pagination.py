@@ -0,0 +1,58 @@
+# src/utils/pagination.py
+
+import base64
+import json
+from datetime import datetime
+
+# Tamanho do lote lido por fetchmany() ao montar uma página
+FETCH_BATCH_SIZE = 100
+
+
+def parse_limit(value, default=50, maximum=200):
+    """Converte o parâmetro 'limit' da query string, validando os limites."""
+    if value is None or value == '':
+        return default
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise ValueError("O parâmetro 'limit' deve ser um número inteiro.")
+    if limit < 1 or limit > maximum:
+        raise ValueError(f"O parâmetro 'limit' deve estar entre 1 e {maximum}.")
+    return limit
+
+
+def encode_cursor(*values):
+    """
+    Gera um cursor opaco (base64) com os valores da chave de ordenação da última linha.
+    Datas são serializadas em ISO 8601.
+    """
+    payload = [{"dt": v.isoformat()} if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Faz o caminho inverso de encode_cursor(). Lança ValueError se o cursor for inválido."""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return tuple(datetime.fromisoformat(v["dt"]) if isinstance(v, dict) else v for v in payload)
+    except (ValueError, TypeError, KeyError):
+        raise ValueError("O parâmetro 'cursor' é inválido.")
+
+
+def fetch_page(cur, limit):
+    """
+    Lê até limit + 1 linhas com fetchmany(), em lotes, sem carregar o resultado todo.
+    Retorna (linhas, tem_proxima_pagina).
+    """
+    rows = []
+    while len(rows) <= limit:
+        batch = cur.fetchmany(min(FETCH_BATCH_SIZE, limit + 1 - len(rows)))
+        if not batch:
+            break
+        rows.extend(batch)
+    has_more = len(rows) > limit
+    return rows[:limit], has_more
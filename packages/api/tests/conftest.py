@@ -0,0 +1,9 @@
+# tests/conftest.py
+
+import os
+import sys
+
+# Os testes importam o pacote 'src' a partir de packages/api
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('OUTBOX_DISPATCHER_ENABLED', 'false')
+os.environ.setdefault('LOYALTY_EXPIRY_SCHEDULER_ENABLED', 'false')
@@ -0,0 +1,36 @@
+# tests/test_customer_search.py
+
+import os
+import re
+
+from src import migrations
+from src.services import user_service
+
+
+def _index_expressions():
+    with open(os.path.join(migrations.MIGRATIONS_DIR, '012_customer_digits_indexes.sql'), encoding='utf-8') as f:
+        script = f.read()
+    return dict(re.findall(r'CREATE INDEX (\w+) ON USERS COMPUTED BY \((.+)\);', script))
+
+
+def test_formatted_document_searches_by_digits():
+    condition, params = user_service._customer_search_filter(' 123.456.789-0 ')
+    assert params == ['1234567890', '1234567890']
+    assert user_service._digits_only('u.CPF') in condition
+    assert user_service._digits_only('u.PHONE') in condition
+
+
+def test_phone_with_country_code_searches_by_digits():
+    _, params = user_service._customer_search_filter('+55 (11) 98765-4321')
+    assert params == ['5511987654321', '5511987654321']
+
+
+def test_search_expression_matches_the_computed_indexes():
+    indexes = _index_expressions()
+    assert indexes['IDX_USERS_CPF_DIGITS'] == user_service._digits_only('CPF')
+    assert indexes['IDX_USERS_PHONE_DIGITS'] == user_service._digits_only('PHONE')
+
+
+def test_name_and_email_queries_are_unchanged():
+    assert user_service._customer_search_filter('ana') == ("UPPER(u.FULL_NAME) STARTING WITH ?", ['ANA'])
+    assert user_service._customer_search_filter('Ana@X.com') == ("LOWER(u.EMAIL) STARTING WITH ?", ['ana@x.com'])
@@ -0,0 +1,84 @@
+# tests/test_email_service.py
+
+import smtplib
+
+import pytest
+
+from src.services import email_service
+
+
+class FakeSmtp:
+    def __init__(self, failures):
+        self.sent = []
+        self.closed = False
+        self._failures = failures
+
+    def send(self, msg):
+        if self._failures:
+            raise self._failures.pop(0)
+        self.sent.append(msg)
+
+
+@pytest.fixture
+def smtp(monkeypatch):
+    """Conexões SMTP falsas; 'failures' são lançadas, em ordem, pelos próximos send()."""
+    state = {"connections": [], "failures": []}
+
+    def open_connection():
+        connection = FakeSmtp(state["failures"])
+        state["connections"].append(connection)
+        return connection
+
+    def close_connection(connection):
+        if connection is not None:
+            connection.closed = True
+        return None
+
+    monkeypatch.setattr(email_service, '_open_connection', open_connection)
+    monkeypatch.setattr(email_service, '_close_connection', close_connection)
+    monkeypatch.setattr(email_service, '_build_message', lambda to, subject, template, context: (to, subject))
+    monkeypatch.setattr(email_service, '_stats', dict.fromkeys(email_service._stats, 0))
+    return state
+
+
+def test_session_reuses_one_connection(smtp):
+    with email_service.SmtpSession() as session:
+        for i in range(3):
+            session.send(f"c{i}@x.com", "Pedido", "order_status_update")
+    assert len(smtp["connections"]) == 1
+    assert len(smtp["connections"][0].sent) == 3
+    assert smtp["connections"][0].closed
+    assert email_service.get_stats()["sent"] == 3
+
+
+def test_session_without_messages_opens_no_connection(smtp):
+    with email_service.SmtpSession():
+        pass
+    assert smtp["connections"] == []
+
+
+def test_dropped_connection_is_reopened_once(smtp):
+    smtp["failures"].append(smtplib.SMTPServerDisconnected("caiu"))
+    with email_service.SmtpSession() as session:
+        session.send("a@x.com", "Pedido", "order_status_update")
+    assert len(smtp["connections"]) == 2
+    assert smtp["connections"][1].sent == [("a@x.com", "Pedido")]
+
+
+def test_failure_is_raised_to_the_caller(smtp):
+    smtp["failures"].append(smtplib.SMTPRecipientsRefused({"a@x.com": (550, b"no")}))
+    with email_service.SmtpSession() as session:
+        with pytest.raises(smtplib.SMTPRecipientsRefused):
+            session.send("a@x.com", "Pedido", "order_status_update")
+        session.send("b@x.com", "Pedido", "order_status_update")
+    # A recusa não derruba a conexão
+    assert len(smtp["connections"]) == 1
+    assert email_service.get_stats()["failed"] == 1
+
+
+def test_server_down_raises_after_retry(smtp):
+    smtp["failures"].extend([OSError("recusada"), OSError("recusada")])
+    with email_service.SmtpSession() as session:
+        with pytest.raises(OSError):
+            session.send("a@x.com", "Pedido", "order_status_update")
+    assert email_service.get_stats()["failed"] == 1
@@ -0,0 +1,90 @@
+# tests/test_menu_service.py
+
+import fdb
+import pytest
+
+from src.services import menu_service
+
+CONFLICT = fdb.DatabaseError("update conflicts with concurrent update", -913, 335544345)
+
+
+class FakeCursor:
+    def __init__(self, failures=()):
+        self.executed = []
+        self._failures = list(failures)
+
+    def execute(self, sql, params=()):
+        if self._failures:
+            raise self._failures.pop(0)
+        self.executed.append(sql)
+
+
+class FakeConnection:
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.log = []
+
+    def cursor(self):
+        return self._cursor
+
+    def commit(self):
+        self.log.append('commit')
+
+    def rollback(self):
+        self.log.append('rollback')
+
+    def close(self):
+        self.log.append('close')
+
+
+@pytest.fixture
+def pending(monkeypatch):
+    """Unidade de trabalho ativa: guarda os callbacks pós-commit em vez de executá-los."""
+    callbacks = []
+    monkeypatch.setattr(menu_service, 'current_unit_of_work', lambda: object())
+    monkeypatch.setattr(menu_service, 'after_commit', callbacks.append)
+    monkeypatch.setattr(menu_service, '_last_version_check', 123.0)
+    return callbacks
+
+
+def test_bump_waits_for_the_real_commit(pending, monkeypatch):
+    request_cursor = FakeCursor()
+    bump_conn = FakeConnection(FakeCursor())
+    monkeypatch.setattr(menu_service, 'get_pool', lambda: type('Pool', (), {'acquire': lambda self: bump_conn})())
+
+    menu_service.bump_version(FakeConnection(request_cursor))
+    # Nada na transação da requisição, e a versão conferida continua valendo até o commit
+    assert request_cursor.executed == []
+    assert menu_service._last_version_check == 123.0
+
+    pending.pop()()
+    assert bump_conn._cursor.executed == ["UPDATE MENU_VERSION SET VERSION = VERSION + 1 WHERE ID = 1;"]
+    assert bump_conn.log == ['commit', 'close']
+    assert menu_service._last_version_check == 0.0
+
+
+def test_bump_retries_update_conflicts(pending, monkeypatch):
+    bump_conn = FakeConnection(FakeCursor(failures=[CONFLICT, CONFLICT]))
+    monkeypatch.setattr(menu_service, 'get_pool', lambda: type('Pool', (), {'acquire': lambda self: bump_conn})())
+
+    menu_service.bump_version(FakeConnection(FakeCursor()))
+    pending.pop()()
+    assert len(bump_conn._cursor.executed) == 1
+    assert bump_conn.log == ['commit', 'close']
+
+
+def test_bump_failure_does_not_raise(pending, monkeypatch):
+    bump_conn = FakeConnection(FakeCursor(failures=[CONFLICT] * (menu_service._BUMP_MAX_RETRIES + 1)))
+    monkeypatch.setattr(menu_service, 'get_pool', lambda: type('Pool', (), {'acquire': lambda self: bump_conn})())
+
+    menu_service.bump_version(FakeConnection(FakeCursor()))
+    pending.pop()()
+    assert bump_conn.log == ['rollback', 'close']
+    assert menu_service._last_version_check == 0.0
+
+
+def test_bump_outside_unit_of_work_uses_callers_transaction(monkeypatch):
+    monkeypatch.setattr(menu_service, 'current_unit_of_work', lambda: None)
+    cursor = FakeCursor(failures=[CONFLICT])
+    menu_service.bump_version(FakeConnection(cursor))
+    assert cursor.executed == ["UPDATE MENU_VERSION SET VERSION = VERSION + 1 WHERE ID = 1;"]
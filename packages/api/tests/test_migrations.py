@@ -0,0 +1,121 @@
+# tests/test_migrations.py
+
+import os
+import shutil
+import uuid
+
+import fdb
+import pytest
+
+from src import migrations
+from src.config import Config
+
+# Scripts que criam uma tabela e gravam a linha inicial dela no mesmo arquivo
+SEEDED_SCRIPTS = ['005_menu_version.sql', '007_user_cache_version.sql']
+
+
+class FakeConnection:
+    """Registra a ordem de comandos e commits; o SCHEMA_MIGRATIONS já existe e está vazio."""
+
+    def __init__(self):
+        self.log = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def execute_immediate(self, statement):
+        self.log.append(('execute', statement.split(None, 2)[:2]))
+
+    def commit(self):
+        self.log.append(('commit',))
+
+    def rollback(self):
+        self.log.append(('rollback',))
+
+    def close(self):
+        pass
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self._conn = conn
+        self._sql = ''
+
+    def execute(self, sql, params=()):
+        self._sql = sql
+        if sql.startswith('INSERT INTO SCHEMA_MIGRATIONS'):
+            self._conn.log.append(('record', params[0]))
+
+    def fetchone(self):
+        return (1,)  # SCHEMA_MIGRATIONS existe
+
+    def fetchall(self):
+        return []  # Nenhuma migração aplicada
+
+
+@pytest.fixture
+def seeded_migrations_dir(tmp_path, monkeypatch):
+    for filename in SEEDED_SCRIPTS:
+        shutil.copy(os.path.join(migrations.MIGRATIONS_DIR, filename), tmp_path / filename)
+    monkeypatch.setattr(migrations, 'MIGRATIONS_DIR', str(tmp_path))
+    return tmp_path
+
+
+def test_ddl_is_committed_before_seed_insert(seeded_migrations_dir, monkeypatch):
+    conn = FakeConnection()
+    monkeypatch.setattr(migrations, 'get_db_connection', lambda: conn)
+
+    assert migrations.migrate() == [5, 7]
+
+    create = conn.log.index(('execute', ['CREATE', 'TABLE']))
+    insert = conn.log.index(('execute', ['INSERT', 'INTO']))
+    assert ('commit',) in conn.log[create + 1:insert]
+    # O registro em SCHEMA_MIGRATIONS fica na transação do DML
+    assert conn.log[insert + 1:insert + 3] == [('record', 5), ('commit',)]
+
+
+def test_ddl_only_migration_keeps_single_transaction(tmp_path, monkeypatch):
+    (tmp_path / '001_indexes.sql').write_text(
+        "-- só DDL\nCREATE INDEX IDX_A ON A (X);\nCREATE INDEX IDX_B ON B (Y);\n", encoding='utf-8')
+    monkeypatch.setattr(migrations, 'MIGRATIONS_DIR', str(tmp_path))
+    conn = FakeConnection()
+    monkeypatch.setattr(migrations, 'get_db_connection', lambda: conn)
+
+    migrations.migrate()
+
+    assert conn.log == [
+        ('execute', ['CREATE', 'INDEX']),
+        ('execute', ['CREATE', 'INDEX']),
+        ('record', 1),
+        ('commit',),
+    ]
+
+
+@pytest.fixture
+def empty_database(tmp_path):
+    """Banco Firebird vazio e temporário; o teste é pulado sem servidor/cliente Firebird."""
+    path = os.path.join(os.environ.get('FIREBIRD_TEST_DIR', str(tmp_path)), f'migrations_{uuid.uuid4().hex}.fdb')
+    try:
+        conn = fdb.create_database(
+            host=Config.FIREBIRD_HOST, port=Config.FIREBIRD_PORT, database=path,
+            user=Config.FIREBIRD_USER, password=Config.FIREBIRD_PASSWORD, charset='UTF8'
+        )
+    except Exception as e:
+        pytest.skip(f"Firebird indisponível: {e}")
+    yield conn
+    conn.drop_database()
+
+
+def test_seeded_migrations_on_empty_database(seeded_migrations_dir, empty_database, monkeypatch):
+    monkeypatch.setattr(migrations, 'get_db_connection', lambda: empty_database)
+    monkeypatch.setattr(empty_database, 'close', lambda: None)
+
+    assert migrations.migrate() == [5, 7]
+
+    cur = empty_database.cursor()
+    cur.execute("SELECT VERSION FROM MENU_VERSION WHERE ID = 1;")
+    assert cur.fetchone() == (1,)
+    cur.execute("SELECT VERSION FROM USER_CACHE_VERSION WHERE ID = 1;")
+    assert cur.fetchone() == (1,)
+    cur.execute("SELECT VERSION FROM SCHEMA_MIGRATIONS ORDER BY VERSION;")
+    assert cur.fetchall() == [(5,), (7,)]
@@ -0,0 +1,102 @@
+# tests/test_password_hasher.py
+
+import threading
+
+import pytest
+
+from src import password_hasher
+from src.password_hasher import PasswordHasherBusy
+
+
+@pytest.fixture
+def hasher(monkeypatch):
+    """Hasher sem eventlet, custo mínimo do bcrypt e contadores zerados; restaura a configuração ao final."""
+    for name in ('_tpool', '_rounds', '_slots', '_max_pending', '_wait_timeout'):
+        monkeypatch.setattr(password_hasher, name, getattr(password_hasher, name))
+    monkeypatch.setattr(password_hasher, '_pending', 0)
+    monkeypatch.setattr(password_hasher, '_stats', {"rejected": 0, "timeouts": 0})
+    monkeypatch.setattr(password_hasher, '_operations', {})
+
+    def configure(workers=1, max_pending=4, wait_timeout=0.05):
+        password_hasher.configure(offload=False, rounds=4, workers=workers,
+                                  max_pending=max_pending, wait_timeout=wait_timeout)
+    configure()
+    return configure
+
+
+@pytest.fixture
+def busy_worker():
+    """Ocupa uma vaga do hasher até o teste terminar."""
+    started, release = threading.Event(), threading.Event()
+
+    def block():
+        started.set()
+        release.wait(5)
+
+    threads = []
+
+    def occupy():
+        thread = threading.Thread(target=password_hasher._run, args=('hash', block))
+        thread.start()
+        threads.append(thread)
+        assert started.wait(5)
+        started.clear()
+
+    yield occupy
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+
+def test_hash_and_check_roundtrip(hasher):
+    hashed = password_hasher.hash_password("S3nha!forte")
+    assert hashed.startswith("$2b$04$")
+    assert password_hasher.check_password("S3nha!forte", hashed)
+    assert not password_hasher.check_password("outra", hashed)
+    stats = password_hasher.get_stats()
+    assert stats["hash"]["calls"] == 1 and stats["check"]["calls"] == 2
+    assert stats["pending"] == 0
+
+
+def test_needs_rehash_compares_cost(hasher):
+    assert not password_hasher.needs_rehash("$2b$04$" + "x" * 53)
+    assert password_hasher.needs_rehash("$2b$12$" + "x" * 53)
+    assert not password_hasher.needs_rehash("texto-invalido")
+
+
+def test_full_queue_is_rejected_immediately(hasher, busy_worker):
+    hasher(workers=1, max_pending=1)
+    busy_worker()
+    with pytest.raises(PasswordHasherBusy):
+        password_hasher.hash_password("S3nha!forte")
+    stats = password_hasher.get_stats()
+    assert (stats["rejected"], stats["timeouts"], stats["pending"]) == (1, 0, 1)
+
+
+def test_waiting_too_long_for_a_worker_times_out(hasher, busy_worker):
+    hasher(workers=1, max_pending=2, wait_timeout=0.05)
+    busy_worker()
+    with pytest.raises(PasswordHasherBusy):
+        password_hasher.check_password("S3nha!forte", "$2b$04$" + "x" * 53)
+    stats = password_hasher.get_stats()
+    assert (stats["rejected"], stats["timeouts"], stats["pending"]) == (0, 1, 1)
+
+
+def test_workers_run_in_parallel_up_to_the_limit(hasher, busy_worker):
+    hasher(workers=2, max_pending=4)
+    busy_worker()
+    assert password_hasher.hash_password("S3nha!forte").startswith("$2b$04$")
+
+
+def test_busy_hasher_answers_503(hasher, monkeypatch):
+    from src import create_app
+    from src.services import auth_service
+
+    app = create_app()
+    hasher(workers=1, max_pending=0)
+    monkeypatch.setattr(auth_service, 'authenticate',
+                        lambda email, password: password_hasher.check_password(password, "$2b$04$" + "x" * 53))
+
+    response = app.test_client().post('/api/users/login', json={"email": "a@b.c", "password": "x"})
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
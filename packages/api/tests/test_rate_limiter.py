@@ -0,0 +1,137 @@
+# tests/test_rate_limiter.py
+
+import types
+
+import pytest
+
+from src import rate_limiter
+from src.rate_limiter import MemoryBackend, _estimate
+
+CONFIG = {
+    'RATE_LIMIT_ENABLED': True,
+    'RATE_LIMIT_BACKEND': 'memory',
+    'RATE_LIMIT_EVICT_INTERVAL': 60,
+    'LOGIN_LIMIT_PER_IP': 100,
+    'LOGIN_LIMIT_PER_EMAIL': 100,
+    'LOGIN_WINDOW_SECONDS': 60,
+    'PASSWORD_RESET_LIMIT_PER_IP': 3,
+    'PASSWORD_RESET_LIMIT_PER_EMAIL': 3,
+    'PASSWORD_RESET_WINDOW_SECONDS': 60,
+    'LOGIN_LOCKOUT_THRESHOLD': 3,
+    'LOGIN_LOCKOUT_BASE_SECONDS': 10,
+    'LOGIN_LOCKOUT_MAX_SECONDS': 60,
+}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Relógio controlado pelo teste no lugar do time.time() do limitador."""
+    fake = types.SimpleNamespace(now=6000.0)
+    fake.time = lambda: fake.now
+    monkeypatch.setattr(rate_limiter, 'time', fake)
+    monkeypatch.setattr(rate_limiter, '_stats', {"allowed": 0, "rejected": 0, "lockouts": 0, "errors": 0})
+    rate_limiter.configure(CONFIG)
+    yield fake
+    monkeypatch.setattr(rate_limiter, '_backend', None)
+
+
+# --- _estimate ---
+
+def test_estimate_weights_previous_window_by_remaining_fraction():
+    assert _estimate(current=2, previous=10, now=600, window=60) == 12      # início da janela
+    assert _estimate(current=2, previous=10, now=615, window=60) == 9.5     # 1/4 da janela
+    assert _estimate(current=2, previous=10, now=659.999, window=60) == pytest.approx(2, abs=0.01)
+
+
+# --- MemoryBackend ---
+
+def test_memory_backend_counts_within_window():
+    backend = MemoryBackend()
+    assert [backend.hit('k', 60, 600 + i) for i in range(3)] == [1, 2, 3]
+
+
+def test_memory_backend_carries_previous_window():
+    backend = MemoryBackend()
+    for _ in range(4):
+        backend.hit('k', 60, 600)
+    # Metade da janela seguinte: 4 x 0,5 + 1
+    assert backend.hit('k', 60, 690) == 3
+
+
+def test_memory_backend_forgets_windows_older_than_previous():
+    backend = MemoryBackend()
+    for _ in range(4):
+        backend.hit('k', 60, 600)
+    assert backend.hit('k', 60, 780) == 1
+
+
+def test_memory_backend_evicts_stale_keys():
+    backend = MemoryBackend(evict_interval=0)
+    backend.hit('old', 60, 600)
+    backend.add_failure('lockout:a', 600, forget_after=30)
+    backend.hit('new', 60, 1000)
+    assert list(backend._windows) == ['new']
+    assert backend._failures == {}
+
+
+def test_memory_backend_failures_reset_after_forget_period():
+    backend = MemoryBackend()
+    assert backend.add_failure('k', 100, forget_after=50) == 1
+    assert backend.add_failure('k', 120, forget_after=50) == 2
+    assert backend.add_failure('k', 200, forget_after=50) == 1
+
+
+def test_memory_backend_lock_expires():
+    backend = MemoryBackend()
+    backend.add_failure('k', 100, forget_after=50)
+    backend.set_lock('k', 130)
+    assert backend.get_lock('k', 120) == 130
+    assert backend.get_lock('k', 130) == 0
+
+
+# --- Bloqueio progressivo do login ---
+
+def test_lockout_starts_at_threshold_and_doubles(clock):
+    email = 'Cliente@Example.com'
+    for _ in range(2):
+        rate_limiter.login_failed(email)
+    assert rate_limiter.check_login('1.1.1.1', email) == 0
+
+    durations = []
+    for _ in range(4):
+        rate_limiter.login_failed(email)
+        durations.append(rate_limiter.check_login('1.1.1.1', email))
+    # base, 2 x base, 4 x base e então o máximo
+    assert durations == [10, 20, 40, 60]
+    assert rate_limiter.get_stats()["lockouts"] == 4
+
+
+def test_lockout_ignores_email_case_and_clears_on_success(clock):
+    for _ in range(3):
+        rate_limiter.login_failed(' cliente@example.com')
+    assert rate_limiter.check_login('1.1.1.1', 'CLIENTE@example.com') == 10
+
+    rate_limiter.login_succeeded('cliente@example.com')
+    assert rate_limiter.check_login('1.1.1.1', 'cliente@example.com') == 0
+
+
+def test_lock_expires_with_time(clock):
+    for _ in range(3):
+        rate_limiter.login_failed('a@b.c')
+    clock.now += 10
+    assert rate_limiter.check_login('1.1.1.1', 'a@b.c') == 0
+
+
+def test_password_reset_limit_returns_retry_after(clock):
+    clock.now = 6030.0  # Meio da janela
+    results = [rate_limiter.check_password_reset('1.1.1.1', 'a@b.c') for _ in range(4)]
+    assert results == [0, 0, 0, 30]
+    assert rate_limiter.get_stats()["rejected"] == 1
+
+
+def test_backend_error_lets_request_through(clock, monkeypatch):
+    def broken(*args):
+        raise RuntimeError("backend fora do ar")
+    monkeypatch.setattr(rate_limiter._backend, 'hit', broken)
+    assert rate_limiter.check_password_reset('1.1.1.1', 'a@b.c') == 0
+    assert rate_limiter.get_stats()["errors"] == 1
@@ -0,0 +1,82 @@
+# tests/test_search_service.py
+
+import pytest
+
+from src.services import search_service
+
+PRODUCTS = [
+    ({"id": 1, "name": "X-Bacon", "description": "Hambúrguer com bacon crocante", "price": "25.00"},
+     ["Pão brioche", "Bacon", "Queijo cheddar"]),
+    ({"id": 2, "name": "Cheeseburger", "description": "O clássico", "price": "18.00"},
+     ["Pão", "Queijo prato"]),
+    ({"id": 3, "name": "Açaí na tigela", "description": "Com granola", "price": "15.00"},
+     ["Açaí", "Granola"]),
+    ({"id": 4, "name": "Batata frita", "description": "Porção média", "price": "12.00"},
+     ["Batata"]),
+]
+
+
+@pytest.fixture(autouse=True)
+def index(monkeypatch):
+    """Índice em memória montado sem banco, a partir de PRODUCTS."""
+    for name, value in (('_docs', {}), ('_doc_tokens', {}), ('_postings', {}), ('_trigrams', {}),
+                        ('_vocabulary', []), ('_vocabulary_dirty', False)):
+        monkeypatch.setattr(search_service, name, value)
+    monkeypatch.setattr(search_service, 'rebuild_index', lambda: pytest.fail("o teste não deve ir ao banco"))
+    with search_service._lock:
+        for product, ingredient_names in PRODUCTS:
+            search_service._add_doc(product, ingredient_names)
+    monkeypatch.setattr(search_service, '_loaded', True)
+
+
+def _ids(query, limit=20):
+    return [product["id"] for product in search_service.search_products(query, limit)]
+
+
+def test_fold_removes_accents_and_punctuation():
+    assert search_service.fold("Pão de AÇAÍ, X-Bacon!") == "pao de acai x bacon"
+    assert search_service.tokenize("Pão com queijo") == ["pao", "queijo"]
+
+
+def test_search_ignores_accents():
+    assert _ids("acai") == [3]
+    assert _ids("AÇAÍ") == [3]
+
+
+def test_prefix_match_ranks_name_above_ingredient():
+    assert _ids("bat") == [4]
+    assert _ids("ched") == [1]
+    results = search_service.search_products("chee")
+    # 'cheeseburger' casa por prefixo no nome; 'cheddar' (ingrediente) só pela busca aproximada
+    assert [product["id"] for product in results] == [2, 1]
+    assert results[0]["score"] > results[1]["score"]
+
+
+def test_single_letter_has_no_prefix_match():
+    assert _ids("a") == []
+
+
+def test_fuzzy_match_tolerates_typos():
+    assert _ids("bacom") == [1]
+    assert _ids("cheddr") == [1]
+    assert _ids("frta") == [4]
+
+
+def test_unrelated_term_matches_nothing():
+    assert _ids("xyz") == []
+    assert _ids("de com") == []  # só stopwords
+
+
+def test_products_matching_more_terms_come_first():
+    assert _ids("queijo bacon") == [1, 2]
+
+
+def test_limit():
+    assert _ids("pao", limit=1) == [2]
+
+
+def test_removed_product_leaves_the_index():
+    with search_service._lock:
+        search_service._remove_doc(4)
+    assert _ids("batata") == []
+    assert "batata" not in search_service._postings
@@ -0,0 +1,189 @@
+# tests/test_user_cache.py
+
+import types
+from collections import OrderedDict
+
+import pytest
+
+from src.config import Config
+from src.services import user_cache
+
+
+class FakeCursor:
+    def __init__(self, results=None):
+        self.executed = []
+        self._results = results
+
+    def execute(self, sql, params=()):
+        self.executed.append(sql)
+
+    def fetchall(self):
+        return self._results.pop(0)
+
+
+class FakeConnection:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def cursor(self):
+        return self._cursor
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Cache vazio, com relógio controlado pelo teste e sem sincronização com o banco."""
+    fake = types.SimpleNamespace(now=1000.0)
+    fake.monotonic = lambda: fake.now
+    monkeypatch.setattr(user_cache, 'time', fake)
+    monkeypatch.setattr(user_cache, '_entries', OrderedDict())
+    monkeypatch.setattr(user_cache, '_generation', 0)
+    monkeypatch.setattr(user_cache, '_stats', {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0,
+                                               "remote_invalidations": 0, "remote_clears": 0})
+    monkeypatch.setattr(user_cache, '_seen_ids', set())
+    monkeypatch.setattr(user_cache, '_last_sync', 0.0)
+    monkeypatch.setattr(user_cache, '_last_sync_ok', None)
+    monkeypatch.setattr(user_cache, '_next_prune', float('inf'))
+    monkeypatch.setattr(Config, 'USER_CACHE_SIZE', 2)
+    monkeypatch.setattr(Config, 'USER_CACHE_TTL', 30)
+    monkeypatch.setattr(Config, 'USER_CACHE_SYNC_INTERVAL', 0)
+    return fake
+
+
+def _put(user_id):
+    user_cache.put(user_id, {"id": user_id}, user_cache.generation())
+
+
+def test_get_returns_a_copy(clock):
+    _put(1)
+    user = user_cache.get(1)
+    user["id"] = 99
+    assert user_cache.get(1) == {"id": 1}
+
+
+def test_lru_evicts_least_recently_used(clock):
+    _put(1)
+    _put(2)
+    user_cache.get(1)  # 1 passa a ser o mais recente
+    _put(3)
+    assert user_cache.get(2) is None
+    assert user_cache.get(1) == {"id": 1}
+    assert user_cache.get(3) == {"id": 3}
+    assert user_cache.get_stats()["evictions"] == 1
+
+
+def test_entries_expire_after_ttl(clock):
+    _put(1)
+    clock.now += 29.9
+    assert user_cache.get(1) == {"id": 1}
+    clock.now += 0.2
+    assert user_cache.get(1) is None
+    assert user_cache.get_stats()["size"] == 0
+
+
+def test_disabled_cache_stores_nothing(clock, monkeypatch):
+    monkeypatch.setattr(Config, 'USER_CACHE_SIZE', 0)
+    _put(1)
+    assert user_cache.get(1) is None
+
+
+def test_read_started_before_invalidation_is_not_stored(clock):
+    read_generation = user_cache.generation()
+    cur = FakeCursor()
+    user_cache.invalidate(1, cur)
+    user_cache.put(1, {"id": 1, "name": "antigo"}, read_generation)
+    assert user_cache.get(1) is None
+    assert user_cache.generation() > read_generation
+    assert cur.executed == []  # Sem sincronização entre processos, nada é gravado
+
+
+def test_invalidate_logs_only_when_sync_is_enabled(clock, monkeypatch):
+    monkeypatch.setattr(Config, 'USER_CACHE_SYNC_INTERVAL', 5)
+    cur = FakeCursor()
+    user_cache.invalidate(1, cur)
+    assert cur.executed == ["INSERT INTO USER_CACHE_INVALIDATIONS (USER_ID) VALUES (?);"]
+
+
+def test_invalidate_removes_entry(clock):
+    _put(1)
+    user_cache.invalidate(1, FakeCursor())
+    assert user_cache.get(1) is None
+    assert user_cache.get_stats()["invalidations"] == 1
+
+
+def test_clear_bumps_generation(clock):
+    _put(1)
+    read_generation = user_cache.generation()
+    user_cache.clear()
+    user_cache.put(2, {"id": 2}, read_generation)
+    assert user_cache.get_stats()["size"] == 0
+
+
+def test_remote_invalidations_evict_only_those_users(clock, monkeypatch):
+    monkeypatch.setattr(Config, 'USER_CACHE_SYNC_INTERVAL', 5)
+    cursor = FakeCursor(results=[
+        [],                  # primeira conferência
+        [(10, 1)],           # outro processo alterou o usuário 1
+        [(10, 1)],           # a mesma linha de novo (janela de releitura): já aplicada
+        [(10, 1), (9, 2)],   # linha com ID menor confirmada depois: ainda é aplicada
+    ])
+    monkeypatch.setattr(user_cache, 'get_db_connection', lambda: FakeConnection(cursor))
+
+    user_cache.get(1)
+    _put(1)
+    _put(2)
+    clock.now += 5
+    assert user_cache.get(2) == {"id": 2}
+    assert user_cache.get(1) is None
+
+    _put(1)
+    clock.now += 1
+    assert user_cache.get(1) == {"id": 1}   # dentro do intervalo: nem consulta
+    clock.now += 5
+    assert user_cache.get(1) == {"id": 1}
+    clock.now += 5
+    assert user_cache.get(2) is None
+    assert user_cache.get(1) == {"id": 1}
+    assert user_cache.get_stats()["remote_invalidations"] == 2
+    assert len(cursor.executed) == 4
+
+
+def test_cache_is_cleared_after_sync_failures_longer_than_lookback(clock, monkeypatch):
+    monkeypatch.setattr(Config, 'USER_CACHE_SYNC_INTERVAL', 5)
+    monkeypatch.setattr(Config, 'USER_CACHE_TTL', 3600)
+    cursor = FakeCursor(results=[[], []])
+    monkeypatch.setattr(user_cache, 'get_db_connection', lambda: FakeConnection(cursor))
+
+    user_cache.get(1)
+    _put(1)
+    clock.now += user_cache._LOOKBACK.total_seconds() + 1
+    assert user_cache.get(1) is None
+    assert user_cache.get_stats()["remote_clears"] == 1
+
+
+def test_old_invalidations_are_pruned(clock, monkeypatch):
+    monkeypatch.setattr(Config, 'USER_CACHE_SYNC_INTERVAL', 5)
+    monkeypatch.setattr(user_cache, '_next_prune', 0.0)
+    cursor = FakeCursor(results=[[]])
+    prune_cursor = FakeCursor()
+    monkeypatch.setattr(user_cache, 'get_db_connection', lambda: FakeConnection(cursor))
+    monkeypatch.setattr(user_cache, 'get_pool', lambda: type('Pool', (), {'acquire': lambda self: FakeConnection(prune_cursor)})())
+
+    user_cache.get(1)
+    assert prune_cursor.executed == ["DELETE FROM USER_CACHE_INVALIDATIONS WHERE CREATED_AT < ?;"]
+
+
+def test_hit_rate(clock):
+    _put(1)
+    user_cache.get(1)
+    user_cache.get(2)
+    stats = user_cache.get_stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
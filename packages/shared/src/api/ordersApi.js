@@ -31,6 +31,10 @@ export const ordersApi = createApi({
                     cpf_on_invoice: fullOrderData.cpfOnInvoice,
                     points_to_redeem: fullOrderData.pointsToRedeem,
                 },
+                // Reenvie a mesma chave ao repetir a tentativa: o backend devolve o pedido já criado
+                headers: fullOrderData.idempotencyKey
+                    ? { 'Idempotency-Key': fullOrderData.idempotencyKey }
+                    : undefined,
             }),
         }),
         // Endpoint para buscar o histórico de pedidos (lista resumida)